@@ -52,5 +52,48 @@ export async function sendChatMessage(history) {
   return res.json();
 }
 
+// Streaming version of the chat: calls onEvent(eventName, data) for every server-sent event
+// ('accepted', 'plan', 'function_started', 'function_finished', 'token', 'visualization', 'done', 'error').
+// Messages with the same sessionId share a conversation on the server.
+export async function streamChatMessage(history, sessionId, onEvent) {
+  const res = await fetch(`${API_URL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ history, session_id: sessionId }),
+  });
+
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`API ${res.status}: ${text}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let eventName = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) eventName = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      onEvent(eventName, data ? JSON.parse(data) : null);
+    }
+  }
+}
+
 // For getting the new time-series data for a whole float
 export function fetchFloatTimeSeries(floatId) { return fetchJson(`${API_URL}/floats/${floatId}/timeseries`); }
\ No newline at end of file
@@ -2,16 +2,18 @@ import { useEffect, useState, useRef } from 'react';
 import { FiSend } from 'react-icons/fi';
 import FloatMap from '../components/FloatMap';
 // 1. Import the new chat API function
-import { fetchActiveFloatLocations, sendChatMessage } from '../api/client';
+import { fetchActiveFloatLocations, streamChatMessage } from '../api/client';
 // 2. Import the ChatVisualization component
 import ChatVisualization from '../components/ChatVisualization';
 
-const Message = ({ sender, text, visualization }) => {
+const Message = ({ sender, text, visualization, status }) => {
   const isUser = sender === 'user';
   return (
     <div className={`flex ${isUser ? 'justify-end' : ''}`}>
       <div className={`${isUser ? 'bg-blue-500 text-white' : 'bg-gray-100 text-gray-800'} p-3 rounded-lg max-w-md`}>
         {!isUser && <p className="font-semibold text-sm mb-1">FloatChat AI</p>}
+        {/* Progress of a response that is still streaming */}
+        {status && <p className="text-xs text-gray-500 animate-pulse mb-1">{status}</p>}
         <p className="text-sm whitespace-pre-line">{text}</p>
         {/* Display visualization if available */}
         {visualization && <ChatVisualization visualization={visualization} />}
@@ -27,6 +29,8 @@ export default function ChatPage() {
   const [inputValue, setInputValue] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const messagesEndRef = useRef(null);
+  // The server keeps the conversation for this id, so only the new message is sent
+  const sessionIdRef = useRef(crypto.randomUUID());
 
   const [locations, setLocations] = useState([]);
   const [loadingMap, setLoadingMap] = useState(true);
@@ -42,6 +46,11 @@ export default function ChatPage() {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
+  // Applies a partial update to one message (used while a response is streaming)
+  const updateMessage = (id, update) => {
+    setMessages(prev => prev.map(msg => (msg.id === id ? { ...msg, ...update(msg) } : msg)));
+  };
+
   // --- THIS IS THE UPDATED CHAT LOGIC ---
   const handleSendMessage = async () => {
     const trimmedInput = inputValue.trim();
@@ -54,32 +63,63 @@ export default function ChatPage() {
     setInputValue('');
     setIsLoading(true);
 
-    // 2. Format the history for the backend API
-    const apiHistory = newHistory.map(msg => ({
-      role: msg.sender === 'ai' ? 'assistant' : 'user', // Map sender to role
-      content: msg.text // Map text to content
-    }));
+    // 2. Send the new message; earlier turns are in the server-side session
+    const apiHistory = [{ role: 'user', content: trimmedInput }];
+
+    // 3. Stream the response: progress events first, then the answer text as it arrives
+    const aiMessageId = Date.now() + 1;
+    let aiMessageAdded = false;
+    const ensureAiMessage = () => {
+      if (aiMessageAdded) return;
+      aiMessageAdded = true;
+      setIsLoading(false);
+      setMessages(prev => [...prev, { id: aiMessageId, sender: 'ai', text: '', visualization: null, status: 'Thinking...' }]);
+    };
 
-    // 3. Call the real backend endpoint instead of setTimeout
     try {
-      const aiResponse = await sendChatMessage(apiHistory);
-      // The backend returns { role: 'ai', content: '...', visualization: {...} }
-      const newAiMessage = {
-        id: Date.now() + 1,
-        sender: 'ai',
-        text: aiResponse.content,
-        visualization: aiResponse.visualization, // Include visualization data
-      };
-      setMessages(prev => [...prev, newAiMessage]);
+      await streamChatMessage(apiHistory, sessionIdRef.current, (event, data) => {
+        ensureAiMessage();
+        switch (event) {
+          case 'plan':
+            updateMessage(aiMessageId, () => ({
+              status: data.function_calls.length ? `Planning: ${data.function_calls.map(fc => fc.name).join(', ')}` : 'Answering...',
+            }));
+            break;
+          case 'function_started':
+            updateMessage(aiMessageId, () => ({ status: `Querying data (${data.function})...` }));
+            break;
+          case 'function_finished':
+            updateMessage(aiMessageId, () => ({ status: `Retrieved ${data.row_count} result rows, writing answer...` }));
+            break;
+          case 'token':
+            updateMessage(aiMessageId, msg => ({ text: msg.text + data.text }));
+            break;
+          case 'fallback':
+            // The model was too slow or failed; the answer is regenerated locally
+            updateMessage(aiMessageId, () => ({ text: '', status: 'Answering with the local analyzer...' }));
+            break;
+          case 'visualization':
+            updateMessage(aiMessageId, () => ({ visualization: data }));
+            break;
+          case 'done':
+            // The backend returns { role: 'ai', content: '...', visualization: {...} }
+            updateMessage(aiMessageId, () => ({ text: data.content, visualization: data.visualization, status: null }));
+            break;
+          case 'error':
+            updateMessage(aiMessageId, () => ({ text: data.message, status: null }));
+            break;
+          default:
+            break;
+        }
+      });
     } catch (error) {
       console.error("Error communicating with AI backend:", error);
-      const errorMessage = {
-        id: Date.now() + 1,
-        sender: 'ai',
-        text: "Sorry, I'm having trouble connecting to my brain. Please check the server and try again.",
-        visualization: null,
-      };
-      setMessages(prev => [...prev, errorMessage]);
+      const errorText = "Sorry, I'm having trouble connecting to my brain. Please check the server and try again.";
+      if (aiMessageAdded) {
+        updateMessage(aiMessageId, () => ({ text: errorText, status: null }));
+      } else {
+        setMessages(prev => [...prev, { id: aiMessageId, sender: 'ai', text: errorText, visualization: null }]);
+      }
     } finally {
       setIsLoading(false);
     }
@@ -99,7 +139,7 @@ export default function ChatPage() {
       <div className="w-full lg:w-2/3 h-full flex flex-col border-r bg-white">
         <div className="flex-grow p-4 overflow-y-auto">
           <div className="space-y-4">
-            {messages.map(msg => <Message key={msg.id} sender={msg.sender} text={msg.text} visualization={msg.visualization} />)}
+            {messages.map(msg => <Message key={msg.id} sender={msg.sender} text={msg.text} visualization={msg.visualization} status={msg.status} />)}
             {isLoading && (
               <div className="flex"><div className="bg-gray-100 p-3 rounded-lg"><p className="text-sm text-gray-500 animate-pulse">FloatChat AI is thinking...</p></div></div>
             )}
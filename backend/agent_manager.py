@@ -4,45 +4,65 @@ Agent instance management for the FloatChat backend
 from typing import Optional, Any
 from pathlib import Path
 import os
+import threading
 
-# Import agentic AI
-try:
-    from .agentic_ai.agent import OceanographicAgent
-    AGENTIC_AI_AVAILABLE = True
-except ImportError:
-    print("Agentic AI not available. Install dependencies with: pip install -r agentic_ai/requirements.txt")
-    AGENTIC_AI_AVAILABLE = False
-    OceanographicAgent = None
+# The agent module (and google-genai with it) is only imported when the agent is first
+# built; this flips to False if that import fails
+AGENTIC_AI_AVAILABLE = True
 
 # Global agent instance
 agent_instance: Optional[Any] = None
+_agent_lock = threading.Lock()
 
 def initialize_agent() -> Optional[Any]:
     """
     Initialize the agentic AI agent
     """
-    global agent_instance
+    global agent_instance, AGENTIC_AI_AVAILABLE
 
     if not AGENTIC_AI_AVAILABLE or agent_instance is not None:
         return agent_instance
 
-    try:
-        # Get database path
-        project_root = Path(__file__).parent.parent
-        db_path = os.path.join(project_root, "argo_data.sqlite")
+    # The background warmup and the first request may race to build the agent
+    with _agent_lock:
+        if agent_instance is not None:
+            return agent_instance
 
-        # Initialize agent
-        agent_instance = OceanographicAgent(db_path=db_path)
-        print("🤖 Agentic AI agent initialized successfully")
-        print(f"   - Gemini Available: {agent_instance.gemini_available}")
-        print(f"   - Database: {db_path}")
-        return agent_instance
-    except Exception as e:
-        print(f"❌ Failed to initialize agentic AI: {e}")
-        return None
+        try:
+            from .agentic_ai.agent import OceanographicAgent
+        except ImportError as e:
+            print(f"Agentic AI not available ({e}). Install dependencies with: pip install -r agentic_ai/requirements.txt")
+            AGENTIC_AI_AVAILABLE = False
+            return None
+
+        try:
+            # Get database path
+            project_root = Path(__file__).parent.parent
+            db_path = os.path.join(project_root, "argo_data.sqlite")
+
+            # Initialize agent
+            agent_instance = OceanographicAgent(db_path=db_path)
+            print("🤖 Agentic AI agent initialized successfully")
+            print(f"   - Gemini Available: {agent_instance.gemini_available}")
+            print(f"   - Database: {db_path}")
+            return agent_instance
+        except Exception as e:
+            print(f"❌ Failed to initialize agentic AI: {e}")
+            return None
 
 def get_agent() -> Optional[Any]:
     """
-    Get the initialized agent instance
+    Get the agent instance, initializing it on first use.
+    Each server worker process builds its own agent lazily.
+    """
+    if agent_instance is None:
+        return initialize_agent()
+    return agent_instance
+
+async def close_agent():
+    """
+    Close the agent if this process built one: flush its logs and release the
+    Gemini client and SQL executor.
     """
-    return agent_instance
\ No newline at end of file
+    if agent_instance is not None:
+        await agent_instance.aclose()
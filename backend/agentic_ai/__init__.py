@@ -14,9 +14,24 @@ Main components:
 - config.py: Configuration and constants
 """
 
-from .agent import OceanographicAgent
-from .api import app
-from .config import AgenticConfig
+import importlib
 
 __version__ = "1.0.0"
 __all__ = ["OceanographicAgent", "app", "AgenticConfig"]
+
+# Exports are imported on first access: the agent pulls in google-genai and the
+# api module builds its own FastAPI app, neither of which the main server needs
+# at import time.
+_LAZY_EXPORTS = {
+    "OceanographicAgent": ".agent",
+    "app": ".api",
+    "AgenticConfig": ".config",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -3,11 +3,10 @@ Main Agentic AI Agent for Oceanographic Data Analysis
 """
 import os
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
 from datetime import date, timedelta, datetime
 import asyncio
-from dotenv import load_dotenv
-load_dotenv()
+import time
 # Import Google GenAI when available
 try:
     from google import genai
@@ -20,6 +19,28 @@ except ImportError:
 from .config import AgenticConfig
 from .sql_engine import SQLTemplateEngine
 from .functions import OceanQueryFunctions
+from .canonical import canonical_args, canonical_call_key
+from .deadline import QueryDeadline, QueryTimeoutError
+from .metrics import get_metrics
+from .routing import ModelRouter, ModelUnavailableError
+from .answer_cache import AnswerCache
+from .semantic_cache import SemanticCache
+from .plan_cache import PlanCache
+from .intent_parser import IntentParser, PlannedCall
+from .speculation import Speculation, SpeculationStats
+from .answer_templates import render_answer
+from .digest import digest_function_result, estimate_tokens
+from .sessions import SessionStore, ChatSession
+from .prompt_prefix import PromptPrefixCache
+from .tool_selection import ToolSelector, PromptSelection
+from .shared_scans import SharedScans
+from .query_log import QueryLog
+from .warmup import CacheWarmer
+from .scheduler import get_scheduler
+from .workload import get_workload_log
+
+# Async callback receiving (event_name, payload) progress events while a query is processed
+EventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
 
 class OceanographicAgent:
     """
@@ -30,12 +51,68 @@ class OceanographicAgent:
     def __init__(self, db_path: str, api_key: Optional[str] = None):
         self.db_path = db_path
         self.config = AgenticConfig()
-        self.sql_engine = SQLTemplateEngine(db_path)
+        # Every template call is logged for the index advisor (see workload)
+        self.workload_log = get_workload_log(self.config) if self.config.WORKLOAD_LOG_ENABLED else None
+        self.sql_engine = SQLTemplateEngine(db_path, workload_log=self.workload_log)
+        self.metrics = get_metrics()
+        self.metrics.describe('function_response_tokens', 'Approximate tokens of function results sent back to Gemini per answer')
+        self.metrics.describe('gemini_prompt_tokens', 'Input tokens of Gemini requests, by call and tool selection')
+        self.metrics.describe('gemini_request_seconds', 'Latency of Gemini requests, by call and tool selection')
+        self.metrics.describe('prompt_tokens_saved_total', 'Approximate prompt prefix tokens not sent thanks to tool selection')
+        self.router = ModelRouter(
+            slo_seconds=self.config.GEMINI_SLO_SECONDS,
+            window_seconds=self.config.ROUTER_WINDOW_SECONDS,
+            min_samples=self.config.ROUTER_MIN_SAMPLES,
+            error_rate_threshold=self.config.ROUTER_ERROR_RATE_THRESHOLD,
+            consecutive_failures=self.config.ROUTER_CONSECUTIVE_FAILURES,
+            cooldown_seconds=self.config.ROUTER_COOLDOWN_SECONDS,
+            degraded_fraction=self.config.ROUTER_DEGRADED_FRACTION,
+            probe_ratio=self.config.ROUTER_PROBE_RATIO,
+            metrics=self.metrics,
+        )
+        self.answer_cache = AnswerCache(self.config.ANSWER_CACHE_MAX_ENTRIES, self.config.ANSWER_CACHE_TTL_SECONDS)
+        self.semantic_cache = SemanticCache(
+            max_entries=self.config.SEMANTIC_CACHE_MAX_ENTRIES,
+            dim=self.config.SEMANTIC_CACHE_DIM,
+            threshold=self.config.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=self.config.ANSWER_CACHE_TTL_SECONDS,
+            audit_rate=self.config.SEMANTIC_CACHE_AUDIT_RATE,
+        )
+        self.plan_cache = PlanCache(self.config.PLAN_CACHE_MAX_ENTRIES, self.config.PLAN_CACHE_TTL_SECONDS)
+        self.intent_parser = IntentParser()
+        self.speculation_stats = SpeculationStats()
+        self.sessions = SessionStore(
+            os.path.join(self.config.STATE_DIR, 'sessions.sqlite'),
+            max_sessions=self.config.SESSION_MAX_SESSIONS,
+            ttl_seconds=self.config.SESSION_TTL_SECONDS,
+            token_budget=self.config.SESSION_TOKEN_BUDGET,
+            recent_turns=self.config.SESSION_RECENT_TURNS,
+        )
+        self.query_log = QueryLog(
+            os.path.join(self.config.STATE_DIR, 'query_log.sqlite'),
+            retention_seconds=self.config.QUERY_LOG_RETENTION_SECONDS,
+        )
+        # Started by the server once its event loop runs (see start_warmup)
+        self.warmer = CacheWarmer(
+            self,
+            get_scheduler(),
+            top_queries=self.config.WARMUP_TOP_QUERIES,
+            window_seconds=self.config.WARMUP_LOG_WINDOW_SECONDS,
+            poll_seconds=self.config.WARMUP_POLL_SECONDS,
+            call_timeout_seconds=self.config.WARMUP_CALL_TIMEOUT_SECONDS,
+        )
         
         # Initialize Gemini client if available
         if GENAI_AVAILABLE and (api_key or self.config.GEMINI_API_KEY):
             self.api_key = api_key or self.config.GEMINI_API_KEY
-            self.client = genai.Client(api_key=self.api_key)
+            # One client per agent so the async HTTP connection pool is reused across requests
+            self.client = genai.Client(
+                api_key=self.api_key,
+                http_options=types.HttpOptions(
+                    base_url=self.config.GEMINI_BASE_URL,
+                    timeout=int(self.config.GEMINI_TIMEOUT_SECONDS * 1000),
+                ),
+            )
             self.gemini_available = True
         else:
             self.client = None
@@ -45,67 +122,513 @@ class OceanographicAgent:
         # Initialize function tools
         if GENAI_AVAILABLE:
             self.functions = OceanQueryFunctions()
-            self.tools = self.functions.get_all_functions()
+            # Requests only carry the tools and prompt sections the question needs
+            self.tool_selector = ToolSelector(
+                self.config,
+                self.functions.get_function_declarations(),
+                min_confidence=self.config.TOOL_SELECTION_MIN_CONFIDENCE,
+            )
         else:
             self.functions = None
-            self.tools = []
+            self.tool_selector = None
+        
+        # Each tool selection's system instruction and tools are fixed; keep them cached server-side
+        self.prompt_prefix = None
+        if self.gemini_available:
+            self.prompt_prefix = PromptPrefixCache(
+                self.client,
+                model=self.config.GEMINI_MODEL,
+                ttl_seconds=self.config.PROMPT_PREFIX_CACHE_TTL_SECONDS,
+                timeout_seconds=self.config.GEMINI_SLO_SECONDS,
+                min_tokens=self.config.PROMPT_PREFIX_CACHE_MIN_TOKENS,
+            )
     
-    def _extract_parameters_fallback(self, query: str) -> Dict[str, Any]:
+    async def _with_model_timeout(self, awaitable, deadline: Optional[QueryDeadline] = None,
+                                  record_latency: bool = True) -> Any:
         """
-        Fallback parameter extraction using simple text analysis
-        when Gemini is not available
+        Await a Gemini call, bounded by the latency SLO and the request deadline.
+        The outcome is recorded for routing; failures and SLO breaches raise
+        ModelUnavailableError so the caller can fall back.
         """
-        query_lower = query.lower()
-        params = {'operation': 'average'}  # default
+        timeout = min(self.config.GEMINI_TIMEOUT_SECONDS, self.router.slo_seconds)
+        if deadline is not None:
+            timeout = deadline.bound(timeout)
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            if deadline is not None and deadline.expired():
+                raise QueryTimeoutError(deadline.describe())
+            self.router.record(time.perf_counter() - started, ok=False, kind='slo_timeout')
+            raise ModelUnavailableError(f"Gemini did not respond within {timeout:g} seconds")
+        except StopAsyncIteration:
+            # A stream ending normally, not a failure
+            raise
+        except Exception as e:
+            self.router.record(time.perf_counter() - started, ok=False, kind='error')
+            raise ModelUnavailableError(f"Gemini request failed: {e}") from e
         
-        # Extract regions
-        for region_name in self.config.REGIONS.keys():
-            if region_name in query_lower:
-                params['region'] = region_name
-                break
+        if record_latency:
+            self.router.record(time.perf_counter() - started, ok=True)
+        return result
+    
+    async def _generation_config(self, selection: PromptSelection, **kwargs) -> Any:
+        """
+        Generation config carrying the selected system instruction and tools, by
+        reference to the cached prompt prefix when there is one
+        """
+        cached_name = None
+        if self.prompt_prefix is not None:
+            cached_name = await self.prompt_prefix.get_name(
+                (selection.tool_names, selection.include_depth),
+                selection.system_instruction, selection.tools, selection.tokens,
+            )
+        if cached_name is not None:
+            return types.GenerateContentConfig(cached_content=cached_name, **kwargs)
+        return types.GenerateContentConfig(system_instruction=selection.system_instruction, tools=selection.tools, **kwargs)
+    
+    def _selection_labels(self, call: str, selection: PromptSelection) -> Dict[str, str]:
+        return {'call': call, 'tools': 'all' if selection is self.tool_selector.full else 'selected'}
+    
+    def _record_usage(self, usage, seconds: float, labels: Optional[Dict[str, str]]):
+        """Input tokens and latency of a Gemini request"""
+        if labels is None:
+            return
+        self.metrics.observe('gemini_request_seconds', seconds, labels)
+        if usage is not None and usage.prompt_token_count is not None:
+            self.metrics.observe('gemini_prompt_tokens', usage.prompt_token_count, labels)
+    
+    def _check_prompt_prefix(self, config, error: ModelUnavailableError):
+        """Drop a cached prefix a failed request referenced, in case it is gone"""
+        if getattr(config, 'cached_content', None) and self.prompt_prefix is not None:
+            self.prompt_prefix.invalidate(config.cached_content)
+    
+    async def _generate_content(self, contents, config, deadline: Optional[QueryDeadline] = None,
+                                labels: Optional[Dict[str, str]] = None) -> Any:
+        """Call Gemini through the async client"""
+        started = time.perf_counter()
+        try:
+            response = await self._with_model_timeout(
+                self.client.aio.models.generate_content(
+                    model=self.config.GEMINI_MODEL,
+                    contents=contents,
+                    config=config,
+                ),
+                deadline
+            )
+        except ModelUnavailableError as e:
+            self._check_prompt_prefix(config, e)
+            raise
+        self._record_usage(response.usage_metadata, time.perf_counter() - started, labels)
+        return response
+    
+    async def _stream_content(self, contents, config, emit: EventCallback, deadline: Optional[QueryDeadline] = None,
+                              labels: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Stream a Gemini response, emitting each text chunk as a token event, and return the full text"""
+        started = time.perf_counter()
+        try:
+            stream = await self._with_model_timeout(
+                self.client.aio.models.generate_content_stream(
+                    model=self.config.GEMINI_MODEL,
+                    contents=contents,
+                    config=config,
+                ),
+                deadline
+            )
+        except ModelUnavailableError as e:
+            self._check_prompt_prefix(config, e)
+            raise
         
-        # Extract parameters
-        parameters = []
-        for param in self.config.PARAMETERS[:8]:  # Main parameters
-            if param in query_lower:
-                parameters.append(self.config.normalize_parameter(param))
+        chunks = []
+        usage = None
+        iterator = stream.__aiter__()
+        while True:
+            try:
+                chunk = await self._with_model_timeout(iterator.__anext__(), deadline, record_latency=False)
+            except StopAsyncIteration:
+                break
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                chunks.append(chunk.text)
+                await emit('token', {'text': chunk.text})
         
-        if not parameters:
-            parameters = ['temperature', 'salinity', 'oxygen']  # default
-        params['parameters'] = parameters
+        self._record_usage(usage, time.perf_counter() - started, labels)
         
-        # Extract operations
-        for op in self.config.OPERATIONS:
-            if op in query_lower:
-                params['operation'] = op
-                break
+        return "".join(chunks) if chunks else None
+    
+    @staticmethod
+    async def _emit(emit: Optional[EventCallback], event: str, data: Dict[str, Any]):
+        """Send a progress event if the caller is listening"""
+        if emit is not None:
+            await emit(event, data)
+    
+    async def stream_query(self, user_query: str, deadline: Optional[QueryDeadline] = None,
+                           session_id: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Process a query while yielding (event, payload) progress events as they happen.
+        The last event is ('result', ...) carrying the same dict process_query returns.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
         
-        # Extract temporal references
-        if 'last year' in query_lower or 'past year' in query_lower:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=365)
-            params['date_range'] = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
-        elif 'last month' in query_lower:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=30)
-            params['date_range'] = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+        async def emit(event: str, data: Dict[str, Any]):
+            await queue.put((event, data))
         
-        # Detect anomaly/trend queries
-        if any(word in query_lower for word in ['unusual', 'anomal', 'trend', 'strange', 'different']):
-            params['operation'] = 'anomaly'
-            params['statistical_threshold'] = 2.0
+        task = asyncio.ensure_future(self.process_query(user_query, emit=emit, deadline=deadline, session_id=session_id))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
         
-        return params
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+            yield 'result', task.result()
+        finally:
+            # The consumer went away (e.g. the client disconnected); stop the work
+            if not task.done():
+                task.cancel()
+    
+    def start_warmup(self):
+        """Warm the result cache in the background now and after each data refresh"""
+        if self.config.WARMUP_ENABLED:
+            self.warmer.start()
+    
+    async def aclose(self):
+        """Close the Gemini client's connections and the SQL executor"""
+        self.warmer.stop()
+        self.query_log.flush()
+        if self.workload_log is not None:
+            self.workload_log.flush()
+        if self.client is not None:
+            await self.client.aio.aclose()
+        self.sql_engine.shutdown(wait=False)
     
-    async def process_query(self, user_query: str) -> Dict[str, Any]:
+    async def process_query(self, user_query: str, emit: Optional[EventCallback] = None,
+                            deadline: Optional[QueryDeadline] = None,
+                            session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Main method to process a natural language oceanographic query
+        
+        If `emit` is given it is awaited with progress events: 'plan', 'function_started',
+        'function_finished', 'token' (answer text as it is generated) and 'fallback'
+        (the answer so far is discarded and produced by the local fallback instead).
+        If `deadline` expires or is cancelled, database scans are interrupted and the
+        result reports a timeout, keeping any function results that completed.
+        
+        Questions the local intent parser understands with high confidence are
+        answered from the database without Gemini. Gemini is also skipped for the
+        local fallback while the router sees it as slow or failing, and when a
+        Gemini call fails or breaches the latency SLO.
+        
+        Answers are cached by normalized question text and data version, and
+        paraphrases of answered questions reuse their answer. A cached result is
+        marked `cached` and streamed as a single token event.
+        
+        With a `session_id`, the question is recorded in that chat session. Follow-up
+        questions that depend on the conversation ("what about salinity?") are sent
+        to Gemini with the session's bounded context, bypassing the caches and the
+        fast path, and are marked `context_dependent`.
+        
+        Answered self-contained questions are logged with their function calls
+        for the cache warmup.
         """
+        session = await self.sessions.get(session_id) if session_id else None
+        intent = self.intent_parser.parse(user_query)
+        if session is not None and self.sessions.needs_context(session, user_query, intent):
+            result = await self._answer_query(user_query, emit, deadline, intent, session)
+            result['context_dependent'] = True
+        else:
+            result = await self._cached_or_answer(user_query, emit, deadline, intent)
+            if result.get('success'):
+                self.query_log.record(user_query, result.get('function_results'))
+        
+        if session is not None:
+            await self.sessions.record(session, user_query, result)
+        return result
+    
+    async def _cached_or_answer(self, user_query: str, emit: Optional[EventCallback] = None,
+                                deadline: Optional[QueryDeadline] = None,
+                                intent: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The cached answer to a self-contained question, or a new answer that is then cached"""
+        data_version = self.sql_engine.data_version()
+        answer_key = self.answer_cache.make_key(user_query, data_version)
+        cached = self.answer_cache.get(answer_key)
+        self.metrics.increment('answer_cache_total', {'outcome': 'miss' if cached is None else 'hit'})
+        if cached is not None:
+            return await self._cached_result(cached, emit)
+        
+        audited_match = None
+        match = self.semantic_cache.lookup(user_query, data_version, intent)
+        self.metrics.increment('semantic_cache_total', {'outcome': 'miss' if match is None else 'hit'})
+        if match is not None:
+            matched_result, similarity, matched_query = match
+            if not self.semantic_cache.should_audit():
+                matched_result.update({
+                    'query': user_query,
+                    'cached': True,
+                    'cache_match': {'query': matched_query, 'similarity': round(similarity, 3)},
+                })
+                return await self._cached_result(matched_result, emit)
+            # Answer this one for real and check the cache would have been right
+            audited_match = (matched_result, matched_query)
+        
+        result = await self._answer_query(user_query, emit, deadline, intent)
+        
+        if audited_match is not None:
+            matched_result, matched_query = audited_match
+            correct = self._plan_signature(result) == self._plan_signature(matched_result)
+            self.semantic_cache.record_audit(user_query, matched_query, correct)
+            if not correct:
+                print(f"🔍 Semantic cache false hit: '{user_query}' matched '{matched_query}'")
+        
+        self._store_answer(user_query, result, answer_key, data_version, intent)
+        return result
+    
+    def _store_answer(self, user_query: str, result: Dict[str, Any], answer_key: str, data_version: Any,
+                      intent: Optional[Dict[str, Any]] = None):
+        """Keep an answer for repeated and paraphrased questions"""
+        if result.get('success') and not (result.get('partial') or result.get('routed_to')):
+            # Degraded answers (partial, or produced while Gemini was unavailable) are not kept
+            result['answer_cache_key'] = answer_key
+            self.answer_cache.put(answer_key, result)
+            self.semantic_cache.add(user_query, result, data_version, intent)
+    
+    async def process_batch(self, queries: List[str], deadline: Optional[QueryDeadline] = None) -> Dict[str, Any]:
+        """
+        Answer several independent questions together
+        
+        Every question is routed as process_query would (answer cache, intent
+        parser fast path, Gemini or the local fallback). The template calls of
+        all local plans are merged into shared scans (see SharedScans) that start
+        at once; the questions routed to Gemini are planned concurrently, and
+        their calls reuse those scans or are merged into a second round. Each
+        answer is worded as soon as the scans it needs finish. Results keep the
+        order of `queries` and carry their own `timing`.
+        """
+        started = time.perf_counter()
+        data_version = self.sql_engine.data_version()
+        plans = [self._route_batch_item(query, data_version) for query in queries]
+        
+        local_scans = SharedScans(self.sql_engine, deadline)
+        for plan in plans:
+            for call in plan['calls']:
+                local_scans.add(call.name, canonical_args(call.args))
+        local_scans.start()
+        planned_scans = SharedScans(self.sql_engine, deadline, parent=local_scans)
+        
+        async def plan_with_gemini() -> float:
+            remote = [plan for plan in plans if plan['route'] == ModelRouter.GEMINI]
+            await asyncio.gather(*(self._plan_with_gemini(plan, deadline) for plan in remote))
+            for plan in remote:
+                for call in plan['calls']:
+                    planned_scans.add(call.name, canonical_args(call.args))
+            planned_scans.start()
+            return time.perf_counter()
+        
+        planning = asyncio.ensure_future(plan_with_gemini())
         try:
-            if self.gemini_available:
-                return await self._process_with_gemini(user_query)
+            results = await asyncio.gather(*(
+                self._answer_batch_item(plan, local_scans, planned_scans, planning, deadline, data_version, started)
+                for plan in plans
+            ))
+        finally:
+            planning.cancel()
+            local_scans.cancel()
+            planned_scans.cancel()
+        
+        for query, result in zip(queries, results):
+            if result.get('success'):
+                self.query_log.record(query, result.get('function_results'))
+        
+        calls = local_scans.get_stats()['calls'] + planned_scans.get_stats()['calls']
+        scans = local_scans.get_stats()['scans'] + planned_scans.get_stats()['scans']
+        self.metrics.increment('batch_function_calls_total', value=calls)
+        self.metrics.increment('batch_scans_total', value=scans)
+        return {
+            'results': results,
+            'batch': {
+                'queries': len(queries),
+                'function_calls': calls,
+                'scans': scans,
+                'total_seconds': round(time.perf_counter() - started, 4),
+            },
+        }
+    
+    def _route_batch_item(self, user_query: str, data_version: Any) -> Dict[str, Any]:
+        """
+        How a batch question will be answered: a finished `result` from the
+        answer cache, local `calls` from the intent parser, or the Gemini `route`
+        """
+        plan = {
+            'query': user_query,
+            'answer_key': self.answer_cache.make_key(user_query, data_version),
+            'calls': [],
+            'model_content': None,
+            'selection': None,
+            'result': None,
+            'planning_seconds': 0.0,
+        }
+        
+        cached = self.answer_cache.get(plan['answer_key'])
+        self.metrics.increment('answer_cache_total', {'outcome': 'miss' if cached is None else 'hit'})
+        if cached is not None:
+            plan.update(result=cached, route='cache')
+            return plan
+        
+        plan['intent'] = intent = self.intent_parser.parse(user_query)
+        if not self.gemini_available:
+            self._plan_locally(plan, ModelRouter.FALLBACK, 'gemini_not_configured')
+        elif intent['confidence'] >= self.config.FAST_PATH_CONFIDENCE:
+            self.metrics.increment('agent_route_total', {'route': 'fast_path', 'reason': 'high_confidence'})
+            self._plan_locally(plan, 'fast_path', 'high_confidence')
+        else:
+            route, reason = self.router.choose()
+            if route == ModelRouter.GEMINI:
+                plan['route'] = route
             else:
-                return await self._process_with_fallback(user_query)
+                self._plan_locally(plan, route, reason)
+        return plan
+    
+    @staticmethod
+    def _plan_locally(plan: Dict[str, Any], route: str, reason: str):
+        """Plan a batch question with the call the intent parser found"""
+        intent = plan['intent']
+        plan.update(route=route, routing_reason=reason, calls=[PlannedCall(intent['function'], intent['args'])])
+    
+    async def _plan_with_gemini(self, plan: Dict[str, Any], deadline: Optional[QueryDeadline] = None):
+        """
+        Fill in a batch question's plan from the plan cache or Gemini, falling
+        back to the local plan when Gemini fails
+        """
+        started = time.perf_counter()
+        user_query = plan['query']
+        plan['selection'] = self.tool_selector.select(user_query, plan['intent'])
+        try:
+            cached_plan = self._cached_plan(user_query)
+            if cached_plan is not None:
+                plan['calls'], plan['model_content'] = cached_plan
+                return
+            
+            response = await self._request_plan(user_query, deadline, plan['selection'])
+            if response.function_calls:
+                self.plan_cache.put(user_query, response.function_calls)
+                plan['calls'], plan['model_content'] = response.function_calls, response.candidates[0].content
+            else:
+                plan['result'] = {
+                    'success': True,
+                    'response': response.text,
+                    'query': user_query,
+                    'function_calls_made': False,
+                    'data_queried': False,
+                }
+        except ModelUnavailableError as e:
+            print(f"⚠️ {e}; answering with the local fallback")
+            self.metrics.increment('agent_route_total', {'route': ModelRouter.FALLBACK, 'reason': 'gemini_failed'})
+            self._plan_locally(plan, ModelRouter.FALLBACK, 'gemini_failed')
+        except QueryTimeoutError as e:
+            plan['result'] = self._timeout_result(user_query, str(e))
+        finally:
+            plan['planning_seconds'] = time.perf_counter() - started
+    
+    async def _answer_batch_item(self, plan: Dict[str, Any], local_scans: SharedScans, planned_scans: SharedScans,
+                                 planning: asyncio.Future, deadline: Optional[QueryDeadline],
+                                 data_version: Any, started: float) -> Dict[str, Any]:
+        """Word the answer to a batch question once its plan and the scans it needs are ready"""
+        user_query = plan['query']
+        scans = local_scans
+        answer_started = started
+        if plan['route'] == ModelRouter.GEMINI:
+            # Wait for the second round of scans, merged across the Gemini plans
+            answer_started = await asyncio.shield(planning)
+            scans = planned_scans
+        
+        result = plan['result']
+        answered = result is None
+        if answered:
+            try:
+                if plan['model_content'] is not None:
+                    result = await self._handle_function_calls(
+                        user_query, plan['calls'], plan['model_content'], None, deadline, scans,
+                        selection=plan['selection'],
+                    )
+                else:
+                    result = await self._process_with_intent(user_query, plan['intent'], None, deadline, scans)
+                    if plan['route'] == ModelRouter.FALLBACK:
+                        result['routed_to'] = ModelRouter.FALLBACK
+                        result['routing_reason'] = plan['routing_reason']
+            except QueryTimeoutError as e:
+                result = self._timeout_result(user_query, str(e))
+            except Exception as e:
+                result = {
+                    'success': False,
+                    'error': str(e),
+                    'message': 'An error occurred while processing your query.',
+                    'query': user_query
+                }
+            self._store_answer(user_query, result, plan['answer_key'], data_version)
+        
+        # Cached results are shared; timing goes on a copy
+        finished = time.perf_counter()
+        return {
+            **result,
+            'route': plan['route'],
+            'timing': {
+                'planning_seconds': round(plan['planning_seconds'], 4),
+                'answer_seconds': round(finished - answer_started, 4) if answered else 0.0,
+                'total_seconds': round(finished - started, 4),
+            },
+        }
+    
+    async def _cached_result(self, result: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """Return a cached answer, streaming it as a single token"""
+        await self._emit(emit, 'plan', {'function_calls': [], 'cached': True})
+        await self._emit(emit, 'token', {'text': result.get('response') or ''})
+        return result
+    
+    @staticmethod
+    def _plan_signature(result: Dict[str, Any]) -> List[str]:
+        """The function calls behind a result, for comparing two answers"""
+        return sorted(canonical_call_key(fr['function'], fr.get('parameters')) for fr in result.get('function_results') or [])
+    
+    def remember_visualization(self, result: Dict[str, Any], visualization: Optional[Dict[str, Any]]):
+        """Store the visualization built for a result with its cached answer and paraphrase entry"""
+        if result.get('answer_cache_key'):
+            self.answer_cache.attach(result['answer_cache_key'], 'visualization', visualization)
+            self.semantic_cache.attach(result['answer_cache_key'], 'visualization', visualization)
+    
+    async def _answer_query(self, user_query: str, emit: Optional[EventCallback] = None,
+                            deadline: Optional[QueryDeadline] = None,
+                            intent: Optional[Dict[str, Any]] = None,
+                            session: Optional[ChatSession] = None) -> Dict[str, Any]:
+        """
+        Answer a query from its parsed intent, with Gemini, or with the local fallback,
+        as routed. A `session` is only passed for follow-ups that need its context.
+        """
+        try:
+            if not self.gemini_available:
+                return await self._process_with_fallback(user_query, emit, deadline, session)
+            
+            intent = intent or self.intent_parser.parse(user_query)
+            if session is None and intent['confidence'] >= self.config.FAST_PATH_CONFIDENCE:
+                self.metrics.increment('agent_route_total', {'route': 'fast_path', 'reason': 'high_confidence'})
+                return await self._process_with_intent(user_query, intent, emit, deadline)
+            
+            route, reason = self.router.choose()
+            if route == ModelRouter.GEMINI:
+                try:
+                    return await self._process_with_gemini(user_query, emit, deadline, intent, session)
+                except ModelUnavailableError as e:
+                    print(f"⚠️ {e}; answering with the local fallback")
+                    reason = 'gemini_failed'
+                    self.metrics.increment('agent_route_total', {'route': ModelRouter.FALLBACK, 'reason': reason})
+            
+            await self._emit(emit, 'fallback', {'reason': reason})
+            result = await self._process_with_fallback(user_query, emit, deadline, session)
+            result['routed_to'] = ModelRouter.FALLBACK
+            result['routing_reason'] = reason
+            return result
+        except QueryTimeoutError as e:
+            return self._timeout_result(user_query, str(e))
         except Exception as e:
             return {
                 'success': False,
@@ -114,35 +637,117 @@ class OceanographicAgent:
                 'query': user_query
             }
     
-    async def _process_with_gemini(self, user_query: str) -> Dict[str, Any]:
-        """Process query using Gemini function calling"""
-        
-        try:
-            # First, let Gemini analyze the query and decide what to do
-            initial_response = self.client.models.generate_content(
-                model=self.config.GEMINI_MODEL,
-                contents=f"""
-                {self.config.SYSTEM_PROMPT}
-                
-                User query: "{user_query}"
-                
-                Analyze this oceanographic query. If you need to query the database, use the appropriate function calls.
-                If you can answer directly based on general oceanographic knowledge, do so.
-                """,
-                config=types.GenerateContentConfig(
-                    tools=self.tools,
-                    automatic_function_calling=types.AutomaticFunctionCallingConfig(
-                        disable=True  # We want to handle function calls manually for better control
-                    ),
+    def _timeout_result(self, user_query: str, reason: str) -> Dict[str, Any]:
+        """Result for a query stopped by its deadline before producing any data"""
+        return {
+            'success': False,
+            'error': reason,
+            'timed_out': True,
+            'message': 'The query was stopped before it finished. Try narrowing the region, time range or parameters.',
+            'query': user_query
+        }
+    
+    def _speculate(self, intent: Optional[Dict[str, Any]], deadline: Optional[QueryDeadline]) -> Optional[Speculation]:
+        """Start the query the parser expects while Gemini plans, if the parse is plausible"""
+        if intent is None or intent['confidence'] < self.config.SPECULATION_MIN_CONFIDENCE:
+            return None
+        return Speculation(self.sql_engine, intent['function'], intent['args'], deadline, self.speculation_stats)
+    
+    def _session_contents(self, session: Optional[ChatSession]) -> List[Any]:
+        """A session's summary and recent turns as Gemini contents"""
+        if session is None:
+            return []
+        return [
+            types.Content(role=role, parts=[types.Part.from_text(text=text)])
+            for role, text in self.sessions.context(session)
+        ]
+    
+    def _cached_plan(self, user_query: str) -> Optional[Tuple[List[Any], Any]]:
+        """The function calls and model turn of a cached plan for the query, if any"""
+        cached_plan = self.plan_cache.get(user_query)
+        self.metrics.increment('plan_cache_total', {'outcome': 'miss' if cached_plan is None else 'hit'})
+        if cached_plan is None:
+            return None
+        function_calls = [types.FunctionCall(name=call['name'], args=call['args']) for call in cached_plan]
+        model_content = types.Content(
+            role='model',
+            parts=[types.Part.from_function_call(name=call['name'], args=call['args']) for call in cached_plan],
+        )
+        return function_calls, model_content
+    
+    async def _request_plan(self, user_query: str, deadline: Optional[QueryDeadline], selection: PromptSelection,
+                            context_contents: Optional[List[Any]] = None) -> Any:
+        """Ask Gemini to analyze the query: the response holds function calls or a direct answer"""
+        # The system prompt and tools come with the config (cached server-side when possible)
+        query_content = types.Content(role='user', parts=[types.Part.from_text(text=f"""
+            User query: "{user_query}"
+            
+            Analyze this oceanographic query. If you need to query the database, use the appropriate function calls.
+            If you can answer directly based on general oceanographic knowledge, do so.
+            """)])
+        return await self._generate_content(
+            contents=(context_contents or []) + [query_content],
+            config=await self._generation_config(
+                selection,
+                automatic_function_calling=types.AutomaticFunctionCallingConfig(
+                    disable=True  # We want to handle function calls manually for better control
                 ),
-            )
+            ),
+            deadline=deadline,
+            labels=self._selection_labels('plan', selection),
+        )
+    
+    async def _process_with_gemini(self, user_query: str, emit: Optional[EventCallback] = None,
+                                   deadline: Optional[QueryDeadline] = None,
+                                   intent: Optional[Dict[str, Any]] = None,
+                                   session: Optional[ChatSession] = None) -> Dict[str, Any]:
+        """
+        Process query using Gemini function calling. While the planning call is in
+        flight, the query parsed from `intent` runs speculatively. With a `session`,
+        the question is a follow-up: the conversation is sent along, and plans are
+        neither reused nor cached.
+        """
+        speculation = None
+        context_contents = self._session_contents(session)
+        selection = self.tool_selector.select(user_query, intent, follow_up=session is not None)
+        self.metrics.increment('prompt_tokens_saved_total', value=self.tool_selector.full.tokens - selection.tokens)
+        try:
+            # A recurring question reuses its plan and only asks Gemini for the final wording
+            cached_plan = self._cached_plan(user_query) if session is None else None
+            if cached_plan is not None:
+                function_calls, model_content = cached_plan
+                await self._emit(emit, 'plan', {
+                    'function_calls': [{'name': fc.name, 'args': fc.args} for fc in function_calls],
+                    'cached': True,
+                })
+                return await self._handle_function_calls(
+                    user_query, function_calls, model_content, emit, deadline, selection=selection
+                )
+            
+            if session is None:
+                speculation = self._speculate(intent, deadline)
+            
+            initial_response = await self._request_plan(user_query, deadline, selection, context_contents)
             
             # Check if function calling is needed
             if initial_response.function_calls:
+                await self._emit(emit, 'plan', {
+                    'function_calls': [
+                        {'name': fc.name, 'args': canonical_args(fc.args)}
+                        for fc in initial_response.function_calls
+                    ]
+                })
+                if session is None:
+                    self.plan_cache.put(user_query, initial_response.function_calls)
                 # Process function calls
-                return await self._handle_function_calls(user_query, initial_response)
+                return await self._handle_function_calls(
+                    user_query, initial_response.function_calls, initial_response.candidates[0].content, emit, deadline,
+                    speculation, context_contents, selection
+                )
             else:
                 # Direct response without database query
+                await self._emit(emit, 'plan', {'function_calls': []})
+                await self._emit(emit, 'token', {'text': initial_response.text or ''})
                 return {
                     'success': True,
                     'response': initial_response.text,
@@ -151,6 +756,10 @@ class OceanographicAgent:
                     'data_queried': False
                 }
                 
+        except QueryTimeoutError as e:
+            return self._timeout_result(user_query, str(e))
+        except ModelUnavailableError:
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -158,80 +767,175 @@ class OceanographicAgent:
                 'message': 'Error processing query with Gemini',
                 'query': user_query
             }
+        finally:
+            if speculation is not None:
+                speculation.finish()
+    
+    async def _run_template(self, function_name: str, function_args: Dict[str, Any],
+                            deadline: Optional[QueryDeadline] = None,
+                            speculation: Optional[Speculation] = None) -> Any:
+        """
+        Results of a template query, taken from `speculation` when it covers the call.
+        That is a Speculation, or the SharedScans of a batch.
+        """
+        if speculation is not None:
+            results = await speculation.results_for(function_name, function_args)
+            if results is not None:
+                print(f"⚡ Using prefetched results for {function_name}")
+                return results
+        return await self.sql_engine.execute(function_name, deadline=deadline, **function_args)
     
-    async def _handle_function_calls(self, user_query: str, gemini_response) -> Dict[str, Any]:
-        """Handle function calls from Gemini response"""
+    async def _execute_function_call(self, function_name: str, function_args: Dict[str, Any],
+                                     deadline: Optional[QueryDeadline] = None,
+                                     speculation: Optional[Speculation] = None) -> Tuple[Dict[str, Any], List[str]]:
+        """Execute a single function call against the SQL engine and summarize it for the LLM"""
         
-        function_results = []
-        data_summaries = []
+        print(f"🔧 Executing function: {function_name}")
+        print(f"   Args: {function_args}")
         
-        for function_call in gemini_response.function_calls:
-            function_name = function_call.name
-            function_args = function_call.args
-            
-            print(f"🔧 Executing function: {function_name}")
-            print(f"   Args: {function_args}")
-            
-            # Execute the appropriate SQL query based on function call
-            try:
-                if function_name == 'query_aggregate_statistics':
-                    results = self.sql_engine.query_aggregate_statistics(**function_args)
-                    function_results.append({
-                        'function': function_name,
-                        'results': results,
-                        'parameters': function_args
-                    })
-                    data_summaries.extend(self._summarize_aggregate_results(results))
-                    
-                elif function_name == 'detect_anomalies_and_trends':
-                    results = self.sql_engine.detect_anomalies_and_trends(**function_args)
-                    function_results.append({
-                        'function': function_name,
-                        'results': results,
-                        'parameters': function_args
-                    })
-                    data_summaries.extend(self._summarize_anomaly_results(results))
-                    
-                elif function_name == 'query_profile_data':
-                    results = self.sql_engine.query_profile_data(**function_args)
-                    function_results.append({
-                        'function': function_name,
-                        'results': results[:10],  # Limit for summary
-                        'total_profiles': len(results),
-                        'parameters': function_args
-                    })
-                    data_summaries.extend(self._summarize_profile_results(results, function_args))
-                    
-                elif function_name == 'compare_oceanographic_data':
-                    results = self.sql_engine.compare_oceanographic_data(**function_args)
-                    function_results.append({
-                        'function': function_name,
-                        'results': results,
-                        'parameters': function_args
-                    })
-                    data_summaries.extend(self._summarize_comparison_results(results))
-                    
-            except Exception as e:
-                function_results.append({
+        try:
+            if function_name == 'query_aggregate_statistics':
+                results = await self._run_template('query_aggregate_statistics', function_args, deadline, speculation)
+                return {
                     'function': function_name,
-                    'error': str(e),
+                    'results': results,
                     'parameters': function_args
+                }, self._summarize_aggregate_results(results)
+                
+            elif function_name == 'detect_anomalies_and_trends':
+                results = await self._run_template('detect_anomalies_and_trends', function_args, deadline, speculation)
+                return {
+                    'function': function_name,
+                    'results': results,
+                    'parameters': function_args
+                }, self._summarize_anomaly_results(results)
+                
+            elif function_name == 'query_profile_data':
+                results = await self._run_template('query_profile_data', function_args, deadline, speculation)
+                return {
+                    'function': function_name,
+                    'results': results,
+                    'total_profiles': len(results),
+                    'parameters': function_args
+                }, self._summarize_profile_results(results, function_args)
+                
+            elif function_name == 'compare_oceanographic_data':
+                results = await self._run_template('compare_oceanographic_data', function_args, deadline, speculation)
+                return {
+                    'function': function_name,
+                    'results': results,
+                    'parameters': function_args
+                }, self._summarize_comparison_results(results)
+            
+            return {
+                'function': function_name,
+                'error': f'Unknown function: {function_name}',
+                'parameters': function_args
+            }, []
+        
+        except QueryTimeoutError as e:
+            return {
+                'function': function_name,
+                'error': str(e),
+                'timed_out': True,
+                'parameters': function_args
+            }, []
+        except Exception as e:
+            return {
+                'function': function_name,
+                'error': str(e),
+                'parameters': function_args
+            }, []
+    
+    async def _execute_function_calls(self, function_calls, emit: Optional[EventCallback] = None,
+                                      deadline: Optional[QueryDeadline] = None,
+                                      speculation: Optional[Speculation] = None) -> Tuple[List[Dict[str, Any]], List[List[str]]]:
+        """
+        Execute independent function calls concurrently, capped per request.
+        Identical calls are executed once; results keep the order of the calls.
+        """
+        semaphore = asyncio.Semaphore(self.config.MAX_PARALLEL_FUNCTION_CALLS)
+        pending: Dict[str, asyncio.Task] = {}
+        call_tasks = []
+        
+        async def run_call(function_name: str, function_args: Dict[str, Any]):
+            async with semaphore:
+                await self._emit(emit, 'function_started', {'function': function_name, 'args': function_args})
+                result, summaries = await self._execute_function_call(function_name, function_args, deadline, speculation)
+                await self._emit(emit, 'function_finished', {
+                    'function': function_name,
+                    'row_count': result.get('total_profiles', len(result.get('results', []))),
+                    'error': result.get('error'),
                 })
+                return result, summaries
+        
+        for function_call in function_calls:
+            function_args = canonical_args(function_call.args)
+            key = canonical_call_key(function_call.name, function_args)
+            if key not in pending:
+                pending[key] = asyncio.ensure_future(run_call(function_call.name, function_args))
+            call_tasks.append(pending[key])
+        
+        outcomes = await asyncio.gather(*call_tasks)
+        function_results = [result for result, _ in outcomes]
+        data_summaries = [summaries for _, summaries in outcomes]
+        return function_results, data_summaries
+    
+    async def _handle_function_calls(self, user_query: str, function_calls, model_content,
+                                     emit: Optional[EventCallback] = None,
+                                     deadline: Optional[QueryDeadline] = None,
+                                     speculation: Optional[Speculation] = None,
+                                     context_contents: Optional[List[Any]] = None,
+                                     selection: Optional[PromptSelection] = None) -> Dict[str, Any]:
+        """
+        Run the planned function calls and word the answer: from a template when
+        the results are well structured, otherwise (or when the user asks for an
+        interpretation) with a second Gemini call. `model_content` is the model
+        turn that requested the calls (from Gemini, or rebuilt from a cached plan);
+        `context_contents` is the conversation before the question, if any, and
+        `selection` the tools and system prompt the plan was made with.
+        """
+        
+        function_results, data_summaries = await self._execute_function_calls(function_calls, emit, deadline, speculation)
+        
+        if deadline is not None and deadline.expired():
+            # No time left for the second model call; report what finished
+            return await self._partial_result(user_query, function_results, deadline, emit)
+        
+        if self.config.TEMPLATED_ANSWERS and not self._asks_for_interpretation(user_query):
+            response_text = render_answer(function_results)
+            if response_text is not None:
+                self.metrics.increment('agent_answer_total', {'source': 'template'})
+                await self._emit(emit, 'token', {'text': response_text})
+                return {
+                    'success': True,
+                    'response': response_text,
+                    'query': user_query,
+                    'function_calls_made': True,
+                    'function_results': function_results,
+                    'data_queried': True,
+                    'templated': True,
+                    'summary_stats': self._generate_summary_stats(function_results)
+                }
+        self.metrics.increment('agent_answer_total', {'source': 'model'})
         
         # Create function response content
         function_response_parts = []
+        budget = self.config.FUNCTION_RESPONSE_TOKEN_BUDGET // max(1, len(function_results))
+        response_tokens = 0
         for i, result in enumerate(function_results):
             if 'error' in result:
                 response_data = {'error': result['error']}
             else:
-                # Pass the full structured results to Gemini so it knows all parameters
+                # A bounded digest of the results; the full rows are kept for visualization
                 response_data = {
-                    'results': result['results'],  # Full structured data
-                    'summary': data_summaries[i] if i < len(data_summaries) else None
+                    'results': digest_function_result(result, budget),
+                    'summary': data_summaries[i] or None
                 }
+            response_tokens += estimate_tokens(response_data)
 
             function_response_part = types.Part.from_function_response(
-                name=gemini_response.function_calls[i].name,
+                name=function_calls[i].name,
                 response=response_data,
             )
             function_response_parts.append(function_response_part)
@@ -240,6 +944,7 @@ class OceanographicAgent:
             role='model', 
             parts=function_response_parts
         )
+        self.metrics.observe('function_response_tokens', response_tokens)
         
         # Get final response from Gemini with the function results
         user_content = types.Content(
@@ -247,23 +952,38 @@ class OceanographicAgent:
             parts=[types.Part.from_text(text=user_query)],
         )
         
-        final_response = self.client.models.generate_content(
-            model=self.config.GEMINI_MODEL,
-            contents=[
-                user_content,
-                gemini_response.candidates[0].content,
-                function_response_content,
-            ],
-            config=types.GenerateContentConfig(
-                tools=self.tools,
-            ),
-        )
+        final_contents = (context_contents or []) + [
+            user_content,
+            model_content,
+            function_response_content,
+        ]
+        # The answer call declares every tool the plan called, which a cached plan may not have been selected for
+        selection = self.tool_selector.including(selection or self.tool_selector.full, [fc.name for fc in function_calls])
+        final_config = await self._generation_config(selection)
+        labels = self._selection_labels('answer', selection)
+        
+        try:
+            if emit is not None:
+                response_text = await self._stream_content(final_contents, final_config, emit, deadline, labels)
+            else:
+                final_response = await self._generate_content(
+                    contents=final_contents, config=final_config, deadline=deadline, labels=labels
+                )
+                response_text = final_response.text
+        except QueryTimeoutError:
+            return await self._partial_result(user_query, function_results, deadline, emit)
+        except ModelUnavailableError as e:
+            # The data is already in hand; describe it locally rather than re-running the query
+            print(f"⚠️ {e}; summarizing the results locally")
+            self.metrics.increment('agent_route_total', {'route': ModelRouter.FALLBACK, 'reason': 'gemini_failed'})
+            await self._emit(emit, 'fallback', {'reason': 'gemini_failed'})
+            response_text = None
         
         # Handle case where Gemini response might not have text
-        response_text = final_response.text
         if response_text is None:
             # Generate a fallback response using the function results
-            response_text = self._generate_fallback_from_function_results(function_results, user_query)
+            response_text = render_answer(function_results) or self._generate_fallback_from_function_results(function_results, user_query)
+            await self._emit(emit, 'token', {'text': response_text})
         
         return {
             'success': True,
@@ -275,28 +995,87 @@ class OceanographicAgent:
             'summary_stats': self._generate_summary_stats(function_results)
         }
     
-    async def _process_with_fallback(self, user_query: str) -> Dict[str, Any]:
-        """Process query using fallback method when Gemini is not available"""
+    def _asks_for_interpretation(self, user_query: str) -> bool:
+        """Whether the user wants the results explained, not just reported"""
+        return 'interpret' in self.intent_parser.parse(user_query)['slots']['intent']
+    
+    async def _partial_result(self, user_query: str, function_results: List[Dict[str, Any]],
+                              deadline: QueryDeadline, emit: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """Result for a query whose deadline passed after some function calls completed"""
+        completed = [r for r in function_results if 'error' not in r]
+        if not completed:
+            return self._timeout_result(user_query, deadline.describe())
         
-        # Extract parameters using simple text analysis
-        params = self._extract_parameters_fallback(user_query)
+        response_text = self._generate_fallback_from_function_results(function_results, user_query)
+        response_text += f"\n\n(Partial results: {deadline.describe().lower()} before the analysis finished.)"
+        await self._emit(emit, 'token', {'text': response_text})
         
-        # Determine query type and execute
-        if params.get('operation') == 'anomaly':
-            results = self.sql_engine.detect_anomalies_and_trends(**params)
-            response_text = self._generate_fallback_anomaly_response(results, params)
-        else:
-            results = self.sql_engine.query_aggregate_statistics(**params)
-            response_text = self._generate_fallback_aggregate_response(results, params)
+        return {
+            'success': True,
+            'response': response_text,
+            'query': user_query,
+            'function_calls_made': True,
+            'function_results': function_results,
+            'data_queried': True,
+            'partial': True,
+            'timed_out': True,
+            'summary_stats': self._generate_summary_stats(function_results)
+        }
+    
+    async def _process_with_fallback(self, user_query: str, emit: Optional[EventCallback] = None,
+                                     deadline: Optional[QueryDeadline] = None,
+                                     session: Optional[ChatSession] = None) -> Dict[str, Any]:
+        """
+        Process query using fallback method when Gemini is not available. Follow-ups
+        take the filters they leave out from the session's previous question.
+        """
+        intent = self.intent_parser.parse(user_query)
+        if session is not None:
+            intent = self.sessions.inherit_slots(session, intent)
+        return await self._process_with_intent(user_query, intent, emit, deadline)
+    
+    async def _process_with_intent(self, user_query: str, intent: Dict[str, Any], emit: Optional[EventCallback] = None,
+                                   deadline: Optional[QueryDeadline] = None,
+                                   speculation: Optional[SharedScans] = None) -> Dict[str, Any]:
+        """Run the function call parsed from the query locally and describe its results with templates"""
+        call = PlannedCall(intent['function'], intent['args'])
+        await self._emit(emit, 'plan', {
+            'function_calls': [{'name': call.name, 'args': canonical_args(call.args)}],
+            'fast_path': True,
+        })
+        
+        function_results, _ = await self._execute_function_calls([call], emit, deadline, speculation)
+        result = function_results[0]
+        if result.get('timed_out'):
+            return self._timeout_result(user_query, result['error'])
+        if 'error' in result:
+            return {
+                'success': False,
+                'error': result['error'],
+                'message': 'An error occurred while processing your query.',
+                'query': user_query
+            }
+        
+        # The plain fallback texts still cover results the templates leave to the model
+        response_text = render_answer(function_results)
+        if response_text is None and call.name == 'query_aggregate_statistics':
+            response_text = self._generate_fallback_aggregate_response(result['results'], result['parameters'])
+        elif response_text is None and call.name == 'detect_anomalies_and_trends':
+            response_text = self._generate_fallback_anomaly_response(result['results'], result['parameters'])
+        elif response_text is None:
+            response_text = self._generate_fallback_from_function_results(function_results, user_query)
+        await self._emit(emit, 'token', {'text': response_text})
         
         return {
             'success': True,
             'response': response_text,
             'query': user_query,
-            'function_calls_made': False,
+            'function_calls_made': True,
+            'function_results': function_results,
             'data_queried': True,
-            'results': results,
-            'extracted_parameters': params
+            'summary_stats': self._generate_summary_stats(function_results),
+            'extracted_parameters': result['parameters'],
+            'intent_confidence': intent['confidence'],
         }
     
     def _summarize_aggregate_results(self, results: List[Dict[str, Any]]) -> List[str]:
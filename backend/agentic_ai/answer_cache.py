@@ -0,0 +1,72 @@
+"""
+Cache of complete answers to natural language questions
+"""
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+# Punctuation, except decimal points and dashes inside numbers ("2.5", "2023-01")
+_PUNCTUATION = re.compile(r"(?<!\d)[^\w\s]|[^\w\s](?!\d)")
+
+
+def normalize_query(text: str) -> str:
+    """Query text with case, punctuation and whitespace differences removed"""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+class AnswerCache:
+    """
+    LRU cache of agent results keyed on the normalized question and the data
+    version, so repeated questions skip the model and the database entirely.
+    Entries also expire after `ttl_seconds`, since questions may use relative
+    dates ("last month").
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, result)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query: str, data_version: Any) -> str:
+        return f"{normalize_query(query)}|{data_version}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A copy of the cached result, marked as cached, or None"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return {**entry[1], 'cached': True}
+
+    def put(self, key: str, result: Dict[str, Any]):
+        self._entries[key] = (time.monotonic(), dict(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def attach(self, key: str, field: str, value: Any):
+        """Add data derived from a cached result (e.g. its visualization) to the entry"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[1][field] = value
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
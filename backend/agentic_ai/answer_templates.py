@@ -0,0 +1,176 @@
+"""
+Templated answers for well-structured query results
+
+Aggregates, anomaly scans, regional comparisons and profile retrievals have a
+fixed shape, so their answers can be written without a second model call.
+`render_answer` returns None when the results need explaining (errors, no data,
+or nothing to compare), in which case the model words the answer.
+"""
+from typing import Dict, List, Any, Optional
+
+PARAMETER_UNITS = {
+    'temperature': '°C', 'temp': '°C',
+    'salinity': 'PSU', 'psal': 'PSU',
+    'oxygen': 'µmol/kg', 'doxy': 'µmol/kg',
+    'chlorophyll': 'mg/m³', 'chla': 'mg/m³',
+    'nitrate': 'µmol/kg',
+    'pressure': 'dbar',
+}
+
+OPERATION_LABELS = {
+    'average': 'average', 'mean': 'average', 'avg': 'average',
+    'maximum': 'maximum', 'max': 'maximum',
+    'minimum': 'minimum', 'min': 'minimum',
+    'std': 'standard deviation of', 'standard_deviation': 'standard deviation of',
+    'count': 'number of measurements of',
+    'sum': 'sum of',
+}
+
+PARAMETER_LABELS = {'temp': 'temperature', 'psal': 'salinity', 'doxy': 'oxygen', 'chla': 'chlorophyll', 'ph': 'pH'}
+
+
+def _label(parameter: str) -> str:
+    return PARAMETER_LABELS.get(parameter, parameter)
+
+
+def _format_value(value: float, parameter: str, operation: str = 'average') -> str:
+    if operation == 'count':
+        return f"{int(value):,}"
+    unit = PARAMETER_UNITS.get(parameter, '')
+    return f"{value:.3f} {unit}".rstrip()
+
+
+def _context(params: Dict[str, Any]) -> str:
+    """Where, when and how deep, as a phrase ("in the Bay Of Bengal from ... to ...")"""
+    parts = []
+    if params.get('region'):
+        parts.append(f"in the {params['region'].title()}")
+    date_range = params.get('date_range')
+    if date_range:
+        parts.append(f"from {date_range[0]} to {date_range[-1]}" if len(date_range) > 1 else f"on {date_range[0]}")
+    depth_range = params.get('depth_range')
+    if depth_range:
+        if len(depth_range) > 1:
+            parts.append(f"between {depth_range[0]:g} and {depth_range[1]:g} dbar (≈ meters)")
+        else:
+            parts.append(f"around {depth_range[0]:g} dbar (≈ meters)")
+    return " ".join(parts)
+
+
+def _render_aggregate(results: List[Dict[str, Any]], params: Dict[str, Any]) -> Optional[str]:
+    found = [r for r in results if r.get('value') is not None]
+    if not found:
+        return None
+
+    context = _context(params)
+    lines = []
+    for r in found:
+        operation = r.get('operation', params.get('operation', 'average'))
+        label = OPERATION_LABELS.get(operation, operation)
+        line = f"The {label} {_label(r['parameter'])}"
+        if context:
+            line += f" {context}"
+        line += f" is {_format_value(r['value'], r['parameter'], operation)}"
+        if operation != 'count':
+            line += f", based on {r.get('count', 0):,} measurements"
+        lines.append(line + ".")
+
+    missing = [_label(r['parameter']) for r in results if r.get('value') is None]
+    if missing:
+        lines.append(f"No {', '.join(missing)} data was found for the same filters.")
+    return "\n".join(lines) if len(lines) == 1 else "\n".join(f"• {line}" for line in lines)
+
+
+def _render_anomalies(results: List[Dict[str, Any]], params: Dict[str, Any]) -> Optional[str]:
+    analysed = [r for r in results if 'error' not in r and r.get('total_months')]
+    if not analysed:
+        return None
+
+    context = _context(params)
+    lines = [f"Anomaly and trend analysis{' ' + context if context else ''}:"]
+    for r in analysed:
+        parameter = r['parameter']
+        line = f"• {_label(parameter).capitalize()}: "
+        if r.get('anomaly_count'):
+            line += (f"{r['anomaly_count']} of {r['total_months']} months were anomalous "
+                     f"({r.get('anomaly_rate', 0) * 100:.1f}%)")
+        else:
+            line += f"no anomalous months out of {r['total_months']}"
+        if r.get('period_avg') is not None:
+            line += f"; average {_format_value(r['period_avg'], parameter)}"
+        if r.get('period_min') is not None and r.get('period_max') is not None:
+            line += f", monthly range {r['period_min']:.3f} to {_format_value(r['period_max'], parameter)}"
+        lines.append(line + ".")
+        if r.get('analysis_summary'):
+            lines.append(f"  {r['analysis_summary']}")
+
+    skipped = [_label(r['parameter']) for r in results if 'error' in r]
+    if skipped:
+        lines.append(f"There was not enough data to analyse {', '.join(skipped)}.")
+    return "\n".join(lines)
+
+
+def _render_comparison(results: List[Dict[str, Any]], params: Dict[str, Any]) -> Optional[str]:
+    by_parameter: Dict[str, List[Dict[str, Any]]] = {}
+    for r in results:
+        if r.get('value') is not None:
+            by_parameter.setdefault(r['parameter'], []).append(r)
+    if not by_parameter or any(len(rows) < 2 for rows in by_parameter.values()):
+        # Nothing to compare against
+        return None
+
+    operation = params.get('operation', 'average')
+    context = _context({k: v for k, v in params.items() if k != 'region'})
+    label = OPERATION_LABELS.get(operation, operation).removesuffix(' of')
+    lines = [f"Comparison of {label} values{' ' + context if context else ''}:"]
+    for parameter, rows in by_parameter.items():
+        lines.append(f"• {_label(parameter).capitalize()}: " + ", ".join(
+            f"{r.get('comparison_group', 'unknown')} {_format_value(r['value'], parameter, operation)} (n={r.get('count', 0):,})"
+            for r in rows
+        ))
+        highest = max(rows, key=lambda r: r['value'])
+        lowest = min(rows, key=lambda r: r['value'])
+        lines.append(f"  {highest.get('comparison_group')} is higher than {lowest.get('comparison_group')} by "
+                     f"{_format_value(highest['value'] - lowest['value'], parameter, operation)}.")
+    return "\n".join(lines)
+
+
+def _render_profiles(result: Dict[str, Any], params: Dict[str, Any]) -> Optional[str]:
+    rows = result['results']
+    total = result.get('total_profiles', len(rows))
+    if not total:
+        return None
+
+    context = _context(params)
+    text = f"Retrieved {total:,} profile measurements{' ' + context if context else ''}"
+    dates = [r['date'] for r in rows if r.get('date')]
+    if dates:
+        text += f", dated {min(dates)} to {max(dates)}"
+    return text + "."
+
+
+def render_answer(function_results: List[Dict[str, Any]]) -> Optional[str]:
+    """The answer to a query from its function results, or None if the model should word it"""
+    if not function_results:
+        return None
+
+    sections = []
+    for result in function_results:
+        if 'error' in result or 'results' not in result:
+            return None
+        function_name = result['function']
+        params = result.get('parameters') or {}
+        if function_name == 'query_aggregate_statistics':
+            text = _render_aggregate(result['results'], params)
+        elif function_name == 'detect_anomalies_and_trends':
+            text = _render_anomalies(result['results'], params)
+        elif function_name == 'compare_oceanographic_data':
+            text = _render_comparison(result['results'], params)
+        elif function_name == 'query_profile_data':
+            text = _render_profiles(result, params)
+        else:
+            text = None
+        if text is None:
+            return None
+        sections.append(text)
+    return "\n\n".join(sections)
@@ -1,8 +1,9 @@
 """
 FastAPI integration for the Agentic AI system
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 import asyncio
@@ -10,6 +11,13 @@ import os
 from datetime import datetime
 
 from .agent import OceanographicAgent
+from .config import AgenticConfig
+from .jobs import get_job_manager
+from .scheduler import RequestScheduler, SchedulerOverloaded, get_scheduler, overloaded_http_exception
+from .deadline import QueryDeadline, request_deadline
+from . import batch
+from .metrics import get_metrics
+from .workload import build_advisor
 
 app = FastAPI(
     title="Agentic AI Oceanographic Query System",
@@ -32,6 +40,7 @@ class QueryRequest(BaseModel):
     user_id: Optional[str] = None
     session_id: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
+    run_async: bool = False  # Return a job id immediately and run the analysis in the background
 
 class QueryResponse(BaseModel):
     success: bool
@@ -43,6 +52,14 @@ class QueryResponse(BaseModel):
     function_results: Optional[List[Dict[str, Any]]] = None
     summary_stats: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    job_id: Optional[str] = None
+    job_status: Optional[str] = None
+    routed_to: Optional[str] = None  # 'fallback' when Gemini was skipped or failed
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None  # Only used for scheduling fairness; batch questions are independent
 
 class DataSummaryRequest(BaseModel):
     region: Optional[str] = None
@@ -50,6 +67,16 @@ class DataSummaryRequest(BaseModel):
     lon_bounds: Optional[List[float]] = None
     date_range: Optional[List[str]] = None
 
+class BatchRequest(BaseModel):
+    function: str = 'query_aggregate_statistics'
+    regions: Optional[List[str]] = None  # Defaults to every configured region
+    parameters: Optional[List[str]] = None
+    start_month: Optional[str] = None  # YYYY-MM; defaults to the data's first month
+    end_month: Optional[str] = None
+    args: Optional[Dict[str, Any]] = None  # Extra arguments for every job, e.g. operation
+    workers: Optional[int] = None
+    output_format: str = 'json'  # json or parquet
+
 # Global agent instance
 agent: Optional[OceanographicAgent] = None
 
@@ -64,10 +91,16 @@ def get_agent() -> OceanographicAgent:
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the agent on startup"""
-    get_agent()
+    """Initialize the agent on startup and start warming its caches"""
+    get_agent().start_warmup()
     print("Agentic AI Oceanographic Query System started")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush the agent's logs and release its connections and executors"""
+    if agent is not None:
+        await agent.aclose()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -89,7 +122,7 @@ async def health_check():
     }
 
 @app.post("/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request):
     """
     Process a natural language oceanographic query
     
@@ -98,7 +131,32 @@ async def process_query(request: QueryRequest):
     """
     try:
         agent = get_agent()
-        result = await agent.process_query(request.query)
+        scheduler = get_scheduler()
+        # Fairness is per session, falling back to the user
+        session_key = request.session_id or request.user_id
+        
+        if request.run_async:
+            if not scheduler.has_capacity(RequestScheduler.BACKGROUND):
+                raise SchedulerOverloaded("The server is busy (background queue is full). Please retry shortly.")
+            
+            async def run_query_job():
+                async with scheduler.slot(RequestScheduler.BACKGROUND, session_key):
+                    deadline = QueryDeadline(agent.config.JOB_TIMEOUT_SECONDS)
+                    return await agent.process_query(request.query, deadline=deadline, session_id=request.session_id)
+            
+            job = await get_job_manager().submit('agentic_query', {'query': request.query, 'session_id': request.session_id}, run_query_job)
+            return QueryResponse(
+                success=True,
+                response='',
+                query=request.query,
+                timestamp=datetime.now().isoformat(),
+                job_id=job['job_id'],
+                job_status=job['status']
+            )
+        
+        async with scheduler.slot(RequestScheduler.ANALYSIS, session_key):
+            async with request_deadline(http_request, agent.config.REQUEST_TIMEOUT_SECONDS) as deadline:
+                result = await agent.process_query(request.query, deadline=deadline, session_id=request.session_id)
         
         return QueryResponse(
             success=result.get('success', False),
@@ -109,12 +167,201 @@ async def process_query(request: QueryRequest):
             data_queried=result.get('data_queried', False),
             function_results=result.get('function_results'),
             summary_stats=result.get('summary_stats'),
-            error=result.get('error')
+            error=result.get('error'),
+            routed_to=result.get('routed_to')
         )
         
+    except SchedulerOverloaded as e:
+        raise overloaded_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/batch")
+async def process_query_batch(request: BatchQueryRequest, http_request: Request):
+    """
+    Answer many natural language queries at once
+    
+    The queries are planned together, function calls that share filters are
+    merged into combined scans, and the scans run concurrently. Answers are
+    returned in the order of the queries, each with its own timing.
+    """
+    agent = get_agent()
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(request.queries) > agent.config.BATCH_QUERY_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {agent.config.BATCH_QUERY_MAX_ITEMS} queries can be sent in one batch"
+        )
+    
+    try:
+        async with get_scheduler().slot(RequestScheduler.ANALYSIS, request.session_id or request.user_id):
+            async with request_deadline(http_request, agent.config.REQUEST_TIMEOUT_SECONDS) as deadline:
+                batch_result = await agent.process_batch(request.queries, deadline=deadline)
+    except SchedulerOverloaded as e:
+        raise overloaded_http_exception(e)
+
+    return {**batch_result, "timestamp": datetime.now().isoformat()}
+
+@app.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """
+    Current load, queue depth and admission counters per priority class
+    """
+    return {
+        "classes": get_scheduler().get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/routing/stats")
+async def get_routing_stats():
+    """
+    Gemini circuit breaker state and rolling latency/error rates used for routing
+    """
+    return {
+        "router": get_agent().router.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Answer, plan, prompt prefix and SQL result caches, speculation, chat sessions and
+    in-flight query coalescing statistics
+    """
+    engine = get_agent().sql_engine
+    prompt_prefix = get_agent().prompt_prefix
+    return {
+        "answer_cache": get_agent().answer_cache.get_stats(),
+        "semantic_cache": get_agent().semantic_cache.get_stats(),
+        "plan_cache": get_agent().plan_cache.get_stats(),
+        "speculation": get_agent().speculation_stats.get_stats(),
+        "prompt_prefix": prompt_prefix.get_stats() if prompt_prefix is not None else None,
+        "sessions": get_agent().sessions.get_stats(),
+        "result_cache": engine.get_cache_stats(),
+        "coalescing": engine.get_coalescing_stats(),
+        "data_version": engine.data_version(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/cache/warmup")
+async def get_cache_warmup_status():
+    """
+    Progress of the cache warmup: how many of the example and frequent logged
+    questions the last pass warmed, failed on or skipped
+    """
+    return get_agent().warmer.get_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_service_metrics():
+    """
+    Service metrics in Prometheus text format
+    """
+    return get_metrics().render_prometheus()
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Get the status of a background analysis job
+    """
+    job = await get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Get the result of a completed background analysis job
+    """
+    manager = get_job_manager()
+    job = await manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job['status'] != manager.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return {**job, "result": await manager.get_result(job_id)}
+
+@app.post("/batch")
+async def submit_batch(request: BatchRequest):
+    """
+    Run a regions x parameters x months sweep on a process pool as a background job.
+    The job result holds the throughput report and the path of the results file.
+    """
+    agent = get_agent()
+    if request.function not in agent.sql_engine.QUERY_FUNCTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown query function: {request.function}")
+    if request.output_format not in ('json', 'parquet'):
+        raise HTTPException(status_code=400, detail="output_format must be json or parquet")
+    if request.output_format == 'parquet' and not batch.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet output requires pyarrow on the server; use output_format json")
+    
+    scheduler = get_scheduler()
+    if not scheduler.has_capacity(RequestScheduler.BACKGROUND):
+        raise overloaded_http_exception(SchedulerOverloaded("The server is busy (background queue is full). Please retry shortly."))
+    
+    def run_sweep() -> Dict[str, Any]:
+        months = batch.sweep_months(agent.db_path, request.start_month, request.end_month)
+        jobs = batch.build_grid(request.function, request.regions, request.parameters, months, request.args)
+        sweep = batch.run_batch(agent.db_path, jobs, request.workers)
+        
+        output_path = os.path.join(
+            agent.config.STATE_DIR, 'batches',
+            f"{request.function}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{request.output_format}"
+        )
+        batch.write_results(sweep['results'], output_path)
+        return {'report': sweep['report'], 'output_path': output_path}
+    
+    async def run_batch_job():
+        async with scheduler.slot(RequestScheduler.BACKGROUND):
+            return await asyncio.get_running_loop().run_in_executor(None, run_sweep)
+    
+    job = await get_job_manager().submit('batch', request.model_dump(), run_batch_job)
+    return job
+
+@app.get("/workload/shapes")
+async def get_workload_shapes(window_hours: Optional[float] = None, limit: int = 20):
+    """
+    Template call shapes of the logged workload, the most total scan time first,
+    with their call counts, cache hit rates and average scan cost
+    """
+    agent = get_agent()
+    if agent.workload_log is None:
+        raise HTTPException(status_code=404, detail="The workload log is disabled")
+    window_seconds = window_hours * 3600 if window_hours else agent.config.INDEX_ADVISOR_WINDOW_SECONDS
+    
+    def read_shapes():
+        agent.workload_log.flush()
+        return agent.workload_log.shapes(window_seconds, limit)
+    
+    return {
+        "window_seconds": window_seconds,
+        "shapes": await asyncio.get_running_loop().run_in_executor(None, read_shapes),
+    }
+
+@app.post("/workload/advice")
+async def submit_index_advice():
+    """
+    Run the index advisor over the logged workload as a background job. The job
+    result lists the measured candidate indexes and the recommended ones; they
+    are only created from the command line (python -m backend.agentic_ai.workload --apply).
+    """
+    agent = get_agent()
+    if agent.workload_log is None:
+        raise HTTPException(status_code=404, detail="The workload log is disabled")
+    
+    scheduler = get_scheduler()
+    if not scheduler.has_capacity(RequestScheduler.BACKGROUND):
+        raise overloaded_http_exception(SchedulerOverloaded("The server is busy (background queue is full). Please retry shortly."))
+    
+    advisor = build_advisor(agent.db_path, agent.config, agent.workload_log)
+    
+    async def run_advice_job():
+        async with scheduler.slot(RequestScheduler.BACKGROUND):
+            return await asyncio.get_running_loop().run_in_executor(None, advisor.advise)
+    
+    return await get_job_manager().submit('index_advice', {'db_path': agent.db_path}, run_advice_job)
+
 @app.post("/data-summary")
 async def get_data_summary(request: DataSummaryRequest):
     """
@@ -134,7 +381,7 @@ async def get_data_summary(request: DataSummaryRequest):
         if request.date_range:
             kwargs['date_range'] = request.date_range
         
-        summary = agent.get_available_data_summary(**kwargs)
+        summary = await agent.sql_engine.execute('get_data_summary', **kwargs)
         
         return {
             "success": True,
@@ -150,48 +397,7 @@ async def get_query_examples():
     """
     Get example queries that the system can handle
     """
-    examples = [
-        {
-            "category": "Basic Statistics",
-            "queries": [
-                "What is the average temperature in the Bay of Bengal last year?",
-                "Show me the maximum salinity values in the Arabian Sea during 2023",
-                "What's the oxygen concentration at 500m depth in the North Pacific?",
-            ]
-        },
-        {
-            "category": "Anomaly Detection",
-            "queries": [
-                "Are there any unusual trends in Bay of Bengal in the last year?",
-                "Detect temperature anomalies in the Arabian Sea during summer 2023",
-                "Show me any strange patterns in oxygen levels in the Indian Ocean",
-            ]
-        },
-        {
-            "category": "Comparative Analysis",
-            "queries": [
-                "Compare average temperatures between Bay of Bengal and Arabian Sea",
-                "How does salinity in 2023 compare to 2022 in the North Pacific?",
-                "Show differences in oxygen levels between surface and 1000m depth",
-            ]
-        },
-        {
-            "category": "Profile Data",
-            "queries": [
-                "Show me vertical temperature profiles in the Southern Ocean",
-                "Get salinity profiles from the Mediterranean Sea in March 2023",
-                "Display recent oxygen measurements in the North Atlantic",
-            ]
-        },
-        {
-            "category": "Temporal Analysis",
-            "queries": [
-                "Show temperature trends over the past 5 years in the Bay of Bengal",
-                "What are the seasonal patterns in salinity in the Arabian Sea?",
-                "Display monthly oxygen variations in the North Pacific",
-            ]
-        }
-    ]
+    examples = AgenticConfig.EXAMPLE_QUERIES
     
     return {
         "examples": examples,
@@ -0,0 +1,232 @@
+"""
+Batch analytics over a grid of regions, parameters and months
+
+Sweeps such as "every region x every parameter x every month" are expanded into
+independent (function, args) jobs and distributed over a process pool. Each worker
+process opens one read-only SQLite connection and reuses it for all of its jobs.
+
+Usage:
+    python -m backend.agentic_ai.batch --function query_aggregate_statistics \\
+        --start-month 2025-01 --end-month 2025-12 --output sweep.parquet
+"""
+import argparse
+import calendar
+import importlib.util
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+from .config import AgenticConfig
+from .sql_engine import SQLTemplateEngine
+
+# Parameters swept when none are given
+DEFAULT_PARAMETERS = ['temperature', 'salinity', 'oxygen', 'chlorophyll', 'nitrate']
+
+
+class ReadOnlySQLEngine(SQLTemplateEngine):
+    """SQL template engine that reuses one read-only connection"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+    @contextmanager
+    def _get_connection(self):
+        yield self._conn
+
+
+# Engine of the current worker process
+_worker_engine: Optional[ReadOnlySQLEngine] = None
+
+
+def _init_worker(db_path: str):
+    """Open the worker's read-only connection"""
+    global _worker_engine
+    _worker_engine = ReadOnlySQLEngine(db_path)
+
+
+def _run_job(index: int, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one grid job in a worker process"""
+    started = time.perf_counter()
+    try:
+        if job['function'] not in SQLTemplateEngine.QUERY_FUNCTIONS:
+            raise ValueError(f"Unknown query function: {job['function']}")
+        result = getattr(_worker_engine, job['function'])(**job['args'])
+        error = None
+    except Exception as e:
+        result = None
+        error = str(e)
+    return {
+        'index': index,
+        'function': job['function'],
+        'args': job['args'],
+        'result': result,
+        'error': error,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def month_range(start_month: str, end_month: str) -> List[str]:
+    """Months from start to end inclusive, as YYYY-MM"""
+    year, month = map(int, start_month.split('-'))
+    end_year, end = map(int, end_month.split('-'))
+    months = []
+    while (year, month) <= (end_year, end):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def data_months(db_path: str) -> List[str]:
+    """All months covered by profiles in the database"""
+    with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+        earliest, latest = conn.execute("SELECT MIN(profile_date), MAX(profile_date) FROM profiles").fetchone()
+    if not earliest:
+        return []
+    return month_range(earliest[:7], latest[:7])
+
+
+def sweep_months(db_path: str, start_month: Optional[str] = None, end_month: Optional[str] = None) -> List[str]:
+    """
+    Months to sweep: from `start_month` to `end_month`, a missing bound defaulting
+    to the first/last month with data (or to the other bound when there is none)
+    """
+    months = data_months(db_path)
+    if not (start_month or end_month):
+        return months
+    start = start_month or (months[0] if months else end_month)
+    end = end_month or (months[-1] if months else start_month)
+    return month_range(start, end)
+
+
+def parquet_available() -> bool:
+    """Whether Parquet output can be written (pyarrow is installed)"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def build_grid(
+    function_name: str = 'query_aggregate_statistics',
+    regions: Optional[List[str]] = None,
+    parameters: Optional[List[str]] = None,
+    months: Optional[List[str]] = None,
+    extra_args: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Expand regions x parameters x months into jobs. Regions default to every
+    configured region; parameters to the core measured parameters.
+    """
+    regions = regions or list(AgenticConfig.REGIONS.keys())
+    parameters = parameters or DEFAULT_PARAMETERS
+    jobs = []
+    for region in regions:
+        for parameter in parameters:
+            for month in months or [None]:
+                args = {'region': region, 'parameters': [parameter], **(extra_args or {})}
+                if month:
+                    year, month_number = map(int, month.split('-'))
+                    last_day = calendar.monthrange(year, month_number)[1]
+                    args['date_range'] = [f"{month}-01", f"{month}-{last_day:02d}"]
+                jobs.append({'function': function_name, 'args': args})
+    return jobs
+
+
+def run_batch(db_path: str, jobs: List[Dict[str, Any]], workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run jobs across a process pool. Returns the per-job results in grid order and
+    a throughput report.
+    """
+    workers = max(1, min(workers or AgenticConfig.BATCH_WORKERS, len(jobs) or 1))
+    started = time.perf_counter()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+
+    # Spawn rather than fork: the API server that may call this is multi-threaded
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(db_path,)) as pool:
+        futures = [pool.submit(_run_job, i, job) for i, job in enumerate(jobs)]
+        for future in as_completed(futures):
+            outcome = future.result()
+            results[outcome['index']] = outcome
+
+    wall_seconds = time.perf_counter() - started
+    job_seconds = sum(r['seconds'] for r in results)
+    report = {
+        'jobs': len(jobs),
+        'failed': sum(1 for r in results if r['error']),
+        'workers': workers,
+        'wall_seconds': round(wall_seconds, 3),
+        'job_seconds': round(job_seconds, 3),
+        'jobs_per_second': round(len(jobs) / wall_seconds, 2) if wall_seconds else 0.0,
+        'parallel_efficiency': round(job_seconds / (wall_seconds * workers), 2) if wall_seconds else 0.0,
+    }
+    return {'results': results, 'report': report}
+
+
+def write_results(results: List[Dict[str, Any]], output_path: str):
+    """
+    Write results as JSON, or as Parquet when the path ends in .parquet (requires
+    pyarrow). In Parquet, args and result are stored as JSON strings.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    if not output_path.endswith('.parquet'):
+        with open(output_path, 'w') as f:
+            json.dump(results, f, default=str)
+        return
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow. Install with: pip install pyarrow")
+
+    table = pa.table({
+        'index': [r['index'] for r in results],
+        'function': [r['function'] for r in results],
+        'args': [json.dumps(r['args'], default=str) for r in results],
+        'result': [json.dumps(r['result'], default=str) if r['result'] is not None else None for r in results],
+        'error': [r['error'] for r in results],
+        'seconds': [r['seconds'] for r in results],
+    })
+    pq.write_table(table, output_path)
+
+
+def main():
+    """Run a batch sweep from the command line"""
+    default_db = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "argo_data.sqlite")
+    parser = argparse.ArgumentParser(description="Batch analytics over regions x parameters x months")
+    parser.add_argument("--db", default=os.getenv('DATABASE_PATH', default_db))
+    parser.add_argument("--function", default='query_aggregate_statistics', choices=SQLTemplateEngine.QUERY_FUNCTIONS)
+    parser.add_argument("--regions", nargs='*', help="Defaults to every configured region")
+    parser.add_argument("--parameters", nargs='*', help=f"Defaults to {' '.join(DEFAULT_PARAMETERS)}")
+    parser.add_argument("--start-month", help="YYYY-MM; defaults to the first month with data")
+    parser.add_argument("--end-month", help="YYYY-MM; defaults to the last month with data")
+    parser.add_argument("--operation", help="Aggregate operation for query_aggregate_statistics")
+    parser.add_argument("--workers", type=int, default=AgenticConfig.BATCH_WORKERS)
+    parser.add_argument("--output", default="batch_results.json", help=".json or .parquet")
+    args = parser.parse_args()
+    if args.output.endswith('.parquet') and not parquet_available():
+        parser.error("Parquet output requires pyarrow. Install with: pip install pyarrow")
+
+    months = sweep_months(args.db, args.start_month, args.end_month)
+
+    extra_args = {'operation': args.operation} if args.operation else None
+    jobs = build_grid(args.function, args.regions, args.parameters, months, extra_args)
+    print(f"🧮 Running {len(jobs)} jobs on {args.workers} workers...")
+
+    batch = run_batch(args.db, jobs, args.workers)
+    write_results(batch['results'], args.output)
+
+    report = batch['report']
+    print(f"✅ {report['jobs']} jobs ({report['failed']} failed) in {report['wall_seconds']}s "
+          f"- {report['jobs_per_second']} jobs/s, parallel efficiency {report['parallel_efficiency']}")
+    print(f"📄 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
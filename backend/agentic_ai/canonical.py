@@ -0,0 +1,17 @@
+"""
+Canonical forms for function calls and their arguments
+"""
+import json
+from typing import Dict, Any, Optional
+
+
+def canonical_args(args: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert function call arguments into plain, JSON-compatible Python values"""
+    if not args:
+        return {}
+    return json.loads(json.dumps(dict(args), sort_keys=True, default=str))
+
+
+def canonical_call_key(function_name: str, args: Optional[Dict[str, Any]]) -> str:
+    """Stable string key identifying a function call, independent of argument order"""
+    return f"{function_name}:{json.dumps(canonical_args(args), sort_keys=True, separators=(',', ':'))}"
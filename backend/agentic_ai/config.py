@@ -12,46 +12,76 @@ Configuration settings    # Oceanographic regions mapping
 """
 import os
 from typing import Dict, Any
+from dotenv import load_dotenv
+
+# Settings below are read from the environment, so .env must be loaded first
+load_dotenv()
 
 class AgenticConfig:
     # Gemini API Configuration
     GEMINI_MODEL = "gemini-2.0-flash-001"
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    # Optional endpoint override, e.g. the local fake model server used in development
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+    # Upper bound for a single model round trip
+    GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+    # Latency SLO per model call; slower calls are abandoned for the local fallback
+    GEMINI_SLO_SECONDS = float(os.getenv("GEMINI_SLO_SECONDS", "8"))
+    # Routing between Gemini and the fallback (see routing.ModelRouter)
+    ROUTER_WINDOW_SECONDS = 300
+    ROUTER_MIN_SAMPLES = 5
+    ROUTER_ERROR_RATE_THRESHOLD = 0.5
+    ROUTER_CONSECUTIVE_FAILURES = 3
+    ROUTER_COOLDOWN_SECONDS = 30
+    ROUTER_DEGRADED_FRACTION = 0.75
+    ROUTER_PROBE_RATIO = 0.1
     
-    # System Prompts
-    SYSTEM_PROMPT = """
+    # System prompt, in sections. Each request carries the role, answering and data
+    # sections, the guidance for the tools it offers, and the depth section when the
+    # question is about depth (see tool_selection)
+    SYSTEM_PROMPT_ROLE = """
     You are an expert oceanographic data analyst with deep knowledge of ARGO float data,
     marine parameters, and ocean science. You help users query and analyze oceanographic data
     through natural language conversations.
-
+    """
+    TOOL_PROMPTS = {
+        "query_aggregate_statistics": """
+       - For basic statistics (averages, max, min, counts): use query_aggregate_statistics""",
+        "detect_anomalies_and_trends": """
+       - For anomaly detection or unusual trends: use detect_anomalies_and_trends
+         - If no timeframe is specified, the system will analyze the last year
+         - If no parameters are specified, the system will analyze all available parameters
+         - The analysis includes monthly trends, statistical anomalies, and trend directions""",
+        "query_profile_data": """
+       - For detailed profile data: use query_profile_data""",
+        "compare_oceanographic_data": """
+       - For comparisons between regions/time periods: use compare_oceanographic_data""",
+    }
+    SYSTEM_PROMPT_ANSWERING = """
     When users ask questions about oceanographic data, you should:
     1. First try to understand what they're looking for
-    2. Use the appropriate function call based on the query type:
-       - For basic statistics (averages, max, min, counts): use query_aggregate_statistics
-       - For anomaly detection or unusual trends: use detect_anomalies_and_trends
-       - For detailed profile data: use query_profile_data
-       - For comparisons between regions/time periods: use compare_oceanographic_data
-    3. For anomaly detection:
-       - If no timeframe is specified, the system will analyze the last year
-       - If no parameters are specified, the system will analyze all available parameters
-       - The analysis includes monthly trends, statistical anomalies, and trend directions
-    4. Analyze the data and provide clear, scientific insights
-    5. Always explain your findings in context
-    6. CRITICAL: When you receive function results, ALWAYS enumerate ALL parameters and their values in your response. Do not omit any parameters from the results.
-
+    2. Use the appropriate function call based on the query type:{tools}
+    3. Analyze the data and provide clear, scientific insights
+    4. Always explain your findings in context
+    5. CRITICAL: When you receive function results, ALWAYS enumerate ALL parameters and their values in your response. Do not omit any parameters from the results.
+    """
+    SYSTEM_PROMPT_DEPTH = """
     IMPORTANT DEPTH/PRESSURE CONVERSION:
     - When users mention "depth", they are referring to pressure measurements
     - Pressure is measured in decibar (dbar)
     - Conversion: 1 decibar = 1 meter of depth (approximately)
     - All depth-related queries should use pressure values in decibar
     - Always clarify in responses that pressure values represent depth in meters
-
+    """
+    SYSTEM_PROMPT_DATA = """
     You have access to comprehensive ARGO float data including temperature, salinity,
     pressure, oxygen, chlorophyll, nitrate, and pH parameters across global oceans.
 
     IMPORTANT: Always use function calls to query the database. Do not try to answer from general knowledge alone.
     IMPORTANT: When summarizing function results, list EVERY parameter that was returned, even if the user only asked about some of them.
-    """    # Oceanographic regions mapping
+    """
+
+    # Oceanographic regions mapping
     REGIONS = {
         "bay of bengal": {"lat_min": 5, "lat_max": 22, "lon_min": 80, "lon_max": 95},
         "arabian sea": {"lat_min": 8, "lat_max": 25, "lon_min": 50, "lon_max": 80},
@@ -86,6 +116,130 @@ class AgenticConfig:
         "profile", "vertical", "time_series", "temporal"
     ]
 
+    # Concurrency settings
+    # SQL template queries run on a bounded thread pool so slow scans never block the event loop
+    SQL_EXECUTOR_WORKERS = int(os.getenv("SQL_EXECUTOR_WORKERS", "4"))
+    # Upper bound on function calls from a single Gemini response executed at the same time
+    MAX_PARALLEL_FUNCTION_CALLS = int(os.getenv("MAX_PARALLEL_FUNCTION_CALLS", "3"))
+
+    # Local state (job results, logs) lives here
+    STATE_DIR = os.getenv("AGENTIC_STATE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".state"))
+    # Number of background analysis jobs running at the same time
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    # Time limits: interactive requests (overridable per request with X-Request-Timeout) and background jobs
+    REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "60"))
+    JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "1800"))
+    # Memory budget of the SQL result cache
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Cache of complete answers to repeated questions
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(6 * 3600)))
+    # Paraphrase cache: cosine similarity needed to reuse an answer, and share of hits re-checked
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.7"))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+    SEMANTIC_CACHE_DIM = 2048
+    SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0.05"))
+    # Cache of Gemini function-call plans per normalized question
+    PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "2000"))
+    PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", "3600"))
+    # Questions the local intent parser understands at least this well skip Gemini
+    FAST_PATH_CONFIDENCE = float(os.getenv("FAST_PATH_CONFIDENCE", "0.8"))
+    # Below that, questions parsed at least this well start their likely query while Gemini plans
+    SPECULATION_MIN_CONFIDENCE = float(os.getenv("SPECULATION_MIN_CONFIDENCE", "0.4"))
+    # Word answers for well-structured results from templates instead of a second Gemini call
+    TEMPLATED_ANSWERS = os.getenv("TEMPLATED_ANSWERS", "true").lower() in ("1", "true", "yes")
+    # Approximate token budget for the function results sent back to Gemini, shared by the calls of one answer
+    FUNCTION_RESPONSE_TOKEN_BUDGET = int(os.getenv("FUNCTION_RESPONSE_TOKEN_BUDGET", "3000"))
+    # Chat sessions: idle lifetime, context budget (summary plus recent turns) and turns kept verbatim
+    SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+    SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(2 * 3600)))
+    SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "1500"))
+    SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "6"))
+    # Lifetime of the Gemini context cache holding the system prompt and tool declarations
+    PROMPT_PREFIX_CACHE_TTL_SECONDS = float(os.getenv("PROMPT_PREFIX_CACHE_TTL_SECONDS", "3600"))
+    # Prompt prefixes smaller than this are sent inline (the API refuses to cache them)
+    PROMPT_PREFIX_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_PREFIX_CACHE_MIN_TOKENS", "1024"))
+    # Intent confidence above which a request only offers the tools the question needs
+    # (above 1 every request offers every tool)
+    TOOL_SELECTION_MIN_CONFIDENCE = float(os.getenv("TOOL_SELECTION_MIN_CONFIDENCE", "0.5"))
+    # Largest number of questions in one /query/batch request
+    BATCH_QUERY_MAX_ITEMS = int(os.getenv("BATCH_QUERY_MAX_ITEMS", "50"))
+    # Log of answered questions (text and function calls), kept this long
+    QUERY_LOG_RETENTION_SECONDS = float(os.getenv("QUERY_LOG_RETENTION_SECONDS", str(30 * 24 * 3600)))
+    # Cache warmup after startup and data refreshes: replay the example questions and the
+    # most frequent questions logged recently; check for new data this often
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+    WARMUP_TOP_QUERIES = int(os.getenv("WARMUP_TOP_QUERIES", "50"))
+    WARMUP_LOG_WINDOW_SECONDS = float(os.getenv("WARMUP_LOG_WINDOW_SECONDS", str(7 * 24 * 3600)))
+    WARMUP_POLL_SECONDS = float(os.getenv("WARMUP_POLL_SECONDS", "60"))
+    WARMUP_CALL_TIMEOUT_SECONDS = float(os.getenv("WARMUP_CALL_TIMEOUT_SECONDS", "300"))
+    # Log of every template call (shape, arguments, cache status, work and duration) for the index advisor;
+    # rows are written in batches of WORKLOAD_LOG_FLUSH_ROWS or every WORKLOAD_LOG_FLUSH_SECONDS
+    WORKLOAD_LOG_ENABLED = os.getenv("WORKLOAD_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+    WORKLOAD_LOG_RETENTION_SECONDS = float(os.getenv("WORKLOAD_LOG_RETENTION_SECONDS", str(30 * 24 * 3600)))
+    WORKLOAD_LOG_FLUSH_ROWS = int(os.getenv("WORKLOAD_LOG_FLUSH_ROWS", "100"))
+    WORKLOAD_LOG_FLUSH_SECONDS = float(os.getenv("WORKLOAD_LOG_FLUSH_SECONDS", "5"))
+    # Index advisor: call shapes considered (most expensive first, seen at least MIN_SCANS times in the
+    # window), timed replays per candidate, and the speedup a candidate index must reach
+    INDEX_ADVISOR_TOP_SHAPES = int(os.getenv("INDEX_ADVISOR_TOP_SHAPES", "5"))
+    INDEX_ADVISOR_WINDOW_SECONDS = float(os.getenv("INDEX_ADVISOR_WINDOW_SECONDS", str(7 * 24 * 3600)))
+    INDEX_ADVISOR_MIN_SCANS = int(os.getenv("INDEX_ADVISOR_MIN_SCANS", "3"))
+    INDEX_ADVISOR_REPEATS = int(os.getenv("INDEX_ADVISOR_REPEATS", "3"))
+    INDEX_ADVISOR_MIN_SPEEDUP = float(os.getenv("INDEX_ADVISOR_MIN_SPEEDUP", "1.2"))
+    # Worker processes for batch analytics sweeps
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+
+    # Example questions by category, served by /examples and replayed by the cache warmup
+    EXAMPLE_QUERIES = [
+        {
+            "category": "Basic Statistics",
+            "queries": [
+                "What is the average temperature in the Bay of Bengal last year?",
+                "Show me the maximum salinity values in the Arabian Sea during 2023",
+                "What's the oxygen concentration at 500m depth in the North Pacific?",
+            ]
+        },
+        {
+            "category": "Anomaly Detection",
+            "queries": [
+                "Are there any unusual trends in Bay of Bengal in the last year?",
+                "Detect temperature anomalies in the Arabian Sea during summer 2023",
+                "Show me any strange patterns in oxygen levels in the Indian Ocean",
+            ]
+        },
+        {
+            "category": "Comparative Analysis",
+            "queries": [
+                "Compare average temperatures between Bay of Bengal and Arabian Sea",
+                "How does salinity in 2023 compare to 2022 in the North Pacific?",
+                "Show differences in oxygen levels between surface and 1000m depth",
+            ]
+        },
+        {
+            "category": "Profile Data",
+            "queries": [
+                "Show me vertical temperature profiles in the Southern Ocean",
+                "Get salinity profiles from the Mediterranean Sea in March 2023",
+                "Display recent oxygen measurements in the North Atlantic",
+            ]
+        },
+        {
+            "category": "Temporal Analysis",
+            "queries": [
+                "Show temperature trends over the past 5 years in the Bay of Bengal",
+                "What are the seasonal patterns in salinity in the Arabian Sea?",
+                "Display monthly oxygen variations in the North Pacific",
+            ]
+        }
+    ]
+
+    # Scheduler priority classes: (max concurrent requests, max queued requests)
+    SCHEDULER_LIMITS = {
+        "interactive": (int(os.getenv("INTERACTIVE_CONCURRENCY", "32")), int(os.getenv("INTERACTIVE_QUEUE", "256"))),
+        "analysis": (int(os.getenv("ANALYSIS_CONCURRENCY", "4")), int(os.getenv("ANALYSIS_QUEUE", "32"))),
+        "background": (int(os.getenv("BACKGROUND_CONCURRENCY", "2")), int(os.getenv("BACKGROUND_QUEUE", "64"))),
+    }
+
     @staticmethod
     def get_region_bounds(region_name: str) -> Dict[str, float]:
         """Get lat/lon bounds for a named region"""
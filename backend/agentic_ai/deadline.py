@@ -0,0 +1,106 @@
+"""
+Per-request deadlines and cancellation for query processing
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import Request
+
+
+class QueryTimeoutError(Exception):
+    """Raised when work is stopped because its deadline passed or it was cancelled"""
+
+
+class QueryDeadline:
+    """
+    Time budget and cancellation flag shared by all work done for one request.
+
+    Checked from SQLite's progress handler on executor threads, so it must be
+    thread-safe. A child deadline expires with its parent but can also be
+    cancelled on its own (e.g. one abandoned query of a request).
+
+    Executor threads charge the CPU time they spend on its work with `charge`;
+    the time is added to every ancestor as well.
+    """
+
+    def __init__(self, timeout_seconds: Optional[float] = None, parent: Optional["QueryDeadline"] = None):
+        self.expires_at = time.monotonic() + timeout_seconds if timeout_seconds else None
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = parent.expires_at if self.expires_at is None else min(self.expires_at, parent.expires_at)
+        self.parent = parent
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self.cpu_seconds = 0.0
+
+    def child(self) -> "QueryDeadline":
+        """Deadline for a sub-task that can be cancelled independently"""
+        return QueryDeadline(parent=self)
+
+    def charge(self, cpu_seconds: float):
+        """Record CPU time spent on work bound to this deadline"""
+        with self._lock:
+            self.cpu_seconds += cpu_seconds
+        if self.parent is not None:
+            self.parent.charge(cpu_seconds)
+
+    def cancel(self):
+        """Stop all work bound to this deadline as soon as possible"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def expired(self) -> bool:
+        """Whether work should stop now"""
+        return self.cancelled or (self.expires_at is not None and time.monotonic() >= self.expires_at)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when there is no time limit"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def bound(self, timeout_seconds: float) -> float:
+        """Clamp a per-call timeout to the time left"""
+        remaining = self.remaining()
+        return timeout_seconds if remaining is None else min(timeout_seconds, remaining)
+
+    def describe(self) -> str:
+        """Human-readable reason the deadline stopped work"""
+        return "The request was cancelled" if self.cancelled else "The query exceeded its time limit"
+
+
+async def _watch_disconnect(request: Request, deadline: QueryDeadline, poll_seconds: float):
+    """Cancel the deadline when the HTTP client goes away"""
+    while not deadline.expired():
+        if await request.is_disconnected():
+            print("🔌 Client disconnected; cancelling its queries")
+            deadline.cancel()
+            return
+        await asyncio.sleep(poll_seconds)
+
+
+@asynccontextmanager
+async def request_deadline(request: Request, default_timeout: float, poll_seconds: float = 0.5):
+    """
+    Deadline for an HTTP request, from the X-Request-Timeout header (seconds) or the
+    default. The deadline is cancelled if the client disconnects.
+    """
+    timeout = default_timeout
+    header = request.headers.get('X-Request-Timeout')
+    if header:
+        try:
+            timeout = min(float(header), default_timeout)
+        except ValueError:
+            pass
+
+    deadline = QueryDeadline(timeout)
+    watcher = asyncio.ensure_future(_watch_disconnect(request, deadline, poll_seconds))
+    try:
+        yield deadline
+    finally:
+        watcher.cancel()
@@ -0,0 +1,122 @@
+"""
+Bounded digests of function results for the model
+
+Gemini only needs the shape of the data to word an answer, not every row. A
+digest keeps per-parameter statistics and quantiles, the largest anomalies and
+a downsampled series, and is shrunk until it fits a token budget. The full
+results stay in the function results for visualization.
+"""
+import json
+import math
+from typing import Dict, List, Any
+
+# Rough size of a token in characters of JSON
+CHARS_PER_TOKEN = 4
+QUANTILES = (0.1, 0.5, 0.9)
+# Points of downsampled series and samples before the budget is applied
+MAX_POINTS = 24
+
+_PROFILE_COORDINATES = ('date', 'latitude', 'longitude')
+
+
+def estimate_tokens(value: Any) -> int:
+    """Approximate number of tokens a value takes in a prompt"""
+    return math.ceil(len(json.dumps(value, default=str)) / CHARS_PER_TOKEN)
+
+
+def _round(value: float) -> float:
+    return float(f"{value:.4g}")
+
+
+def _numeric_stats(values: List[float]) -> Dict[str, Any]:
+    """Count, range, mean and quantiles of a column"""
+    values = sorted(v for v in values if isinstance(v, (int, float)))
+    if not values:
+        return {'count': 0}
+    stats = {
+        'count': len(values),
+        'min': _round(values[0]),
+        'max': _round(values[-1]),
+        'mean': _round(sum(values) / len(values)),
+    }
+    for q in QUANTILES:
+        stats[f"p{int(q * 100)}"] = _round(values[min(len(values) - 1, int(q * len(values)))])
+    return stats
+
+
+def _downsample(rows: List[Any], max_points: int) -> List[Any]:
+    """At most `max_points` evenly spaced rows, keeping the first and last"""
+    if max_points <= 0:
+        return []
+    if len(rows) <= max_points:
+        return list(rows)
+    if max_points == 1:
+        return [rows[0]]
+    step = (len(rows) - 1) / (max_points - 1)
+    return [rows[round(i * step)] for i in range(max_points)]
+
+
+def _without_filters(row: Dict[str, Any]) -> Dict[str, Any]:
+    # The filters repeat the function call arguments, which the model already has
+    return {k: v for k, v in row.items() if k != 'filters'}
+
+
+def _digest_anomalies(results: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    digests = []
+    for row in results:
+        digest = {k: v for k, v in _without_filters(row).items() if k != 'monthly_trends'}
+        trends = row.get('monthly_trends') or []
+        if trends:
+            average = row.get('period_avg')
+            if average is None:
+                average = sum(t['value'] for t in trends) / len(trends)
+            anomalies = [t for t in trends if t.get('status') == 'ANOMALY']
+            anomalies.sort(key=lambda t: abs(t['value'] - average), reverse=True)
+            digest['months'] = len(trends)
+            digest['top_anomalies'] = [[t['month'], t['value']] for t in anomalies[:max(1, max_points // 4)]]
+            digest['monthly_series'] = [[t['month'], t['value']] for t in _downsample(trends, max_points)]
+        digests.append(digest)
+    return digests
+
+
+def _digest_profiles(results: List[Dict[str, Any]], max_points: int) -> Dict[str, Any]:
+    if not results:
+        return {'rows': 0}
+    columns = [k for k in results[0] if k not in _PROFILE_COORDINATES]
+    dates = [r['date'] for r in results if r.get('date')]
+    digest = {
+        'rows': len(results),
+        'profiles': len({tuple(r.get(k) for k in _PROFILE_COORDINATES) for r in results}),
+        'date_range': [min(dates), max(dates)] if dates else None,
+        'latitude': _numeric_stats([r.get('latitude') for r in results]),
+        'longitude': _numeric_stats([r.get('longitude') for r in results]),
+        'parameters': {column: _numeric_stats([r.get(column) for r in results]) for column in columns},
+    }
+    if max_points:
+        digest['sample'] = _downsample(results, max_points)
+    return digest
+
+
+def _build_digest(result: Dict[str, Any], max_points: int) -> Any:
+    function_name = result['function']
+    rows = result.get('results') or []
+    if function_name == 'query_profile_data':
+        return _digest_profiles(rows, max_points)
+    if function_name == 'detect_anomalies_and_trends':
+        return _digest_anomalies(rows, max_points)
+    if isinstance(rows, list):
+        return [_without_filters(row) if isinstance(row, dict) else row for row in rows]
+    return rows
+
+
+def digest_function_result(result: Dict[str, Any], budget_tokens: int) -> Any:
+    """
+    Summary of a function result's data for the model, shrunk (fewer series
+    points and samples) until it fits within about `budget_tokens`
+    """
+    max_points = MAX_POINTS
+    while True:
+        digest = _build_digest(result, max_points)
+        if max_points == 0 or estimate_tokens(digest) <= budget_tokens:
+            return digest
+        max_points //= 2
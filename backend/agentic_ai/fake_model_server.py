@@ -0,0 +1,191 @@
+"""
+Local fake Gemini server for development and load testing
+
+Implements just enough of the Gemini REST API for OceanographicAgent to run
+end to end without network access or an API key. Planning requests are answered
+with a deterministic function call derived from the query text; requests that
+carry function responses are answered with a short text summary. Cached
+contents (the prompt prefix) are kept in memory. An artificial latency
+simulates the model round trip.
+
+Usage:
+    python -m backend.agentic_ai.fake_model_server --port 8765 --latency 1.5
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake python backend/run.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from .config import AgenticConfig
+
+app = FastAPI(title="Fake Gemini Model Server")
+
+# Simulated model latency in seconds, per request
+LATENCY_SECONDS = float(os.getenv("FAKE_MODEL_LATENCY", "1.0"))
+# Delay between streamed text chunks
+STREAM_CHUNK_DELAY_SECONDS = float(os.getenv("FAKE_MODEL_CHUNK_DELAY", "0.02"))
+
+# Cached contents by resource name
+_cached_contents: Dict[str, Dict[str, Any]] = {}
+
+
+def _plan_function_call(text: str) -> Dict[str, Any]:
+    """Pick a function call for the query using simple keyword rules"""
+    text_lower = text.lower()
+    regions = [name for name in AgenticConfig.REGIONS if name in text_lower]
+    parameters = [p for p in ['temperature', 'salinity', 'oxygen', 'chlorophyll', 'nitrate'] if p in text_lower]
+
+    if 'compare' in text_lower and len(regions) >= 2:
+        return {
+            'name': 'compare_oceanographic_data',
+            'args': {
+                'comparison_type': 'regional',
+                'regions': regions,
+                'parameters': parameters or ['temperature'],
+            }
+        }
+
+    if any(word in text_lower for word in ['unusual', 'anomal', 'trend', 'strange']):
+        args = {'parameters': parameters or ['all']}
+    else:
+        args = {'operation': 'average', 'parameters': parameters or ['temperature', 'salinity']}
+    if regions:
+        args['region'] = regions[0]
+
+    name = 'detect_anomalies_and_trends' if 'operation' not in args else 'query_aggregate_statistics'
+    return {'name': name, 'args': args}
+
+
+def _summarize_function_responses(parts: List[Dict[str, Any]]) -> str:
+    """Produce a plain text answer from function response parts"""
+    lines = []
+    for part in parts:
+        response = part['functionResponse'].get('response', {})
+        if 'error' in response:
+            lines.append(f"{part['functionResponse'].get('name')}: {response['error']}")
+            continue
+        for summary in response.get('summary') or []:
+            lines.append(f"- {summary}")
+    return "Here is what the data shows:\n" + "\n".join(lines) if lines else "No data was returned."
+
+
+def _user_text(contents: List[Dict[str, Any]]) -> str:
+    """Text parts of the last user turn (the question; earlier turns are conversation context)"""
+    for content in reversed(contents):
+        if content.get('role', 'user') == 'user':
+            return "\n".join(part['text'] for part in content.get('parts', []) if 'text' in part)
+    return ""
+
+
+def _build_response(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a GenerateContentResponse payload for a request body"""
+    contents = body.get('contents', [])
+    function_responses = [
+        part for content in contents for part in content.get('parts', [])
+        if 'functionResponse' in part
+    ]
+
+    if function_responses:
+        parts = [{'text': _summarize_function_responses(function_responses)}]
+    elif body.get('tools') or _cached_contents.get(body.get('cachedContent'), {}).get('tools'):
+        # Plan on the quoted user query when the prompt embeds one, not on the system prompt
+        query_text = _user_text(contents)
+        match = re.search(r'User query:\s*"(.*?)"', query_text, re.S)
+        parts = [{'functionCall': _plan_function_call(match.group(1) if match else query_text)}]
+    else:
+        parts = [{'text': 'This is a response from the fake model server.'}]
+
+    # Like the real API, the prompt token count includes the referenced cached content
+    prompt_chars = len(str(body)) + len(str(_cached_contents.get(body.get('cachedContent'), '')))
+    return {
+        'candidates': [{
+            'content': {'role': 'model', 'parts': parts},
+            'finishReason': 'STOP',
+            'index': 0,
+        }],
+        'usageMetadata': {
+            'promptTokenCount': prompt_chars // 4,
+            'candidatesTokenCount': len(str(parts)) // 4,
+            'totalTokenCount': (prompt_chars + len(str(parts))) // 4,
+        },
+        'modelVersion': 'fake-model',
+    }
+
+
+async def _stream_response(response: Dict[str, Any]):
+    """Yield a response as server-sent events, splitting text parts into word chunks"""
+    parts = response['candidates'][0]['content']['parts']
+    if len(parts) != 1 or 'text' not in parts[0]:
+        yield f"data: {json.dumps(response)}\n\n"
+        return
+
+    words = parts[0]['text'].split(' ')
+    for i, word in enumerate(words):
+        chunk = json.loads(json.dumps(response))
+        chunk['candidates'][0]['content']['parts'] = [{'text': word + (' ' if i < len(words) - 1 else '')}]
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(STREAM_CHUNK_DELAY_SECONDS)
+
+
+@app.post("/{api_version}/cachedContents")
+async def create_cached_content(api_version: str, request: Request):
+    """Handle `cachedContents.create`, keeping the cached system instruction and tools"""
+    body = await request.json()
+    name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+    ttl_seconds = float(str(body.get('ttl', '3600s')).rstrip('s'))
+    now = datetime.now(timezone.utc)
+    _cached_contents[name] = body
+    return {
+        'name': name,
+        'model': body.get('model'),
+        'displayName': body.get('displayName'),
+        'createTime': now.isoformat(),
+        'updateTime': now.isoformat(),
+        'expireTime': (now + timedelta(seconds=ttl_seconds)).isoformat(),
+    }
+
+
+@app.post("/{api_version}/models/{model_action}")
+async def generate_content(api_version: str, model_action: str, request: Request):
+    """Handle `models/{model}:generateContent` and `:streamGenerateContent` requests"""
+    model, _, action = model_action.partition(':')
+    if action not in ('generateContent', 'streamGenerateContent'):
+        raise HTTPException(status_code=404, detail=f"Unsupported action: {action}")
+
+    body = await request.json()
+    response = _build_response(body)
+
+    if action == 'streamGenerateContent':
+        # Time to first token is a fraction of the full latency when streaming
+        await asyncio.sleep(LATENCY_SECONDS / 4)
+        return StreamingResponse(_stream_response(response), media_type="text/event-stream")
+
+    await asyncio.sleep(LATENCY_SECONDS)
+    return response
+
+
+def main():
+    """Run the fake model server"""
+    import uvicorn
+
+    global LATENCY_SECONDS
+    parser = argparse.ArgumentParser(description="Local fake Gemini model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=LATENCY_SECONDS, help="Simulated model latency in seconds")
+    args = parser.parse_args()
+
+    LATENCY_SECONDS = args.latency
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
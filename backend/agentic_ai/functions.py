@@ -8,65 +8,6 @@ from datetime import datetime, timedelta
 class OceanQueryFunctions:
     """Define function schemas for oceanographic data queries"""
     
-    @staticmethod
-    def get_query_parameters_function():
-        """Function to extract oceanographic query parameters"""
-        return types.FunctionDeclaration(
-            name='extract_ocean_query_parameters',
-            description='Extract structured parameters from a natural language oceanographic query',
-            parameters=types.Schema(
-                type=types.Type.OBJECT,
-                properties={
-                    'region': types.Schema(
-                        type=types.Type.STRING,
-                        description='Geographic region (e.g., Bay of Bengal, Arabian Sea, North Pacific)',
-                    ),
-                    'lat_bounds': types.Schema(
-                        type=types.Type.ARRAY,
-                        items=types.Schema(type=types.Type.NUMBER),
-                        description='Latitude bounds [min, max] in decimal degrees',
-                    ),
-                    'lon_bounds': types.Schema(
-                        type=types.Type.ARRAY,
-                        items=types.Schema(type=types.Type.NUMBER),
-                        description='Longitude bounds [min, max] in decimal degrees',
-                    ),
-                    'date_range': types.Schema(
-                        type=types.Type.ARRAY,
-                        items=types.Schema(type=types.Type.STRING),
-                        description='Date range [start_date, end_date] in YYYY-MM-DD format',
-                    ),
-                    'parameters': types.Schema(
-                        type=types.Type.ARRAY,
-                        items=types.Schema(type=types.Type.STRING),
-                        description='Oceanographic parameters (temperature, salinity, oxygen, etc.) or "all" for all parameters',
-                    ),
-                    'depth_range': types.Schema(
-                        type=types.Type.ARRAY,
-                        items=types.Schema(type=types.Type.NUMBER),
-                        description='Depth range [min, max] in pressure (decibar). Note: 1 decibar ≈ 1 meter depth. Pressure values represent ocean depth.',
-                    ),
-                    'operation': types.Schema(
-                        type=types.Type.STRING,
-                        description='Analysis operation (average, trend, anomaly, profile, compare, count, max, min)',
-                    ),
-                    'aggregation_level': types.Schema(
-                        type=types.Type.STRING,
-                        description='Temporal aggregation (daily, monthly, yearly, seasonal)',
-                    ),
-                    'comparison_reference': types.Schema(
-                        type=types.Type.STRING,
-                        description='Reference for comparison (historical_average, previous_year, climatology)',
-                    ),
-                    'statistical_threshold': types.Schema(
-                        type=types.Type.NUMBER,
-                        description='Threshold for anomaly detection (e.g., 2 for 2-sigma anomalies)',
-                    ),
-                },
-                required=['operation'],
-            ),
-        )
-    
     @staticmethod
     def get_aggregate_data_function():
         """Function to query aggregate statistics"""
@@ -227,12 +168,12 @@ class OceanQueryFunctions:
         )
 
     @staticmethod
-    def get_all_functions():
-        """Get all function declarations as tools"""
+    def get_function_declarations():
+        """Get all function declarations by name, in the order they are offered to the model"""
         functions = [
             OceanQueryFunctions.get_aggregate_data_function(),
             OceanQueryFunctions.get_anomaly_detection_function(),
             OceanQueryFunctions.get_profile_data_function(),
             OceanQueryFunctions.get_comparison_function(),
         ]
-        return [types.Tool(function_declarations=[func]) for func in functions]
+        return {func.name: func for func in functions}
@@ -0,0 +1,300 @@
+"""
+Compiled intent and slot parser for oceanographic questions
+
+Regions, parameters, operations and intent keywords are compiled into an
+Aho-Corasick automaton over word tokens, so one pass over the question finds every
+phrase (longest match wins). Dates ("last 6 months", "March 2025", "since 2024")
+and depths ("at 500 m", "between 100 and 300 meters", "surface") are parsed with
+regular expressions. The result is a function call for the SQL engine and a
+confidence score; high-confidence questions can be answered without the LLM.
+"""
+import calendar
+import re
+from collections import deque, namedtuple
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from .answer_cache import normalize_query
+
+# A function call planned locally, shaped like Gemini's FunctionCall (name, args)
+PlannedCall = namedtuple('PlannedCall', ['name', 'args'])
+
+REGION_ALIASES = {
+    'bay of bengal': ['bay of bengal', 'bengal', 'bob'],
+    'arabian sea': ['arabian sea', 'arabian'],
+    'north pacific': ['north pacific', 'pacific'],
+    'north atlantic': ['north atlantic', 'atlantic'],
+    'southern ocean': ['southern ocean', 'antarctic'],
+    'mediterranean sea': ['mediterranean sea', 'mediterranean', 'med sea'],
+    'indian ocean': ['indian ocean', 'indian'],
+}
+GLOBAL_WORDS = ['global', 'globally', 'overall', 'worldwide', 'all regions', 'everywhere']
+
+PARAMETER_ALIASES = {
+    'temperature': ['temperature', 'temperatures', 'temp', 'temps', 'sst', 'water temperature', 'sea temperature', 'warm', 'cold'],
+    'salinity': ['salinity', 'sal', 'psal', 'salt', 'salty', 'saltiness'],
+    'oxygen': ['oxygen', 'o2', 'dissolved oxygen', 'doxy'],
+    'chlorophyll': ['chlorophyll', 'chl', 'chla', 'chlorophyll a'],
+    'nitrate': ['nitrate', 'nitrates', 'no3'],
+    'ph': ['ph', 'acidity'],
+    'pressure': ['pressure', 'pres'],
+}
+
+OPERATION_ALIASES = {
+    'average': ['average', 'avg', 'mean', 'typical'],
+    'maximum': ['maximum', 'max', 'highest', 'warmest', 'hottest', 'peak'],
+    'minimum': ['minimum', 'min', 'lowest', 'coldest'],
+    'std': ['std', 'standard deviation', 'variability', 'variance', 'spread'],
+    'count': ['count', 'how many', 'number of'],
+}
+
+INTENT_ALIASES = {
+    'anomaly': ['anomaly', 'anomalies', 'anomalous', 'unusual', 'strange', 'odd', 'abnormal', 'outlier',
+                'outliers', 'trend', 'trends', 'trending', 'changing over time'],
+    'compare': ['compare', 'comparison', 'versus', 'vs', 'difference between', 'differ', 'differences'],
+    # Questions asking for reasoning need the model, however well the slots parse
+    'interpret': ['why', 'explain', 'explanation', 'cause', 'causes', 'caused', 'reason', 'reasons',
+                  'implication', 'implications', 'impact', 'affect', 'affects', 'interpret', 'significance'],
+}
+
+# Words that negate the phrase after them ("excluding the surface")
+NEGATION_WORDS = {'not', 'no', 'excluding', 'exclude', 'except', 'without', 'besides'}
+# Highest confidence of a question with words the parser cannot explain (below the fast path):
+# "during winter", "northern", "at night" or "below 500 m" would be silently dropped from the call
+QUALIFIED_MAX_CONFIDENCE = 0.6
+
+# Words that carry no slot information
+STOPWORDS = set("""
+a an the is are was were be been what whats what's which how show me tell give get find list display
+in at of on for to from with within over across near around by and or between during
+there any some data value values level levels s do does did can could would please i we you
+ocean sea water waters region area measured measurement measurements recorded observed
+concentration concentrations detect
+""".split())
+
+_MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+_DEPTH_UNITS = r"(?:m|meters?|metres?|dbar|decibars?)"
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over token sequences"""
+
+    def __init__(self, patterns: Dict[Tuple[str, ...], Any]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]  # (pattern length, payload)
+
+        for tokens, payload in patterns.items():
+            state = 0
+            for token in tokens:
+                if token not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][token] = len(self._goto) - 1
+                state = self._goto[state][token]
+            self._output[state].append((len(tokens), payload))
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                if state:
+                    self._fail[child] = self._goto[fallback].get(token, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, tokens: List[str]) -> List[Tuple[int, int, Any]]:
+        """All matches as (start, end, payload), end exclusive"""
+        matches = []
+        state = 0
+        for i, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, payload in self._output[state]:
+                matches.append((i + 1 - length, i + 1, payload))
+        return matches
+
+    def find_longest(self, tokens: List[str]) -> List[Tuple[int, int, Any]]:
+        """Non-overlapping matches, preferring earlier then longer ones"""
+        chosen = []
+        covered = set()
+        for start, end, payload in sorted(self.find_all(tokens), key=lambda m: (m[0], m[0] - m[1])):
+            if covered.isdisjoint(range(start, end)):
+                chosen.append((start, end, payload))
+                covered.update(range(start, end))
+        return chosen
+
+
+def _build_matcher() -> AhoCorasick:
+    patterns = {}
+    groups = [
+        ('region', REGION_ALIASES),
+        ('parameter', PARAMETER_ALIASES),
+        ('operation', OPERATION_ALIASES),
+        ('intent', INTENT_ALIASES),
+    ]
+    for kind, aliases in groups:
+        for value, phrases in aliases.items():
+            for phrase in phrases:
+                patterns[tuple(phrase.split())] = (kind, value)
+    for phrase in GLOBAL_WORDS:
+        patterns[tuple(phrase.split())] = ('region', 'global')
+    return AhoCorasick(patterns)
+
+
+class IntentParser:
+    """Parses a question into a SQL template call with a confidence score"""
+
+    def __init__(self):
+        self._matcher = _build_matcher()
+
+    def parse(self, query: str, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Returns {'function', 'args', 'confidence', 'slots', 'unknown_words'}.
+        Confidence is high only when the question names what to measure, where,
+        and how, and nothing in it is left unexplained.
+        """
+        today = today or date.today()
+        text = normalize_query(query)
+
+        text, date_range = self._parse_dates(text, today)
+        text, depth_range = self._parse_depths(text)
+
+        tokens = text.split()
+        slots = {'region': [], 'parameter': [], 'operation': [], 'intent': []}
+        matched = set()
+        for start, end, (kind, value) in self._matcher.find_longest(tokens):
+            if value not in slots[kind]:
+                slots[kind].append(value)
+            matched.update(range(start, end))
+
+        if 'surface' in tokens and depth_range is None:
+            surface = tokens.index('surface')
+            # "excluding the surface" must not select the surface layer
+            if NEGATION_WORDS.isdisjoint(tokens[max(0, surface - 3):surface]):
+                depth_range = [0, 10]
+                matched.add(surface)
+
+        unknown = [t for i, t in enumerate(tokens) if i not in matched and t not in STOPWORDS]
+        regions = [r for r in slots['region'] if r != 'global']
+        parameters = slots['parameter']
+        intents = slots['intent']
+
+        # Pick the function and its arguments
+        if 'compare' in intents and len(regions) >= 2:
+            function_name = 'compare_oceanographic_data'
+            args = {'comparison_type': 'regional', 'regions': regions, 'parameters': parameters or ['temperature']}
+            if slots['operation']:
+                args['operation'] = slots['operation'][0]
+        elif 'anomaly' in intents:
+            function_name = 'detect_anomalies_and_trends'
+            args = {'parameters': parameters or ['all']}
+            if regions:
+                args['region'] = regions[0]
+        else:
+            function_name = 'query_aggregate_statistics'
+            args = {
+                'operation': slots['operation'][0] if slots['operation'] else 'average',
+                'parameters': parameters or ['temperature', 'salinity', 'oxygen'],
+            }
+            if regions:
+                args['region'] = regions[0]
+
+        if date_range:
+            if function_name == 'compare_oceanographic_data':
+                args['time_periods'] = [date_range]
+            args['date_range'] = date_range
+        if depth_range:
+            args['depth_range'] = depth_range
+
+        # Confidence: what was stated explicitly, scaled by how much of the question was understood
+        score = 0.2
+        score += 0.3 if parameters else 0.0
+        score += 0.25 if slots['region'] else 0.0
+        score += 0.15 if (slots['operation'] or intents) else 0.0
+        score += 0.1 if not unknown else 0.0
+
+        content_words = len(matched) + len(unknown)
+        coverage = len(matched) / content_words if content_words else 0.0
+        score *= 0.5 + 0.5 * coverage
+
+        if len(regions) >= 2 and function_name != 'compare_oceanographic_data':
+            score *= 0.6  # several regions but no comparison asked for
+        if len(slots['operation']) > 1 or ('compare' in intents and 'anomaly' in intents):
+            score *= 0.6  # conflicting instructions
+        if 'compare' in intents and function_name != 'compare_oceanographic_data':
+            score *= 0.5  # comparison of something other than regions
+        if 'interpret' in intents:
+            score = min(score, 0.3)
+        if unknown:
+            # Only fully explained questions are confident enough to skip the model
+            score = min(score, QUALIFIED_MAX_CONFIDENCE)
+
+        return {
+            'function': function_name,
+            'args': args,
+            'confidence': round(min(score, 1.0), 3),
+            'slots': {**slots, 'date_range': date_range, 'depth_range': depth_range},
+            'unknown_words': unknown,
+        }
+
+    @staticmethod
+    def _parse_dates(text: str, today: date) -> Tuple[str, Optional[List[str]]]:
+        """Remove the first date expression from the text and return it as [start, end]"""
+        fmt = lambda d: d.strftime('%Y-%m-%d')
+        month_names = "|".join(sorted(_MONTHS, key=len, reverse=True))
+        patterns = [
+            (r"\b(\d{4}-\d{2}-\d{2})\s+(?:to|and|until|through)\s+(\d{4}-\d{2}-\d{2})\b",
+             lambda m: [m.group(1), m.group(2)]),
+            (r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b",
+             lambda m: [fmt(today - timedelta(days=int(m.group(1)) * _UNIT_DAYS[m.group(2)])), fmt(today)]),
+            (r"\b(?:last|past|previous)\s+(day|week|month|year)\b",
+             lambda m: [fmt(today - timedelta(days=_UNIT_DAYS[m.group(1)])), fmt(today)]),
+            (r"\bthis\s+year\b",
+             lambda m: [f"{today.year}-01-01", fmt(today)]),
+            (rf"\b({month_names})\s+(\d{{4}})\b",
+             lambda m: IntentParser._month_range(int(m.group(2)), _MONTHS[m.group(1)])),
+            (r"\bsince\s+(\d{4})(?:-(\d{2}))?\b",
+             lambda m: [f"{m.group(1)}-{m.group(2) or '01'}-01", fmt(today)]),
+            (r"\b(\d{4}-\d{2}-\d{2})\b",
+             lambda m: [m.group(1)]),
+            (r"\b(\d{4})-(\d{2})\b",
+             lambda m: IntentParser._month_range(int(m.group(1)), int(m.group(2)))),
+            (rf"\b(19[5-9]\d|20\d{{2}})\b(?!\s*{_DEPTH_UNITS}\b)",
+             lambda m: [f"{m.group(1)}-01-01", f"{m.group(1)}-12-31"]),
+        ]
+        for pattern, build in patterns:
+            match = re.search(pattern, text)
+            if match:
+                return (text[:match.start()] + " " + text[match.end():]).strip(), build(match)
+        return text, None
+
+    @staticmethod
+    def _month_range(year: int, month: int) -> List[str]:
+        last_day = calendar.monthrange(year, month)[1]
+        return [f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{last_day:02d}"]
+
+    @staticmethod
+    def _parse_depths(text: str) -> Tuple[str, Optional[List[float]]]:
+        """Remove the first depth expression from the text and return it as a depth range"""
+        patterns = [
+            (rf"\b(?:between|from)\s+(\d+(?:\.\d+)?)\s*{_DEPTH_UNITS}?\s+(?:and|to)\s+(\d+(?:\.\d+)?)\s*{_DEPTH_UNITS}\b(?:\s+depth)?",
+             lambda m: [float(m.group(1)), float(m.group(2))]),
+            (rf"\b(?:depths?\s+(?:of\s+)?)?(\d+(?:\.\d+)?)\s*{_DEPTH_UNITS}\b(?:\s+depth)?",
+             lambda m: [float(m.group(1))]),
+            (r"\bdepths?\s+(?:of\s+)?(\d+(?:\.\d+)?)\b",
+             lambda m: [float(m.group(1))]),
+        ]
+        for pattern, build in patterns:
+            match = re.search(pattern, text)
+            if match:
+                return (text[:match.start()] + " " + text[match.end():]).strip(), build(match)
+        return text, None
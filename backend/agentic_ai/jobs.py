@@ -0,0 +1,245 @@
+"""
+Background analysis jobs with persisted results
+"""
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from .config import AgenticConfig
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    """Whether a process with this pid is running on this host"""
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobManager:
+    """
+    Runs long analyses outside the HTTP request and stores their results locally.
+
+    Jobs are asyncio tasks bounded by a worker pool of `max_workers` slots; their SQL
+    work runs on the SQL engine's executor. Submitting a job identical to one that is
+    still pending or running, in any worker process sharing the store, returns the
+    existing job instead of starting another.
+
+    Each job records the pid of the process running it. Pending and running jobs
+    whose process is gone are marked failed, so one worker never fails the jobs
+    of another. Store access runs on the default executor, off the event loop.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    def __init__(self, store_path: str, max_workers: int):
+        self.store_path = store_path
+        self.max_workers = max_workers
+        self.owner_pid = os.getpid()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._init_store()
+
+    @contextmanager
+    def _get_connection(self):
+        """
+        Get a connection to the job store whose transaction is committed (or
+        rolled back on error) and which is closed as soon as the block exits
+        """
+        conn = sqlite3.connect(self.store_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_store(self):
+        """Create the job table and fail jobs whose process has exited"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+        with self._get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    job_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    owner_pid INTEGER
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'owner_pid' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_job_key ON jobs (job_key, status)")
+            self._reap_orphans(conn, startup=True)
+
+    def _reap_orphans(self, conn, job_key: Optional[str] = None, startup: bool = False):
+        """
+        Fail pending/running jobs whose owner process has exited. At startup a
+        job owned by our own pid predates this process (the pid was reused),
+        since this process has not submitted anything yet.
+        """
+        query = "SELECT id, owner_pid FROM jobs WHERE status IN (?, ?)"
+        params = [self.PENDING, self.RUNNING]
+        if job_key is not None:
+            query += " AND job_key = ?"
+            params.append(job_key)
+        orphans = [
+            job_id for job_id, owner_pid in conn.execute(query, params).fetchall()
+            if not _process_alive(owner_pid) or (startup and owner_pid == self.owner_pid)
+        ]
+        if orphans:
+            conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                [(self.FAILED, 'Interrupted by server restart', datetime.now().isoformat(), job_id) for job_id in orphans]
+            )
+
+    async def _run_in_executor(self, func, *args, **kwargs):
+        """Run a blocking store operation off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    @staticmethod
+    def make_key(kind: str, payload: Dict[str, Any]) -> str:
+        """Key under which identical jobs are merged"""
+        normalized = dict(payload)
+        if isinstance(normalized.get('query'), str):
+            normalized['query'] = " ".join(normalized['query'].lower().split())
+        return f"{kind}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+    def _claim(self, kind: str, key: str, payload: Dict[str, Any]) -> tuple:
+        """
+        Return (job id, merged): the live pending/running job with this key, or a
+        new pending job owned by this process. The lookup and insert share one
+        write transaction, so two workers cannot both start the same job.
+        """
+        with self._get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reap_orphans(conn, key)
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE job_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                [key, self.PENDING, self.RUNNING]
+            ).fetchone()
+            if row is not None:
+                return row[0], True
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, job_key, status, payload, created_at, owner_pid) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [job_id, kind, key, self.PENDING, json.dumps(payload, default=str), datetime.now().isoformat(), self.owner_pid]
+            )
+            return job_id, False
+
+    async def submit(self, kind: str, payload: Dict[str, Any], runner: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Start `runner` as a background job, or join an identical pending/running job.
+        Returns the job status record with a `merged` flag.
+        """
+        key = self.make_key(kind, payload)
+        job_id, merged = await self._run_in_executor(self._claim, kind, key, payload)
+        if not merged:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._tasks[job_id] = asyncio.ensure_future(self._run(job_id, runner))
+        return {**await self.get(job_id), 'merged': merged}
+
+    async def _run(self, job_id: str, runner: Callable[[], Awaitable[Any]]):
+        """Run a job in a worker slot and persist its outcome"""
+        try:
+            async with self._semaphore:
+                await self._run_in_executor(self._update, job_id, status=self.RUNNING, started_at=datetime.now().isoformat())
+                result = await runner()
+            # Agent results report their own failures instead of raising
+            failed = isinstance(result, dict) and result.get('success') is False
+            await self._run_in_executor(
+                self._update,
+                job_id,
+                status=self.FAILED if failed else self.COMPLETED,
+                result=json.dumps(result, default=str),
+                error=(result.get('error') or 'The job failed') if failed else None,
+                finished_at=datetime.now().isoformat()
+            )
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            try:
+                await self._run_in_executor(
+                    self._update, job_id, status=self.FAILED, error=str(e), finished_at=datetime.now().isoformat()
+                )
+            except Exception as store_error:
+                print(f"⚠️ Could not record failure of job {job_id}: {store_error}")
+        finally:
+            self._tasks.pop(job_id, None)
+
+    def _update(self, job_id: str, **fields):
+        """Update columns of a job row"""
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._get_connection() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                [job_id]
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            'job_id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'error': row[3],
+            'created_at': row[4],
+            'started_at': row[5],
+            'finished_at': row[6],
+        }
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the status record of a job (without its result)"""
+        return await self._run_in_executor(self._get, job_id)
+
+    def _get_result(self, job_id: str) -> Optional[Any]:
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ?", [job_id]).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    async def get_result(self, job_id: str) -> Optional[Any]:
+        """Get the stored result of a completed job"""
+        return await self._run_in_executor(self._get_result, job_id)
+
+
+# Global job manager instance
+job_manager: Optional[JobManager] = None
+
+def get_job_manager() -> JobManager:
+    """Get or create the job manager"""
+    global job_manager
+    if job_manager is None:
+        config = AgenticConfig()
+        job_manager = JobManager(
+            store_path=os.path.join(config.STATE_DIR, 'jobs.sqlite'),
+            max_workers=config.JOB_WORKERS
+        )
+    return job_manager
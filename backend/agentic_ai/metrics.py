@@ -0,0 +1,139 @@
+"""
+In-process metrics registry with Prometheus text export
+"""
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+# Label set as a sorted tuple of (name, value) pairs, usable as a dict key
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Optional[Dict[str, Any]]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class _Summary:
+    """Count, sum and recent observations of one labelled series"""
+
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=max_samples)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and summaries keyed by metric name and labels.
+    Summaries report quantiles over their most recent observations.
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._summaries: Dict[str, Dict[Labels, _Summary]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        """Set the help text shown for a metric"""
+        self._help[name] = help_text
+
+    def increment(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1.0):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            key = _labels(labels)
+            if key not in series:
+                series[key] = _Summary(self.max_samples)
+            series[key].observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as plain data"""
+        with self._lock:
+            return {
+                'counters': {
+                    name: [{'labels': dict(k), 'value': v} for k, v in series.items()]
+                    for name, series in self._counters.items()
+                },
+                'gauges': {
+                    name: [{'labels': dict(k), 'value': v} for k, v in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                'summaries': {
+                    name: [
+                        {
+                            'labels': dict(k),
+                            'count': s.count,
+                            'sum': s.total,
+                            **{f'p{int(q * 100)}': s.quantile(q) for q in self.QUANTILES},
+                        }
+                        for k, s in series.items()
+                    ]
+                    for name, series in self._summaries.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self._counters), ('gauge', self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in series.items():
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+            for name, series in sorted(self._summaries.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} summary")
+                for labels, summary in series.items():
+                    for q in self.QUANTILES:
+                        quantile_labels = labels + (('quantile', str(q)),)
+                        lines.append(f"{name}{_format_labels(quantile_labels)} {summary.quantile(q):g}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {summary.total:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {summary.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry
+metrics: Optional[MetricsRegistry] = None
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create the metrics registry"""
+    global metrics
+    if metrics is None:
+        metrics = MetricsRegistry()
+    return metrics
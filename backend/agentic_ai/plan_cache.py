@@ -0,0 +1,60 @@
+"""
+Cache of Gemini function-call plans for recurring questions
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+from .answer_cache import normalize_query
+from .canonical import canonical_args
+
+
+class PlanCache:
+    """
+    LRU cache mapping a normalized question to the function calls Gemini planned
+    for it. Plans do not depend on the data, so entries are not tied to a data
+    version, but they expire after `ttl_seconds` because the model resolves
+    relative dates ("last month") into concrete ranges.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, plan)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Planned calls as [{'name': ..., 'args': {...}}], or None"""
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, query: str, function_calls):
+        """Remember the function calls (objects with name and args) planned for a query"""
+        plan = [{'name': fc.name, 'args': canonical_args(fc.args)} for fc in function_calls]
+        key = normalize_query(query)
+        self._entries[key] = (time.monotonic(), plan)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
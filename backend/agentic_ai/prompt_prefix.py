@@ -0,0 +1,114 @@
+"""
+Gemini context caches for prompt prefixes (system instruction and tools)
+"""
+import asyncio
+import time
+from typing import Dict, List, Any, Optional
+
+try:
+    from google.genai import types
+except ImportError:
+    types = None
+
+
+class _CachedPrefix:
+    """One cached-content resource and its expiry"""
+
+    def __init__(self):
+        self.name: Optional[str] = None
+        self.expires_at = 0.0
+        self.retry_at = 0.0
+        self.creating: Optional[asyncio.Task] = None
+
+    def valid(self, margin_seconds: float) -> bool:
+        return self.name is not None and time.monotonic() < self.expires_at - margin_seconds
+
+
+class PromptPrefixCache:
+    """
+    Keeps Gemini cached-content resources holding a system instruction and tool
+    declarations, so requests only send the conversation and the question. There
+    is one resource per prompt selection (see tool_selection), created on first
+    use and recreated shortly before it expires. Prefixes below `min_tokens` are
+    never cached, since the API refuses them.
+
+    Resources are created in the background: requests never wait for one, and
+    carry the prefix inline until it is ready. If creation fails, it is retried
+    after `retry_seconds`.
+    """
+
+    # Recreate a resource this long before it expires
+    REFRESH_MARGIN_SECONDS = 60
+
+    def __init__(self, client, model: str, ttl_seconds: float, timeout_seconds: float,
+                 min_tokens: int = 0, retry_seconds: float = 600):
+        self.client = client
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_seconds
+        self.min_tokens = min_tokens
+        self.retry_seconds = retry_seconds
+        self._prefixes: Dict[Any, _CachedPrefix] = {}
+        self.created = 0
+        self.failures = 0
+        self.uses = 0
+        self.inline_uses = 0
+
+    async def get_name(self, key: Any, system_instruction: str, tools: List[Any], tokens: int) -> Optional[str]:
+        """Name of the cached prefix to reference, or None to send the prefix inline"""
+        if tokens < self.min_tokens:
+            self.inline_uses += 1
+            return None
+
+        prefix = self._prefixes.setdefault(key, _CachedPrefix())
+        if (not prefix.valid(self.REFRESH_MARGIN_SECONDS) and prefix.creating is None
+                and time.monotonic() >= prefix.retry_at):
+            prefix.creating = asyncio.ensure_future(self._create(prefix, system_instruction, tools))
+
+        if prefix.valid(self.REFRESH_MARGIN_SECONDS):
+            self.uses += 1
+            return prefix.name
+        self.inline_uses += 1
+        return None
+
+    async def _create(self, prefix: _CachedPrefix, system_instruction: str, tools: List[Any]):
+        try:
+            cached = await asyncio.wait_for(
+                self.client.aio.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        display_name='floatchat-prompt-prefix',
+                        system_instruction=system_instruction,
+                        tools=tools,
+                        ttl=f"{int(self.ttl_seconds)}s",
+                    ),
+                ),
+                timeout=self.timeout_seconds,
+            )
+            prefix.name = cached.name
+            prefix.expires_at = time.monotonic() + self.ttl_seconds
+            self.created += 1
+            print(f"🗃️ Cached prompt prefix as {cached.name}")
+        except Exception as e:
+            prefix.name = None
+            prefix.retry_at = time.monotonic() + self.retry_seconds
+            self.failures += 1
+            print(f"⚠️ Prompt prefix could not be cached ({e or type(e).__name__}); sending it inline")
+        finally:
+            prefix.creating = None
+
+    def invalidate(self, name: str):
+        """Forget a cached prefix (e.g. after the API reported it missing)"""
+        for prefix in self._prefixes.values():
+            if prefix.name == name:
+                prefix.name = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'cached': sum(1 for p in self._prefixes.values() if p.valid(self.REFRESH_MARGIN_SECONDS)),
+            'prefixes': len(self._prefixes),
+            'created': self.created,
+            'failures': self.failures,
+            'uses': self.uses,
+            'inline_uses': self.inline_uses,
+        }
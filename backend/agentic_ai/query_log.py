@@ -0,0 +1,128 @@
+"""
+Persistent log of answered questions
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+from .answer_cache import normalize_query
+from .canonical import canonical_args
+
+
+class QueryLog:
+    """
+    Records each answered question with the function calls that answered it,
+    so the most frequent recent questions can be replayed after a restart (see
+    warmup). Entries older than `retention_seconds` are dropped at startup.
+
+    Questions are buffered and written by a background thread once `flush_rows`
+    are waiting or `flush_seconds` have passed since the last write (and at
+    exit). Logging errors are reported and never reach the answer.
+    """
+
+    def __init__(self, store_path: str, retention_seconds: float, flush_rows: int = 20,
+                 flush_seconds: float = 5.0):
+        self.store_path = store_path
+        self.retention_seconds = retention_seconds
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher: Optional[threading.Thread] = None
+        self._init_store()
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _get_connection(self):
+        """
+        Get a connection to the log whose transaction is committed (or rolled
+        back on error) and which is closed as soon as the block exits
+        """
+        conn = sqlite3.connect(self.store_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_store(self):
+        """Create the log table and drop expired entries"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+        with self._get_connection() as conn:
+            # WAL without a sync per commit keeps the batched appends cheap
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS queries (
+                    id INTEGER PRIMARY KEY,
+                    normalized TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    calls TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_queries_created_at ON queries (created_at)")
+            conn.execute("DELETE FROM queries WHERE created_at < ?", [time.time() - self.retention_seconds])
+
+    def record(self, query: str, function_results: Optional[List[Dict[str, Any]]]):
+        """Log a question and the function calls that produced its answer"""
+        try:
+            calls = [
+                {'function': r['function'], 'args': canonical_args(r.get('parameters'))}
+                for r in function_results or []
+                if 'error' not in r
+            ]
+            entry = (normalize_query(query), query, json.dumps(calls, default=str), time.time())
+        except Exception as e:
+            print(f"⚠️ Could not log query '{query}': {e}")
+            return
+        with self._lock:
+            self._pending.append(entry)
+            due = len(self._pending) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds
+            if due and (self._flusher is None or not self._flusher.is_alive()):
+                self._flusher = threading.Thread(target=self.flush, name="query-log-flush", daemon=True)
+                self._flusher.start()
+
+    def flush(self):
+        """Write the buffered questions"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            with self._get_connection() as conn:
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executemany(
+                    "INSERT INTO queries (normalized, query, calls, created_at) VALUES (?, ?, ?, ?)",
+                    pending
+                )
+        except Exception as e:
+            print(f"⚠️ Could not write {len(pending)} logged queries: {e}")
+
+    def top_queries(self, limit: int, window_seconds: float) -> List[Dict[str, Any]]:
+        """
+        The `limit` most frequent questions of the last `window_seconds`, most
+        frequent first, each with its latest wording and function calls
+        """
+        self.flush()
+        with self._get_connection() as conn:
+            rows = conn.execute("""
+                SELECT q.query, q.calls, t.uses
+                FROM (
+                    SELECT normalized, COUNT(*) AS uses, MAX(id) AS last_id
+                    FROM queries
+                    WHERE created_at >= ?
+                    GROUP BY normalized
+                ) t
+                JOIN queries q ON q.id = t.last_id
+                ORDER BY t.uses DESC, t.last_id DESC
+                LIMIT ?
+            """, [time.time() - window_seconds, limit]).fetchall()
+
+        return [{'query': row[0], 'calls': json.loads(row[1]), 'uses': row[2]} for row in rows]
@@ -0,0 +1,94 @@
+"""
+LRU cache for SQL template results with a memory budget
+"""
+import json
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Marker for a cache miss, since None can be a cached result
+MISS = object()
+
+
+class ResultCache:
+    """
+    Least-recently-used cache of query results, bounded by the approximate size
+    of the cached results in bytes.
+
+    Entries are tagged with the data version they were computed against; an entry
+    from an older version is dropped on lookup. Cached results are shared between
+    callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int, Any]]" = OrderedDict()  # key -> (value, size, version)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def size_of(value: Any) -> int:
+        """
+        Approximate memory cost of a result, from its JSON size. Large results
+        are slow to serialize, so callers should measure them off the event loop
+        and pass the size to `put`.
+        """
+        return len(json.dumps(value, default=str))
+
+    def get(self, key: str, version: Any) -> Any:
+        """Cached value for the key at this data version, or MISS"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] != version:
+            self._remove(key)
+            self.invalidations += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return MISS
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, value: Any, version: Any, size: Optional[int] = None):
+        """Store a value, evicting least recently used entries to stay within budget"""
+        if size is None:
+            size = self.size_of(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, version)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def clear(self):
+        """Drop all entries"""
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory use"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,146 @@
+"""
+Latency-SLO-driven routing between Gemini and the local fallback
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Tuple
+
+from .metrics import MetricsRegistry
+
+
+class ModelUnavailableError(Exception):
+    """Raised when a model call fails or breaches the latency SLO"""
+
+
+class ModelRouter:
+    """
+    Decides per query whether to use Gemini or the local fallback.
+
+    Every model call is recorded with its latency and outcome in a rolling window.
+    - Circuit breaker: after `consecutive_failures` failures in a row, or an error
+      rate of at least `error_rate_threshold` over `min_samples` calls, the circuit
+      opens and all queries go to the fallback. After `cooldown_seconds` a single
+      probe query is sent to Gemini; success closes the circuit, failure keeps it
+      open for another cooldown.
+    - Latency: when the rolling p90 model latency exceeds `degraded_fraction` of the
+      SLO, queries go to the fallback except for a `probe_ratio` share that keeps
+      measuring Gemini.
+    A call that exceeds `slo_seconds` is abandoned and counts as a failure.
+    """
+
+    GEMINI = 'gemini'
+    FALLBACK = 'fallback'
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, slo_seconds: float, window_seconds: float, min_samples: int,
+                 error_rate_threshold: float, consecutive_failures: int, cooldown_seconds: float,
+                 degraded_fraction: float, probe_ratio: float, metrics: MetricsRegistry):
+        self.slo_seconds = slo_seconds
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.error_rate_threshold = error_rate_threshold
+        self.consecutive_failures = consecutive_failures
+        self.cooldown_seconds = cooldown_seconds
+        self.degraded_fraction = degraded_fraction
+        self.probe_ratio = probe_ratio
+        self.metrics = metrics
+
+        self._lock = threading.Lock()
+        self._samples: deque = deque()  # (timestamp, latency seconds, ok)
+        self._failures_in_row = 0
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+
+        metrics.describe('agent_route_total', 'Queries routed to Gemini or the local fallback, by reason')
+        metrics.describe('gemini_call_seconds', 'Latency of Gemini calls')
+        metrics.describe('gemini_call_failures_total', 'Gemini calls that failed or breached the SLO')
+        metrics.describe('gemini_circuit_open', '1 while the Gemini circuit breaker is open')
+        metrics.set_gauge('gemini_circuit_open', 0)
+
+    def _trim(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+
+    def _error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, _, ok in self._samples if not ok) / len(self._samples)
+
+    def _latency_p90(self) -> float:
+        latencies = sorted(latency for _, latency, ok in self._samples if ok)
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(0.9 * len(latencies)))]
+
+    def _set_state(self, state: str, now: float):
+        if state != self.CLOSED:
+            self._opened_at = now
+        if state != self.state:
+            print(f"🔀 Gemini circuit {self.state} -> {state}")
+        self.state = state
+        self.metrics.set_gauge('gemini_circuit_open', 0 if state == self.CLOSED else 1)
+
+    def choose(self) -> Tuple[str, str]:
+        """Pick (route, reason) for the next query"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if self.state != self.CLOSED:
+                if now - self._opened_at >= self.cooldown_seconds:
+                    self._set_state(self.HALF_OPEN, now)
+                    route, reason = self.GEMINI, 'circuit_probe'
+                else:
+                    route, reason = self.FALLBACK, 'circuit_open'
+            elif (len(self._samples) >= self.min_samples
+                  and self._latency_p90() > self.slo_seconds * self.degraded_fraction):
+                if random.random() < self.probe_ratio:
+                    route, reason = self.GEMINI, 'latency_probe'
+                else:
+                    route, reason = self.FALLBACK, 'latency_degraded'
+            else:
+                route, reason = self.GEMINI, 'healthy'
+
+        self.metrics.increment('agent_route_total', {'route': route, 'reason': reason})
+        return route, reason
+
+    def record(self, latency_seconds: float, ok: bool, kind: str = 'ok'):
+        """Record the outcome of one model call"""
+        now = time.monotonic()
+        self.metrics.observe('gemini_call_seconds', latency_seconds)
+        if not ok:
+            self.metrics.increment('gemini_call_failures_total', {'kind': kind})
+
+        with self._lock:
+            self._samples.append((now, latency_seconds, ok))
+            self._trim(now)
+            self._failures_in_row = 0 if ok else self._failures_in_row + 1
+
+            if self.state == self.HALF_OPEN:
+                if ok:
+                    self._samples.clear()
+                    self._set_state(self.CLOSED, now)
+                else:
+                    self._set_state(self.OPEN, now)
+            elif self.state == self.CLOSED and not ok:
+                if (self._failures_in_row >= self.consecutive_failures
+                        or (len(self._samples) >= self.min_samples
+                            and self._error_rate() >= self.error_rate_threshold)):
+                    self._set_state(self.OPEN, now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current routing state and rolling model health"""
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                'circuit': self.state,
+                'slo_seconds': self.slo_seconds,
+                'window_calls': len(self._samples),
+                'error_rate': round(self._error_rate(), 3),
+                'latency_p90_seconds': round(self._latency_p90(), 3),
+                'failures_in_row': self._failures_in_row,
+            }
@@ -0,0 +1,197 @@
+"""
+Priority-aware request scheduler with admission control
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from .config import AgenticConfig
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a priority class's queue is full and the request is shed"""
+
+
+class _PriorityClassState:
+    """Concurrency slots and per-session wait queues of one priority class"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        # session key -> waiting futures; sessions are served round-robin
+        self.waiters: "OrderedDict[str, deque]" = OrderedDict()
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+
+    def pop_next_waiter(self) -> Optional[asyncio.Future]:
+        """Take the next waiter, rotating between sessions for fairness"""
+        if not self.waiters:
+            return None
+        session_key, queue = next(iter(self.waiters.items()))
+        future = queue.popleft()
+        if queue:
+            self.waiters.move_to_end(session_key)
+        else:
+            del self.waiters[session_key]
+        self.queued -= 1
+        return future
+
+    def remove_waiter(self, session_key: str, future: asyncio.Future):
+        """Drop a waiter that gave up before being admitted"""
+        queue = self.waiters.get(session_key)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        if not queue:
+            del self.waiters[session_key]
+        self.queued -= 1
+
+
+class RequestScheduler:
+    """
+    Admits requests into priority classes with separate concurrency limits and
+    bounded queues.
+
+    Classes, from highest to lowest priority:
+    - interactive: cheap map and metadata lookups
+    - analysis: chat and agent queries
+    - background: asynchronous jobs and cache warming
+
+    Each class has its own slots, so higher classes are protected by never sharing
+    them, not by holding lower classes back: a class admits work whenever one of
+    its slots is free, whatever is queued elsewhere, and lower classes keep making
+    progress under steady interactive load. Freed slots are handed out highest
+    class first. Within a class, waiting sessions are served round-robin so one
+    chatty session cannot starve the others. When a queue is full, SchedulerOverloaded is
+    raised so the caller can shed load with a 503.
+    """
+
+    INTERACTIVE = 'interactive'
+    ANALYSIS = 'analysis'
+    BACKGROUND = 'background'
+    PRIORITY_ORDER = (INTERACTIVE, ANALYSIS, BACKGROUND)
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]]):
+        self._classes = {
+            name: _PriorityClassState(name, *limits[name])
+            for name in self.PRIORITY_ORDER
+        }
+
+    def has_capacity(self, name: str) -> bool:
+        """Whether a request of this class would be admitted or queued rather than shed"""
+        state = self._classes[name]
+        return state.active < state.max_concurrency or state.queued < state.max_queue
+
+    async def acquire(self, name: str, session_key: Optional[str] = None):
+        """Wait for a slot in the priority class, or raise SchedulerOverloaded"""
+        state = self._classes[name]
+        started = time.monotonic()
+
+        if state.active < state.max_concurrency and state.queued == 0:
+            state.active += 1
+            state.admitted += 1
+            return
+
+        if state.queued >= state.max_queue:
+            state.rejected += 1
+            raise SchedulerOverloaded(f"The server is busy ({name} queue is full). Please retry shortly.")
+
+        session_key = session_key or '__anonymous__'
+        future = asyncio.get_running_loop().create_future()
+        state.waiters.setdefault(session_key, deque()).append(future)
+        state.queued += 1
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we were cancelled; hand it on
+                self.release(name)
+            else:
+                state.remove_waiter(session_key, future)
+                self._dispatch()
+            raise
+
+        state.admitted += 1
+        state.total_wait_seconds += time.monotonic() - started
+
+    def release(self, name: str):
+        """Free a slot and dispatch queued requests"""
+        self._classes[name].active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to waiters, highest priority class first"""
+        for name in self.PRIORITY_ORDER:
+            state = self._classes[name]
+            while state.active < state.max_concurrency and state.queued > 0:
+                future = state.pop_next_waiter()
+                state.active += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, name: str, session_key: Optional[str] = None):
+        """Hold a slot of the priority class for the duration of the block"""
+        await self.acquire(name, session_key)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current load and admission counters per priority class"""
+        return {
+            name: {
+                'active': state.active,
+                'queued': state.queued,
+                'max_concurrency': state.max_concurrency,
+                'max_queue': state.max_queue,
+                'admitted': state.admitted,
+                'rejected': state.rejected,
+                'avg_wait_seconds': state.total_wait_seconds / state.admitted if state.admitted else 0.0,
+            }
+            for name, state in self._classes.items()
+        }
+
+
+def overloaded_http_exception(error: SchedulerOverloaded) -> HTTPException:
+    """503 response for a shed request"""
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
+
+def priority_slot(name: str):
+    """
+    FastAPI dependency holding a scheduler slot of the given class for the request.
+    Requests are grouped per session by the X-Session-Id header, else the client address.
+    """
+    async def dependency(request: Request):
+        session_key = request.headers.get('X-Session-Id') or (request.client.host if request.client else None)
+        try:
+            await get_scheduler().acquire(name, session_key)
+        except SchedulerOverloaded as e:
+            raise overloaded_http_exception(e)
+        try:
+            yield
+        finally:
+            get_scheduler().release(name)
+
+    return dependency
+
+
+# Global scheduler instance
+scheduler: Optional[RequestScheduler] = None
+
+def get_scheduler() -> RequestScheduler:
+    """Get or create the request scheduler"""
+    global scheduler
+    if scheduler is None:
+        scheduler = RequestScheduler(AgenticConfig.SCHEDULER_LIMITS)
+    return scheduler
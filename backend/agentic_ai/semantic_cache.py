@@ -0,0 +1,249 @@
+"""
+Paraphrase cache over locally embedded queries
+
+Queries are embedded with a hashed character/word n-gram TF-IDF vectorizer (no
+model, no network) and searched in a NumPy matrix by cosine similarity. A hit
+above the threshold is only accepted when both queries name the same slots
+(regions, parameters, operation, numbers and time words) and the intent parser
+reads them as the same call with the same date and depth ranges, since "average
+temperature in the Arabian Sea" and "... Bay of Bengal", or "... near the
+surface", are textually close but need different answers. Queries with words
+the parser cannot explain ("at night", "in the mixed layer") are never matched.
+"""
+import random
+import re
+import time
+import zlib
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from .answer_cache import normalize_query
+from .canonical import canonical_call_key
+from .config import AgenticConfig
+from .intent_parser import IntentParser
+
+# Words mapped to one canonical token before embedding and slot extraction
+SYNONYMS = {
+    'avg': 'average', 'mean': 'average', 'typical': 'average',
+    'max': 'maximum', 'highest': 'maximum', 'peak': 'maximum', 'warmest': 'maximum',
+    'min': 'minimum', 'lowest': 'minimum', 'coldest': 'minimum',
+    'std': 'variability', 'deviation': 'variability', 'variation': 'variability',
+    'temp': 'temperature', 'temps': 'temperature', 'sst': 'temperature',
+    'sal': 'salinity', 'psal': 'salinity', 'salty': 'salinity',
+    'o2': 'oxygen', 'doxy': 'oxygen', 'chl': 'chlorophyll', 'chla': 'chlorophyll',
+    'no3': 'nitrate', 'pres': 'pressure',
+    'anomalies': 'anomaly', 'anomalous': 'anomaly', 'unusual': 'anomaly', 'strange': 'anomaly',
+    'odd': 'anomaly', 'trends': 'trend', 'compare': 'comparison', 'versus': 'comparison', 'vs': 'comparison',
+    'profiles': 'profile', 'depths': 'depth', 'deep': 'depth', 'meters': 'm', 'metres': 'm',
+}
+
+OPERATION_WORDS = {'average', 'maximum', 'minimum', 'variability', 'count', 'sum', 'anomaly', 'trend', 'comparison', 'profile'}
+PARAMETER_WORDS = {'temperature', 'salinity', 'oxygen', 'chlorophyll', 'nitrate', 'pressure', 'ph'}
+TIME_WORDS = {
+    'last', 'past', 'this', 'next', 'recent', 'recently', 'today', 'yesterday',
+    'day', 'days', 'week', 'weeks', 'month', 'months', 'year', 'years', 'season', 'summer', 'winter',
+    'monsoon', 'january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+    'september', 'october', 'november', 'december',
+}
+_NUMBER = re.compile(r"\d+(?:[.-]\d+)*")
+
+# Distinctive word per region, so "Bengal" alone still names the Bay of Bengal
+_REGION_WORDS = {
+    name: max((w for w in name.split() if w not in ('sea', 'ocean', 'of', 'bay', 'north')), key=len)
+    for name in AgenticConfig.REGIONS
+}
+
+
+def canonical_tokens(text: str) -> List[str]:
+    """Normalized words with synonyms replaced by their canonical form"""
+    return [SYNONYMS.get(token, token) for token in normalize_query(text).split()]
+
+
+def extract_slots(text: str) -> Tuple:
+    """The parts of a query that must match for two queries to share an answer"""
+    tokens = canonical_tokens(text)
+    joined = " ".join(tokens)
+    regions = frozenset(name for name, word in _REGION_WORDS.items() if name in joined or word in tokens)
+    return (
+        regions,
+        frozenset(t for t in tokens if t in PARAMETER_WORDS),
+        frozenset(t for t in tokens if t in OPERATION_WORDS),
+        frozenset(t for t in tokens if t in TIME_WORDS),
+        frozenset(_NUMBER.findall(joined)),
+    )
+
+
+def guard_slots(text: str, intent: Dict[str, Any]) -> Tuple:
+    """Slots of a query plus the call the intent parser plans for it"""
+    date_range, depth_range = intent['slots']['date_range'], intent['slots']['depth_range']
+    return extract_slots(text) + (
+        canonical_call_key(intent['function'], intent['args']),
+        tuple(date_range or ()),
+        tuple(depth_range or ()),
+    )
+
+
+class HashedNgramVectorizer:
+    """
+    Embeds text as hashed word uni/bigrams and character 3-5 grams. Counts are
+    sublinear (1 + log tf); IDF weighting is applied at search time.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = canonical_tokens(text)
+        features = [f"w:{t}" for t in tokens]
+        features += [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        padded = f" {' '.join(tokens)} "
+        for n in (3, 4, 5):
+            features += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            vector[zlib.crc32(feature.encode('utf-8')) % self.dim] += 1.0
+        nonzero = vector > 0
+        vector[nonzero] = 1.0 + np.log(vector[nonzero])
+        return vector
+
+
+class SemanticCache:
+    """
+    Fixed-capacity vector index of answered queries. When full, the oldest entry
+    is overwritten. Entries are only reused at the same data version and within
+    the TTL. A sample of hits (`audit_rate`) is recomputed by the caller and
+    reported with `record_audit`, to measure the false-hit rate.
+    """
+
+    def __init__(self, max_entries: int, dim: int, threshold: float, ttl_seconds: float, audit_rate: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.audit_rate = audit_rate
+        self.vectorizer = HashedNgramVectorizer(dim)
+        self.parser = IntentParser()
+
+        self._matrix = np.zeros((max_entries, dim), dtype=np.float32)
+        self._doc_freq = np.zeros(dim, dtype=np.float32)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._slot_by_answer_key: Dict[str, int] = {}
+        self._size = 0
+        self._next = 0
+
+        self.lookups = 0
+        self.hits = 0
+        self.guard_rejections = 0
+        self.audits = 0
+        self.false_hits = 0
+        self.recent_hits = deque(maxlen=20)
+        self.recent_false_hits = deque(maxlen=20)
+
+    def _idf(self) -> np.ndarray:
+        return np.log((1.0 + self._size) / (1.0 + self._doc_freq)) + 1.0
+
+    def add(self, query: str, result: Dict[str, Any], data_version: Any, intent: Optional[Dict[str, Any]] = None):
+        """Index an answered query (unless it has words the parser cannot explain)"""
+        intent = intent or self.parser.parse(query)
+        if intent['unknown_words']:
+            return
+        vector = self.vectorizer.transform(query)
+        slot = self._next
+        if self._entries[slot] is not None:
+            self._doc_freq -= self._matrix[slot] > 0
+            self._slot_by_answer_key.pop(self._entries[slot]['result'].get('answer_cache_key'), None)
+        else:
+            self._size += 1
+
+        self._matrix[slot] = vector
+        self._doc_freq += vector > 0
+        self._entries[slot] = {
+            'query': query,
+            'slots': guard_slots(query, intent),
+            'result': dict(result),
+            'version': data_version,
+            'stored_at': time.monotonic(),
+        }
+        if result.get('answer_cache_key'):
+            self._slot_by_answer_key[result['answer_cache_key']] = slot
+        self._next = (slot + 1) % self.max_entries
+
+    def attach(self, answer_key: str, field: str, value: Any):
+        """Add data derived from a cached result (e.g. its visualization) to the entry of its answer"""
+        slot = self._slot_by_answer_key.get(answer_key)
+        if slot is not None:
+            self._entries[slot]['result'][field] = value
+
+    def lookup(self, query: str, data_version: Any,
+               intent: Optional[Dict[str, Any]] = None) -> Optional[Tuple[Dict[str, Any], float, str]]:
+        """
+        Best cached (result, similarity, matched query) for a paraphrase of the
+        query, or None
+        """
+        self.lookups += 1
+        if self._size == 0:
+            return None
+        intent = intent or self.parser.parse(query)
+        if intent['unknown_words']:
+            self.guard_rejections += 1
+            return None
+
+        idf = self._idf()
+        query_vector = self.vectorizer.transform(query) * idf
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm == 0:
+            return None
+
+        weighted = self._matrix[:self._size] * idf
+        norms = np.linalg.norm(weighted, axis=1)
+        norms[norms == 0] = 1.0
+        similarities = weighted @ query_vector / (norms * query_norm)
+
+        slots = guard_slots(query, intent)
+        now = time.monotonic()
+        for index in np.argsort(-similarities)[:5]:
+            similarity = float(similarities[index])
+            if similarity < self.threshold:
+                break
+            entry = self._entries[index]
+            if entry['version'] != data_version or now - entry['stored_at'] > self.ttl_seconds:
+                continue
+            if entry['slots'] != slots:
+                self.guard_rejections += 1
+                continue
+
+            self.hits += 1
+            self.recent_hits.append({'query': query, 'matched': entry['query'], 'similarity': round(similarity, 3)})
+            return dict(entry['result']), similarity, entry['query']
+        return None
+
+    def should_audit(self) -> bool:
+        """Whether to recompute this hit to check it"""
+        return random.random() < self.audit_rate
+
+    def record_audit(self, query: str, matched_query: str, correct: bool):
+        """Report whether an audited hit would have given the same answer"""
+        self.audits += 1
+        if not correct:
+            self.false_hits += 1
+            self.recent_false_hits.append({'query': query, 'matched': matched_query})
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': self._size,
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'guard_rejections': self.guard_rejections,
+            'audits': self.audits,
+            'false_hits': self.false_hits,
+            'false_hit_rate': self.false_hits / self.audits if self.audits else 0.0,
+            'recent_hits': list(self.recent_hits),
+            'recent_false_hits': list(self.recent_false_hits),
+        }
@@ -0,0 +1,292 @@
+"""
+Server-side chat sessions with a rolling summary under a token budget
+
+Each session keeps its most recent turns verbatim and folds older ones into a
+summary of one line per exchange, so the context sent with a follow-up question
+stays within a fixed budget however long the conversation runs. Token counts are
+computed once per turn when it is recorded.
+
+Sessions are stored in SQLite, so every worker process of the server sees the
+same conversation whichever one receives a follow-up. Turns are appended in a
+write transaction, so concurrent requests of one session never drop a turn.
+"""
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Dict, List, Any, Optional, Tuple
+
+from .canonical import canonical_args
+from .digest import estimate_tokens
+
+# Openings that refer back to earlier turns ("what about salinity?", "why is that?")
+FOLLOW_UP_OPENERS = (
+    'and ', 'but ', 'also ', 'now ', 'then ', 'ok ', 'okay ', 'so ',
+    'what about', 'how about', 'what if', 'same ', 'why is that', 'why was that', 'is that', 'was that',
+    'it ', 'its ', "it's ", 'that ', 'those ', 'these ', 'they ', 'them ', 'compared to that',
+)
+# Longest stored answer text; the data itself is in the function call line
+MAX_ANSWER_CHARS = 600
+MAX_SUMMARY_CHARS = 200
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+class ChatSession:
+    """Conversation state of one chat session"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.last_used = time.time()
+        self.summary: List[Tuple[str, int]] = []  # (line, tokens), oldest first
+        self.turns: List[Tuple[str, str, int]] = []  # (role, text, tokens), oldest first
+        self.last_call: Optional[Dict[str, Any]] = None  # First function call of the last answer
+        self.questions = 0
+
+    @property
+    def tokens(self) -> int:
+        return sum(t for _, t in self.summary) + sum(t for _, _, t in self.turns)
+
+
+class SessionStore:
+    """
+    Chat sessions stored in SQLite at `store_path` and shared by the worker
+    processes. Sessions idle for longer than `ttl_seconds` are dropped; at most
+    `max_sessions` are kept, the least recently used going first. Store access
+    runs on the default executor, and a failing store only costs the context of
+    a follow-up, never the answer.
+    """
+
+    def __init__(self, store_path: str, max_sessions: int, ttl_seconds: float, token_budget: int, recent_turns: int):
+        self.store_path = store_path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.follow_ups = 0
+        self.folded_turns = 0
+        self._init_store()
+
+    def _get_connection(self):
+        """Get a connection to the session store"""
+        return sqlite3.connect(self.store_path, timeout=5)
+
+    def _init_store(self):
+        """Create the session and turn tables and drop expired sessions"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+        with closing(self._get_connection()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    questions INTEGER NOT NULL,
+                    last_call TEXT,
+                    summary TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_turns (
+                    id INTEGER PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    tokens INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_used ON chat_sessions (last_used)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_turns_session ON chat_turns (session_id, id)")
+            self._drop(conn, "SELECT session_id FROM chat_sessions WHERE last_used < ?", [time.time() - self.ttl_seconds])
+
+    @staticmethod
+    def _drop(conn, select_ids: str, params: List[Any]):
+        """Delete the sessions (and their turns) selected by a query of session ids"""
+        conn.execute(f"DELETE FROM chat_turns WHERE session_id IN ({select_ids})", params)
+        conn.execute(f"DELETE FROM chat_sessions WHERE session_id IN ({select_ids})", params)
+
+    def _read(self, conn, session_id: str) -> Tuple[Optional[ChatSession], List[int]]:
+        """A live session and the row ids of its turns, or (None, [])"""
+        row = conn.execute(
+            "SELECT created_at, last_used, questions, last_call, summary FROM chat_sessions "
+            "WHERE session_id = ? AND last_used >= ?",
+            [session_id, time.time() - self.ttl_seconds]
+        ).fetchone()
+        if row is None:
+            return None, []
+        session = ChatSession(session_id)
+        session.created_at, session.last_used, session.questions = row[0], row[1], row[2]
+        session.last_call = json.loads(row[3]) if row[3] else None
+        session.summary = [tuple(line) for line in json.loads(row[4])]
+        turns = conn.execute(
+            "SELECT id, role, text, tokens FROM chat_turns WHERE session_id = ? ORDER BY id", [session_id]
+        ).fetchall()
+        session.turns = [(role, text, tokens) for _, role, text, tokens in turns]
+        return session, [turn_id for turn_id, _, _, _ in turns]
+
+    def _load(self, session_id: str) -> Optional[ChatSession]:
+        with closing(self._get_connection()) as conn:
+            return self._read(conn, session_id)[0]
+
+    def _append(self, session_id: str, turns: List[Tuple[str, str, int]], call: Optional[Dict[str, Any]]) -> ChatSession:
+        """
+        Append an exchange to the stored session and compact it, in one write
+        transaction, and return the session as stored
+        """
+        with closing(self._get_connection()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                session, turn_ids = self._read(conn, session_id)
+                if session is None:
+                    # New, or expired: start over
+                    conn.execute("DELETE FROM chat_turns WHERE session_id = ?", [session_id])
+                    session = ChatSession(session_id)
+                session.questions += 1
+                session.last_used = time.time()
+                if call is not None:
+                    session.last_call = call
+                for role, text, tokens in turns:
+                    cursor = conn.execute(
+                        "INSERT INTO chat_turns (session_id, role, text, tokens) VALUES (?, ?, ?, ?)",
+                        [session_id, role, text, tokens]
+                    )
+                    session.turns.append((role, text, tokens))
+                    turn_ids.append(cursor.lastrowid)
+
+                kept = len(session.turns)
+                self._compact(session)
+                folded = kept - len(session.turns)
+                if folded:
+                    conn.executemany("DELETE FROM chat_turns WHERE id = ?", [(turn_id,) for turn_id in turn_ids[:folded]])
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO chat_sessions (session_id, created_at, last_used, questions, last_call, summary) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [session_id, session.created_at, session.last_used, session.questions,
+                     json.dumps(session.last_call) if session.last_call is not None else None,
+                     json.dumps(session.summary)]
+                )
+                self._drop(
+                    conn, "SELECT session_id FROM chat_sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                    [self.max_sessions]
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return session
+
+    async def get(self, session_id: Optional[str] = None) -> ChatSession:
+        """The session with this id, created if new or expired"""
+        session_id = session_id or uuid.uuid4().hex
+        session = None
+        try:
+            session = await asyncio.get_running_loop().run_in_executor(None, self._load, session_id)
+        except Exception as e:
+            print(f"⚠️ Could not load chat session {session_id}: {e}")
+        return session or ChatSession(session_id)
+
+    def needs_context(self, session: ChatSession, query: str, intent: Dict[str, Any]) -> bool:
+        """
+        Whether a question can only be answered with the conversation so far: it
+        opens by referring back ("what about salinity?", "why is that?") or leaves
+        out what to measure or where ("and last year?")
+        """
+        if not session.turns and not session.summary:
+            return False
+        text = " ".join(re.findall(r"[a-z0-9']+", query.lower())) + " "
+        slots = intent['slots']
+        follow_up = text.startswith(FOLLOW_UP_OPENERS) or not (slots['parameter'] and slots['region'])
+        if follow_up:
+            self.follow_ups += 1
+        return follow_up
+
+    @staticmethod
+    def inherit_slots(session: ChatSession, intent: Dict[str, Any]) -> Dict[str, Any]:
+        """A parsed intent with missing filters taken from the previous question"""
+        previous = session.last_call
+        if previous is None:
+            return intent
+        args = dict(intent['args'])
+        previous_args = previous['args']
+        inherited = ['date_range', 'depth_range']
+        if intent['function'] != 'compare_oceanographic_data':
+            inherited.append('region')
+        for key in inherited:
+            if key not in args and key in previous_args:
+                args[key] = previous_args[key]
+        if not intent['slots']['parameter'] and previous_args.get('parameters'):
+            args['parameters'] = previous_args['parameters']
+        return {**intent, 'args': args}
+
+    async def record(self, session: ChatSession, query: str, result: Dict[str, Any]):
+        """Add a question and its answer to the stored session, folding old turns into the summary when over budget"""
+        answer = result.get('response') or result.get('message') or result.get('error') or ''
+        call = None
+        if result.get('function_results'):
+            first = result['function_results'][0]
+            call = {'function': first['function'], 'args': canonical_args(first.get('parameters'))}
+
+        answer_text = answer[:MAX_ANSWER_CHARS] + ("..." if len(answer) > MAX_ANSWER_CHARS else "")
+        if call is not None:
+            answer_text = f"[{call['function']}({call['args']})]\n{answer_text}"
+        turns = [(role, text, estimate_tokens(text)) for role, text in (('user', query), ('model', answer_text))]
+
+        try:
+            stored = await asyncio.get_running_loop().run_in_executor(None, self._append, session.session_id, turns, call)
+        except Exception as e:
+            print(f"⚠️ Could not store chat session {session.session_id}: {e}")
+            return
+        session.__dict__.update(stored.__dict__)
+
+    def _compact(self, session: ChatSession):
+        """Fold the oldest exchanges into summary lines, then drop the oldest lines, until within budget"""
+        while session.tokens > self.token_budget and len(session.turns) > self.recent_turns:
+            (_, question, _), (_, answer, _) = session.turns[0], session.turns[1]
+            del session.turns[:2]
+            line = f"Q: {question} -> {self._first_sentence(answer)}"
+            session.summary.append((line, estimate_tokens(line)))
+            self.folded_turns += 1
+
+        while session.tokens > self.token_budget and session.summary:
+            session.summary.pop(0)
+
+    @staticmethod
+    def _first_sentence(answer: str) -> str:
+        """Function call line and first sentence of an answer, shortened"""
+        lines = answer.split("\n", 1)
+        prefix = ""
+        if lines[0].startswith("[") and len(lines) > 1:
+            prefix, answer = lines[0] + " ", lines[1]
+        sentence = _SENTENCE_END.split(answer.strip(), 1)[0]
+        return (prefix + sentence)[:MAX_SUMMARY_CHARS]
+
+    @staticmethod
+    def context(session: ChatSession) -> List[Tuple[str, str]]:
+        """The conversation so far as (role, text) turns, starting with the summary"""
+        turns = []
+        if session.summary:
+            summary = "\n".join(line for line, _ in session.summary)
+            turns.append(('user', f"Summary of the earlier conversation:\n{summary}"))
+            turns.append(('model', "Understood."))
+        turns.extend((role, text) for role, text, _ in session.turns)
+        return turns
+
+    def _count(self) -> int:
+        with closing(self._get_connection()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM chat_sessions WHERE last_used >= ?", [time.time() - self.ttl_seconds]
+            ).fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'sessions': self._count(),
+            'max_sessions': self.max_sessions,
+            'token_budget': self.token_budget,
+            'follow_ups': self.follow_ups,
+            'folded_turns': self.folded_turns,
+        }
@@ -0,0 +1,144 @@
+"""
+Merged template calls for a batch of questions
+"""
+import asyncio
+from typing import Dict, List, Any, Optional, Tuple
+
+from .canonical import canonical_args, canonical_call_key
+from .deadline import QueryDeadline
+
+# Arguments that select what to compute rather than which rows to scan
+_AGGREGATE_SELECTORS = ('operation', 'parameters')
+
+
+class SharedScans:
+    """
+    The template calls planned for a batch of questions, run as few scans as possible:
+
+    - aggregates with the same filters are computed together by one scan
+      (query_shared_aggregates), whatever their operations and parameters;
+    - anomaly scans with the same filters run once for the union of their parameters;
+    - other identical calls run once.
+
+    `add` every planned call, then `start`. Planned calls then get their rows
+    from `results_for` (the interface of a Speculation), so each question's
+    answer only waits for the scans it needs. Calls planned later can go to
+    another SharedScans with this one as `parent`: calls the parent covers use
+    its scans, and the rest are merged anew.
+    """
+
+    def __init__(self, engine, deadline: Optional[QueryDeadline] = None, parent: Optional["SharedScans"] = None):
+        self.engine = engine
+        self.deadline = deadline
+        self.parent = parent
+        self._aggregates: Dict[str, Tuple[Dict[str, Any], List[List[str]]]] = {}
+        self._anomalies: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+        self._other: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+
+    def _canonical(self, function_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        return self.engine.canonical_kwargs(function_name, canonical_args(args))
+
+    def _aggregate_pairs(self, args: Dict[str, Any]) -> List[List[str]]:
+        parameters = args.get('parameters') or []
+        if 'all' in parameters:
+            parameters = self.engine.ALL_AGGREGATE_PARAMETERS
+        operation = args.get('operation', 'average')
+        return [[operation, parameter] for parameter in parameters]
+
+    def _anomaly_parameters(self, args: Dict[str, Any]) -> List[str]:
+        parameters = args.get('parameters') or []
+        if not parameters or 'all' in parameters:
+            return list(self.engine.ALL_ANOMALY_PARAMETERS)
+        return list(parameters)
+
+    def _group_key(self, function_name: str, args: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """The key of the scan a call belongs to, and the call's filters"""
+        if function_name == 'query_aggregate_statistics':
+            filters = {k: v for k, v in args.items() if k not in _AGGREGATE_SELECTORS}
+            return canonical_call_key('query_shared_aggregates', filters), filters
+        if function_name == 'detect_anomalies_and_trends':
+            filters = {k: v for k, v in args.items() if k != 'parameters'}
+            return canonical_call_key(function_name, filters), filters
+        return canonical_call_key(function_name, args), args
+
+    def covers(self, function_name: str, args: Dict[str, Any]) -> bool:
+        """Whether a call's rows are computed by these scans"""
+        args = self._canonical(function_name, args)
+        key, _ = self._group_key(function_name, args)
+        if function_name == 'query_aggregate_statistics':
+            return key in self._aggregates and all(
+                pair in self._aggregates[key][1] for pair in self._aggregate_pairs(args)
+            )
+        if function_name == 'detect_anomalies_and_trends':
+            return key in self._anomalies and set(self._anomaly_parameters(args)) <= set(self._anomalies[key][1])
+        return key in self._other
+
+    def add(self, function_name: str, args: Dict[str, Any]):
+        """Register a planned call"""
+        self.calls += 1
+        if self.parent is not None and self.parent.covers(function_name, args):
+            return
+        args = self._canonical(function_name, args)
+        key, filters = self._group_key(function_name, args)
+        if function_name == 'query_aggregate_statistics':
+            _, pairs = self._aggregates.setdefault(key, (filters, []))
+            pairs.extend(pair for pair in self._aggregate_pairs(args) if pair not in pairs)
+        elif function_name == 'detect_anomalies_and_trends':
+            _, parameters = self._anomalies.setdefault(key, (filters, []))
+            parameters.extend(p for p in self._anomaly_parameters(args) if p not in parameters)
+        else:
+            self._other.setdefault(key, (function_name, args))
+
+    def _run(self, function_name: str, args: Dict[str, Any]) -> asyncio.Future:
+        task = asyncio.ensure_future(self.engine.execute(function_name, deadline=self.deadline, **args))
+        # A failed scan is retried by the call that needs it; retrieve the error so it is not logged
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    def start(self):
+        """Start every merged scan"""
+        for key, (filters, pairs) in self._aggregates.items():
+            self._tasks[key] = self._run('query_shared_aggregates', {**filters, 'aggregates': pairs})
+        for key, (filters, parameters) in self._anomalies.items():
+            self._tasks[key] = self._run('detect_anomalies_and_trends', {**filters, 'parameters': parameters})
+        for key, (function_name, args) in self._other.items():
+            self._tasks[key] = self._run(function_name, args)
+
+    async def results_for(self, function_name: str, args: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Rows of a planned call from its merged scan, or None if it has none (or it failed)"""
+        if self.parent is not None and self.parent.covers(function_name, args):
+            return await self.parent.results_for(function_name, args)
+        args = self._canonical(function_name, args)
+        key, _ = self._group_key(function_name, args)
+        task = self._tasks.get(key)
+        if task is None:
+            return None
+        try:
+            rows = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return None
+
+        if function_name == 'query_aggregate_statistics':
+            by_pair = {(r['operation'], r['parameter']): r for r in rows}
+            pairs = [tuple(pair) for pair in self._aggregate_pairs(args)]
+            return [by_pair[pair] for pair in pairs] if all(pair in by_pair for pair in pairs) else None
+        if function_name == 'detect_anomalies_and_trends':
+            by_parameter = {r['parameter']: r for r in rows}
+            parameters = self._anomaly_parameters(args)
+            if not all(p in by_parameter for p in parameters):
+                return None
+            return [by_parameter[p] for p in parameters]
+        return rows
+
+    def cancel(self):
+        """Stop scans nobody needs any more"""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'scans': len(self._aggregates) + len(self._anomalies) + len(self._other)}
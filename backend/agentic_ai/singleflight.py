@@ -0,0 +1,75 @@
+"""
+Single-flight coalescing of identical in-flight work
+"""
+import asyncio
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+
+class _Flight:
+    """One in-flight computation and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Task, on_abandon: Optional[Callable[[], None]]):
+        self.task = task
+        self.on_abandon = on_abandon
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+
+    Callers that ask for a key while its computation is in flight await the same
+    result instead of starting another. The computation is only cancelled when
+    every caller waiting on it has been cancelled; `on_abandon` is then invoked so
+    work on other threads (e.g. a SQLite scan) can be stopped too. Results are
+    shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        on_abandon: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """Return the result of `fn()`, sharing it with concurrent callers of the same key"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()), on_abandon)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Last interested caller gave up; stop the shared work
+                if flight.on_abandon is not None:
+                    flight.on_abandon()
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        """Drop a finished flight so later calls start fresh"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counts of started and coalesced computations"""
+        total = self.started + self.coalesced
+        return {
+            'in_flight': len(self._flights),
+            'started': self.started,
+            'coalesced': self.coalesced,
+            'coalesced_ratio': self.coalesced / total if total else 0.0,
+        }
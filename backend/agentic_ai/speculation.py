@@ -0,0 +1,149 @@
+"""
+Speculative execution of the likely SQL query while Gemini plans
+"""
+import asyncio
+import threading
+from typing import Dict, List, Any, Optional
+
+from .canonical import canonical_args, canonical_call_key
+from .deadline import QueryDeadline
+from .metrics import get_metrics
+
+# Templates returning one row per requested parameter, so a call for some of the
+# parameters can be answered from the rows of a call for more of them
+PER_PARAMETER_FUNCTIONS = ('query_aggregate_statistics', 'detect_anomalies_and_trends')
+
+
+class SpeculationStats:
+    """Outcomes of speculative queries and the CPU time they used"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0  # Gemini planned exactly the speculative call
+        self.contained = 0  # Gemini planned a call answerable from its rows
+        self.misses = 0
+        self.used_cpu_seconds = 0.0
+        self.wasted_cpu_seconds = 0.0
+        self.metrics = get_metrics()
+
+    def record(self, outcome: str, cpu_seconds: float):
+        with self._lock:
+            if outcome == 'hit':
+                self.hits += 1
+            elif outcome == 'contained':
+                self.contained += 1
+            else:
+                self.misses += 1
+            if outcome == 'miss':
+                self.wasted_cpu_seconds += cpu_seconds
+            else:
+                self.used_cpu_seconds += cpu_seconds
+        self.metrics.increment('speculation_total', {'outcome': outcome})
+        self.metrics.increment('speculation_cpu_seconds_total', {'used': outcome != 'miss'}, cpu_seconds)
+
+    def add_wasted(self, cpu_seconds: float):
+        """CPU time a discarded speculation used after it was discarded"""
+        with self._lock:
+            self.wasted_cpu_seconds += cpu_seconds
+        self.metrics.increment('speculation_cpu_seconds_total', {'used': False}, cpu_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        resolved = self.hits + self.contained + self.misses
+        return {
+            'started': self.started,
+            'hits': self.hits,
+            'contained': self.contained,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.contained) / resolved if resolved else 0.0,
+            'used_cpu_seconds': round(self.used_cpu_seconds, 3),
+            'wasted_cpu_seconds': round(self.wasted_cpu_seconds, 3),
+        }
+
+
+class _SpeculativeDeadline(QueryDeadline):
+    """Child deadline of a speculation, counting CPU charged after it was discarded as wasted"""
+
+    def __init__(self, parent: Optional[QueryDeadline], speculation: "Speculation"):
+        super().__init__(parent=parent)
+        self._speculation = speculation
+
+    def charge(self, cpu_seconds: float):
+        speculation = self._speculation
+        with speculation._lock:
+            super().charge(cpu_seconds)
+            if speculation.finished and speculation.outcome == 'miss':
+                speculation.stats.add_wasted(cpu_seconds)
+
+
+class Speculation:
+    """
+    A template query started from the local parser's guess while Gemini plans.
+
+    Planned calls ask `results_for` for their results: a call identical to the
+    speculative one gets its result, and a call for a subset of its parameters
+    (all other arguments equal) gets the matching rows. `finish` must be called
+    once the plan has run; an unused speculation is cancelled then.
+    """
+
+    def __init__(self, engine, function_name: str, args: Dict[str, Any],
+                 deadline: Optional[QueryDeadline], stats: SpeculationStats):
+        self.engine = engine
+        self.function_name = function_name
+        self.args = engine.canonical_kwargs(function_name, canonical_args(args))
+        self.key = canonical_call_key(function_name, self.args)
+        self.stats = stats
+        self.outcome = 'miss'
+        self.finished = False
+        self._lock = threading.Lock()
+        self.deadline = _SpeculativeDeadline(deadline, self)
+        self.task = asyncio.ensure_future(engine.execute(function_name, deadline=self.deadline, **self.args))
+        # An unused speculation's error is not interesting; retrieve it so it is not logged
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        stats.started += 1
+
+    def match(self, function_name: str, args: Dict[str, Any]) -> Optional[str]:
+        """'hit' or 'contained' if the call can use the speculative result, else None"""
+        if function_name != self.function_name:
+            return None
+        args = self.engine.canonical_kwargs(function_name, canonical_args(args))
+        if canonical_call_key(function_name, args) == self.key:
+            return 'hit'
+        if function_name not in PER_PARAMETER_FUNCTIONS:
+            return None
+
+        wanted = args.get('parameters') or []
+        available = self.args.get('parameters') or []
+        if 'all' in wanted or 'all' in available or not set(wanted) <= set(available):
+            return None
+        other_args = lambda a: {k: v for k, v in a.items() if k != 'parameters'}
+        return 'contained' if other_args(args) == other_args(self.args) else None
+
+    async def results_for(self, function_name: str, args: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Results of a planned call from the speculative query, or None if it cannot be used"""
+        outcome = self.match(function_name, args)
+        if outcome is None:
+            return None
+        try:
+            results = await asyncio.shield(self.task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The speculative query failed; the caller runs its own
+            return None
+
+        if outcome == 'hit' or self.outcome == 'miss':
+            self.outcome = outcome
+        if outcome == 'contained':
+            order = {parameter: i for i, parameter in enumerate(args['parameters'])}
+            results = sorted((r for r in results if r.get('parameter') in order), key=lambda r: order[r['parameter']])
+        return results
+
+    def finish(self):
+        """Record the outcome, cancelling the query if nothing used it"""
+        with self._lock:
+            self.finished = True
+            cpu_seconds = self.deadline.cpu_seconds
+        if self.outcome == 'miss' and not self.task.done():
+            self.task.cancel()
+        self.stats.record(self.outcome, cpu_seconds)
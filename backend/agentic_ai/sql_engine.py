@@ -2,22 +2,259 @@
 SQL Template Engine for Oceanographic Queries
 """
 import sqlite3
+import asyncio
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, timedelta
 import json
-import numpy as np
 from .config import AgenticConfig
+from .deadline import QueryDeadline, QueryTimeoutError
+from .canonical import canonical_call_key
+from .singleflight import SingleFlight
+from .result_cache import ResultCache, MISS
+from .metrics import get_metrics
 
 class SQLTemplateEngine:
     """Deterministic SQL template engine for oceanographic data queries"""
     
-    def __init__(self, db_path: str):
+    # Template methods that may be dispatched by name (e.g. from Gemini function calls)
+    QUERY_FUNCTIONS = (
+        'query_aggregate_statistics',
+        'query_shared_aggregates',
+        'detect_anomalies_and_trends',
+        'query_profile_data',
+        'query_time_series_data',
+        'compare_oceanographic_data',
+        'get_data_summary',
+    )
+    
+    # Parameter names accepted in calls, by measurements column
+    PARAMETER_COLUMNS = {
+        'temperature': 'temp',
+        'salinity': 'psal',
+        'oxygen': 'doxy',
+        'chlorophyll': 'chla',
+        'nitrate': 'nitrate',
+        'ph': 'ph',
+        'bbp700': 'bbp700',
+        'pressure': 'pressure',
+    }
+    # Parameters covered by 'all' in aggregate and anomaly calls
+    ALL_AGGREGATE_PARAMETERS = ['temp', 'psal', 'pressure', 'doxy']
+    ALL_ANOMALY_PARAMETERS = ['temp', 'psal', 'doxy', 'chla', 'nitrate', 'ph']
+    
+    AGGREGATE_FUNCTIONS = {
+        'average': 'AVG',
+        'mean': 'AVG',
+        'avg': 'AVG',
+        'maximum': 'MAX',
+        'max': 'MAX',
+        'minimum': 'MIN',
+        'min': 'MIN',
+        'count': 'COUNT',
+        'sum': 'SUM',
+    }
+    STD_OPERATIONS = ('std', 'standard_deviation')
+    
+    # SQLite VM instructions between deadline checks (and the unit in which scan work is counted)
+    PROGRESS_HANDLER_INTERVAL = 1000
+    
+    def __init__(self, db_path: str, max_workers: Optional[int] = None, workload_log=None):
         self.db_path = db_path
+        # Optional WorkloadLog receiving every call made through `execute`
+        self.workload_log = workload_log
         self.config = AgenticConfig()
+        # Created on the first `execute`, so engines only used synchronously own no threads
+        self._max_workers = max_workers or self.config.SQL_EXECUTOR_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Deadline of the query running on the current executor thread
+        self._local = threading.local()
+        # Identical concurrent calls share one scan; repeated calls are served from cache
+        self._flights = SingleFlight()
+        self._cache = ResultCache(self.config.RESULT_CACHE_MAX_BYTES)
+        self.metrics = get_metrics()
+    
+    async def execute(self, function_name: str, deadline: Optional[QueryDeadline] = None, **kwargs) -> Any:
+        """
+        Run a template query on the engine's bounded executor and await the result,
+        so the event loop keeps serving other requests while SQLite is busy.
+        
+        The query is interrupted when `deadline` expires or when every task awaiting
+        it is cancelled, raising QueryTimeoutError.
+        
+        Results are cached per canonical arguments until the database changes, and
+        concurrent calls with the same arguments share a single scan. Callers receive
+        shared result objects and must not modify them.
+        
+        With a workload log, every call is recorded with its cache status ('hit',
+        'miss', 'coalesced' when it joined another call's scan, or 'timeout').
+        """
+        if function_name not in self.QUERY_FUNCTIONS:
+            raise ValueError(f"Unknown query function: {function_name}")
+        
+        started = time.perf_counter()
+        kwargs = self.canonical_kwargs(function_name, kwargs)
+        key = canonical_call_key(function_name, kwargs)
+        version = self.data_version()
+        cached = self._cache.get(key, version)
+        self.metrics.increment('sql_result_cache_total', {'outcome': 'miss' if cached is MISS else 'hit'})
+        if cached is not MISS:
+            self._record_call(function_name, kwargs, 'hit', cached, started)
+            return cached
+        
+        # Filled in by our own scan; stays empty if we only joined another call's
+        scan: Dict[str, Any] = {}
+        try:
+            result = await self._execute_coalesced(function_name, deadline, kwargs, key, version, scan)
+        except QueryTimeoutError:
+            self._record_call(function_name, kwargs, 'timeout', None, started, scan)
+            raise
+        self._record_call(function_name, kwargs, 'miss' if scan else 'coalesced', result, started, scan)
+        return result
+    
+    async def _execute_coalesced(self, function_name: str, deadline: Optional[QueryDeadline],
+                                 kwargs: Dict[str, Any], key: str, version: Any, scan: Dict[str, Any]) -> Any:
+        """Run an uncached call, sharing the scan with identical concurrent calls"""
+        method = getattr(self, function_name)
+        while True:
+            call_deadline = deadline.child() if deadline is not None else QueryDeadline()
+            if call_deadline.expired():
+                raise QueryTimeoutError(call_deadline.describe())
+            
+            try:
+                return await self._flights.do(
+                    key,
+                    lambda: self._run_and_cache(method, call_deadline, kwargs, key, version, scan),
+                    # Nobody is waiting for the result any more; stop the scan on its thread
+                    on_abandon=call_deadline.cancel
+                )
+            except QueryTimeoutError:
+                # The shared scan belonged to a request whose deadline passed; run
+                # our own if we still have time
+                if deadline is not None and deadline.expired():
+                    raise
+                if deadline is None and call_deadline.expired():
+                    raise
+    
+    async def _run_in_executor(self, method, deadline: QueryDeadline, kwargs: Dict[str, Any],
+                               scan: Optional[Dict[str, Any]] = None) -> Any:
+        """Run a template method on the engine's executor"""
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="sql-engine")
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self._run_with_deadline, method, deadline, kwargs, scan)
+        )
+    
+    async def _run_and_cache(self, method, deadline: QueryDeadline, kwargs: Dict[str, Any],
+                             key: str, version: Any, scan: Optional[Dict[str, Any]] = None) -> Any:
+        """Run a template method and cache its result, measured on the executor thread"""
+        def run_and_measure(**method_kwargs):
+            result = method(**method_kwargs)
+            return result, ResultCache.size_of(result)
+        
+        result, size = await self._run_in_executor(run_and_measure, deadline, kwargs, scan)
+        self._cache.put(key, result, version, size)
+        return result
     
+    def _record_call(self, function_name: str, kwargs: Dict[str, Any], cache: str, result: Any,
+                     started: float, scan: Optional[Dict[str, Any]] = None):
+        """Add a call to the workload log, if there is one"""
+        if self.workload_log is None:
+            return
+        rows = len(result) if isinstance(result, list) else int(result is not None)
+        self.workload_log.record(
+            function_name, kwargs, cache, rows,
+            vm_steps=(scan or {}).get('vm_steps', 0),
+            seconds=time.perf_counter() - started,
+        )
+    
+    def canonical_kwargs(self, function_name: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Arguments with implicit defaults made explicit, so calls that run the same
+        query share a cache key. Unset (None) arguments are dropped, and the
+        anomaly scan's default "last 365 days" window is pinned to today's date.
+        """
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        if function_name == 'detect_anomalies_and_trends' and not kwargs.get('date_range'):
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=365)
+            kwargs['date_range'] = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+        return kwargs
+    
+    def data_version(self) -> tuple:
+        """Changes whenever the database (or its write-ahead log) is modified"""
+        version = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+    
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """How many calls shared an in-flight scan"""
+        return self._flights.get_stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Result cache hit/miss counters and memory use"""
+        return self._cache.get_stats()
+    
+    def _run_with_deadline(self, method, deadline: QueryDeadline, kwargs: Dict[str, Any],
+                           scan: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Run a template method on an executor thread with its deadline installed.
+        The SQLite work it does is counted into `scan['vm_steps']`.
+        """
+        if deadline.expired():
+            raise QueryTimeoutError(deadline.describe())
+        
+        self._local.deadline = deadline
+        self._local.vm_steps = 0
+        started = time.thread_time()
+        try:
+            return method(**kwargs)
+        except sqlite3.OperationalError as e:
+            if deadline.expired():
+                raise QueryTimeoutError(deadline.describe()) from e
+            raise
+        finally:
+            self._local.deadline = None
+            deadline.charge(time.thread_time() - started)
+            if scan is not None:
+                scan['vm_steps'] = self._local.vm_steps
+    
+    def shutdown(self, wait: bool = True):
+        """Release the executor threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+    
+    @contextmanager
     def _get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """
+        Get a database connection that is closed as soon as the block exits.
+        If a deadline is active on this thread, SQLite aborts the running
+        statement once it expires.
+        """
+        conn = sqlite3.connect(self.db_path)
+        deadline = getattr(self._local, 'deadline', None)
+        conn.set_progress_handler(lambda: self._on_progress(deadline), self.PROGRESS_HANDLER_INTERVAL)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def _on_progress(self, deadline: Optional[QueryDeadline]) -> int:
+        """Count SQLite's work on this thread; a non-zero return aborts the statement"""
+        self._local.vm_steps = getattr(self._local, 'vm_steps', 0) + self.PROGRESS_HANDLER_INTERVAL
+        return 1 if deadline is not None and deadline.expired() else 0
     
     def _parse_date_range(self, date_range: List[str]) -> tuple:
         """Parse and validate date range"""
@@ -87,15 +324,8 @@ class SQLTemplateEngine:
         else:
             return "", []
     
-    def query_aggregate_statistics(self, **kwargs) -> List[Dict[str, Any]]:
-        """Query aggregate statistics"""
-        operation = kwargs.get('operation', 'average')
-        parameters = kwargs.get('parameters', [])
-        
-        if 'all' in parameters:
-            parameters = ['temp', 'psal', 'pressure', 'doxy']
-        
-        # Build filters
+    def _build_where_clause(self, kwargs: Dict[str, Any]) -> tuple:
+        """Spatial, temporal and depth filters of a template call as one WHERE clause"""
         spatial_filter, spatial_params = self._build_spatial_filter(
             kwargs.get('lat_bounds'), 
             kwargs.get('lon_bounds'), 
@@ -108,120 +338,112 @@ class SQLTemplateEngine:
             kwargs.get('depth_range')
         )
         
-        # Combine filters
         filters = []
         all_params = []
+        for condition, params in ((spatial_filter, spatial_params),
+                                  (temporal_filter, temporal_params),
+                                  (depth_filter, depth_params)):
+            if condition:
+                filters.append(condition)
+                all_params.extend(params)
+        
+        return (" AND ".join(filters) if filters else "1=1"), all_params
+    
+    def _aggregate_rows(self, conn, where_clause: str, all_params: List[Any],
+                        aggregates: List[List[str]], kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Compute (operation, parameter) aggregates over the filtered measurements.
+        Plain aggregates share a single scan; standard deviations need their own.
+        """
+        values = {}
+        plain = [(op, param) for op, param in aggregates if op.lower() not in self.STD_OPERATIONS]
+        if plain:
+            select = []
+            for operation, param in plain:
+                column = self.PARAMETER_COLUMNS.get(param, param)
+                agg_func = self.AGGREGATE_FUNCTIONS.get(operation.lower(), 'AVG')
+                select.append(f"{agg_func}(m.{column}), COUNT(m.{column})")
+            sql = f"""
+            SELECT {", ".join(select)}
+            FROM profiles p 
+            JOIN measurements m ON p.id = m.profile_id
+            WHERE {where_clause}
+            """
+            row = conn.execute(sql, all_params).fetchone()
+            for i, key in enumerate(plain):
+                values[key] = (row[2 * i], row[2 * i + 1])
+        
+        for operation, param in aggregates:
+            if operation.lower() not in self.STD_OPERATIONS:
+                continue
+            column = self.PARAMETER_COLUMNS.get(param, param)
+            sql = f"""
+            WITH avg_data AS (
+                SELECT AVG(m.{column}) as avg_val 
+                FROM profiles p 
+                JOIN measurements m ON p.id = m.profile_id
+                WHERE {where_clause} AND m.{column} IS NOT NULL
+            )
+            SELECT 
+                SQRT(AVG((m.{column} - avg_val) * (m.{column} - avg_val))) as value,
+                COUNT(m.{column}) as count
+            FROM profiles p 
+            JOIN measurements m ON p.id = m.profile_id, avg_data
+            WHERE {where_clause} AND m.{column} IS NOT NULL
+            """
+            values[(operation, param)] = tuple(conn.execute(sql, all_params + all_params).fetchone())
         
-        if spatial_filter:
-            filters.append(spatial_filter)
-            all_params.extend(spatial_params)
-        
-        if temporal_filter:
-            filters.append(temporal_filter)
-            all_params.extend(temporal_params)
-        
-        if depth_filter:
-            filters.append(depth_filter)
-            all_params.extend(depth_params)
-        
-        where_clause = " AND ".join(filters) if filters else "1=1"
-        
-        # Build aggregate operation
-        agg_ops = {
-            'average': 'AVG',
-            'mean': 'AVG',
-            'avg': 'AVG',
-            'maximum': 'MAX',
-            'max': 'MAX',
-            'minimum': 'MIN',
-            'min': 'MIN',
-            'count': 'COUNT',
-            'sum': 'SUM',
-            'std': 'SQRT(AVG(({param} - avg_val) * ({param} - avg_val)))',
+        filters = {
+            'region': kwargs.get('region'),
+            'date_range': kwargs.get('date_range'),
+            'depth_range': kwargs.get('depth_range'),
         }
-        
-        agg_func = agg_ops.get(operation.lower(), 'AVG')
-        
         results = []
+        for operation, param in aggregates:
+            value, count = values[(operation, param)]
+            if value is not None:
+                results.append({
+                    'parameter': param,
+                    'value': float(value) if value else None,
+                    'count': int(count) if count else 0,
+                    'operation': operation,
+                    'filters': filters,
+                })
+            else:
+                # No data found - provide informative message
+                results.append({
+                    'parameter': param,
+                    'value': None,
+                    'count': 0,
+                    'operation': operation,
+                    'error': f'No data found for {param} in the specified region/time range',
+                    'filters': filters,
+                })
+        return results
+    
+    def query_aggregate_statistics(self, **kwargs) -> List[Dict[str, Any]]:
+        """Query aggregate statistics"""
+        operation = kwargs.get('operation', 'average')
+        parameters = kwargs.get('parameters', [])
         
-        with self._get_connection() as conn:
-            for param in parameters:
-                # Map parameter names to actual column names
-                param_mapping = {
-                    'temperature': 'temp',
-                    'salinity': 'psal',
-                    'oxygen': 'doxy',
-                    'chlorophyll': 'chla',
-                    'nitrate': 'nitrate',
-                    'ph': 'ph',
-                    'bbp700': 'bbp700',
-                    'pressure': 'pressure'
-                }
-                
-                param_norm = param_mapping.get(param, param)
-                
-                # Build SQL query with JOIN between profiles and measurements
-                if operation.lower() in ['std', 'standard_deviation']:
-                    # For standard deviation, need subquery
-                    sql = f"""
-                    WITH avg_data AS (
-                        SELECT AVG(m.{param_norm}) as avg_val 
-                        FROM profiles p 
-                        JOIN measurements m ON p.id = m.profile_id
-                        WHERE {where_clause} AND m.{param_norm} IS NOT NULL
-                    )
-                    SELECT 
-                        '{param}' as parameter,
-                        SQRT(AVG((m.{param_norm} - avg_val) * (m.{param_norm} - avg_val))) as value,
-                        COUNT(m.{param_norm}) as count,
-                        '{operation}' as operation
-                    FROM profiles p 
-                    JOIN measurements m ON p.id = m.profile_id, avg_data
-                    WHERE {where_clause} AND m.{param_norm} IS NOT NULL
-                    """
-                else:
-                    sql = f"""
-                    SELECT 
-                        '{param}' as parameter,
-                        {agg_func}(m.{param_norm}) as value,
-                        COUNT(m.{param_norm}) as count,
-                        '{operation}' as operation
-                    FROM profiles p 
-                    JOIN measurements m ON p.id = m.profile_id
-                    WHERE {where_clause} AND m.{param_norm} IS NOT NULL
-                    """
-                
-                cursor = conn.execute(sql, all_params)
-                row = cursor.fetchone()
-                
-                if row and row[1] is not None:
-                    results.append({
-                        'parameter': row[0],
-                        'value': float(row[1]) if row[1] else None,
-                        'count': int(row[2]) if row[2] else 0,
-                        'operation': row[3],
-                        'filters': {
-                            'region': kwargs.get('region'),
-                            'date_range': kwargs.get('date_range'),
-                            'depth_range': kwargs.get('depth_range'),
-                        }
-                    })
-                else:
-                    # No data found - provide informative message
-                    results.append({
-                        'parameter': param,
-                        'value': None,
-                        'count': 0,
-                        'operation': operation,
-                        'error': f'No data found for {param} in the specified region/time range',
-                        'filters': {
-                            'region': kwargs.get('region'),
-                            'date_range': kwargs.get('date_range'),
-                            'depth_range': kwargs.get('depth_range'),
-                        }
-                    })
+        if 'all' in parameters:
+            parameters = self.ALL_AGGREGATE_PARAMETERS
         
-        return results
+        where_clause, all_params = self._build_where_clause(kwargs)
+        with self._get_connection() as conn:
+            return self._aggregate_rows(
+                conn, where_clause, all_params, [[operation, param] for param in parameters], kwargs
+            )
+    
+    def query_shared_aggregates(self, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Several [operation, parameter] aggregates (`aggregates`) over the same
+        filters, as one scan. Rows are those of query_aggregate_statistics, in
+        the order of `aggregates`.
+        """
+        where_clause, all_params = self._build_where_clause(kwargs)
+        with self._get_connection() as conn:
+            return self._aggregate_rows(conn, where_clause, all_params, kwargs.get('aggregates', []), kwargs)
     
     def detect_anomalies_and_trends(self, **kwargs) -> List[Dict[str, Any]]:
         """Enhanced anomaly detection with trend analysis and comprehensive parameter coverage"""
@@ -237,7 +459,7 @@ class SQLTemplateEngine:
 
         # If no parameters specified or 'all' requested, analyze all available parameters
         if not parameters or 'all' in parameters:
-            parameters = ['temp', 'psal', 'doxy', 'chla', 'nitrate', 'ph']
+            parameters = self.ALL_ANOMALY_PARAMETERS
 
         # Build filters
         spatial_filter, spatial_params = self._build_spatial_filter(
@@ -0,0 +1,98 @@
+"""
+Per-question selection of tool declarations and system prompt sections
+
+Every Gemini request used to carry all tool declarations and the whole system
+prompt. When the local intent parser is confident about a question, the request
+only offers the tools it can need (the parsed function, the general statistics
+tool, profile retrieval when the question asks for raw data, and the trend and
+comparison tools when it mentions change over time or a comparison, in case
+the parse missed them) and the prompt sections for those tools. Follow-ups and
+unclear questions get everything.
+"""
+import re
+from collections import namedtuple
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from google.genai import types
+except ImportError:
+    types = None
+
+from .digest import estimate_tokens
+
+# The tool a selection always keeps, since most questions can fall back on it
+GENERAL_TOOL = 'query_aggregate_statistics'
+PROFILE_TOOL = 'query_profile_data'
+TREND_TOOL = 'detect_anomalies_and_trends'
+COMPARE_TOOL = 'compare_oceanographic_data'
+PROFILE_WORDS = re.compile(r"\b(profiles?|raw|readings?|measurements?|observations?|floats?|data points?|records?)\b")
+TREND_WORDS = re.compile(
+    r"\b(trends?|trending|over time|over the years|changed?|changes|changing|increas\w*|decreas\w*|ris(e|es|ing)|"
+    r"fall(s|ing)?|warming|cooling|anomal\w*|unusual|abnormal|outliers?)\b"
+)
+COMPARE_WORDS = re.compile(r"\b(compar\w*|versus|vs|differ\w*|contrast\w*|relative to)\b")
+DEPTH_WORDS = re.compile(r"\b(depths?|deep|deeper|shallow|pressures?|dbar|decibars?|meters?|metres?|surface|vertical)\b")
+
+PromptSelection = namedtuple('PromptSelection', ['tool_names', 'include_depth', 'system_instruction', 'tools', 'tokens'])
+
+
+def build_system_prompt(config, tool_names: Tuple[str, ...], include_depth: bool) -> str:
+    """The system prompt with the guidance for `tool_names` and, optionally, the depth section"""
+    tools = "".join(config.TOOL_PROMPTS[name] for name in tool_names)
+    sections = [config.SYSTEM_PROMPT_ROLE, config.SYSTEM_PROMPT_ANSWERING.format(tools=tools)]
+    if include_depth:
+        sections.append(config.SYSTEM_PROMPT_DEPTH)
+    sections.append(config.SYSTEM_PROMPT_DATA)
+    return "".join(sections)
+
+
+class ToolSelector:
+    """Chooses the tools and prompt sections a request carries, keeping each combination built once"""
+
+    def __init__(self, config, declarations: Dict[str, Any], min_confidence: float):
+        self.config = config
+        self.declarations = declarations
+        self.min_confidence = min_confidence
+        self._selections: Dict[Tuple[Tuple[str, ...], bool], PromptSelection] = {}
+        self.full = self._selection(tuple(declarations), include_depth=True)
+
+    def _selection(self, tool_names: Tuple[str, ...], include_depth: bool) -> PromptSelection:
+        key = (tool_names, include_depth)
+        if key not in self._selections:
+            system_instruction = build_system_prompt(self.config, tool_names, include_depth)
+            tokens = estimate_tokens(system_instruction) + sum(
+                estimate_tokens(self.declarations[name].model_dump(mode='json', exclude_none=True))
+                for name in tool_names
+            )
+            tools = [types.Tool(function_declarations=[self.declarations[name]]) for name in tool_names]
+            self._selections[key] = PromptSelection(tool_names, include_depth, system_instruction, tools, tokens)
+        return self._selections[key]
+
+    def select(self, query: str, intent: Optional[Dict[str, Any]], follow_up: bool = False) -> PromptSelection:
+        """The tools and system prompt for a question; everything when the intent is unclear"""
+        if follow_up or intent is None or intent['confidence'] < self.min_confidence:
+            return self.full
+
+        text = query.lower()
+        names = {GENERAL_TOOL, intent['function']}
+        if PROFILE_WORDS.search(text):
+            names.add(PROFILE_TOOL)
+        if TREND_WORDS.search(text):
+            names.add(TREND_TOOL)
+        if COMPARE_WORDS.search(text):
+            names.add(COMPARE_TOOL)
+        tool_names = tuple(name for name in self.declarations if name in names)
+        include_depth = (
+            PROFILE_TOOL in names
+            or bool(intent['slots'].get('depth_range'))
+            or bool(DEPTH_WORDS.search(text))
+        )
+        return self._selection(tool_names, include_depth)
+
+    def including(self, selection: PromptSelection, function_names) -> PromptSelection:
+        """A selection extended with the functions a plan calls (e.g. a cached plan)"""
+        names = (set(selection.tool_names) | set(function_names)) & set(self.declarations)
+        if len(names) == len(selection.tool_names):
+            return selection
+        tool_names = tuple(name for name in self.declarations if name in names)
+        return self._selection(tool_names, selection.include_depth or PROFILE_TOOL in names)
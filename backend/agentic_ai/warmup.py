@@ -0,0 +1,174 @@
+"""
+Cache warmup after startup and data refreshes
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from .answer_cache import normalize_query
+from .canonical import canonical_args
+from .deadline import QueryDeadline
+from .scheduler import RequestScheduler
+
+
+class CacheWarmer:
+    """
+    Replays the example questions and the most frequent recent questions of the
+    query log through the SQL layer, so their template calls are in the result
+    cache before users ask them. A pass runs after startup and again whenever
+    the data version changes (checked every `poll_seconds`).
+
+    Each question is warmed with the calls the agent would run for it: the
+    intent parser's call when it would take the fast path, else the calls
+    logged with its last answer (usually Gemini's plan), else the parser's call
+    when it is plausible enough to be speculated. Questions with none of these
+    are skipped, since warming never calls Gemini.
+
+    Calls run one at a time in the background priority class, so user requests
+    always go first.
+    """
+
+    IDLE = 'idle'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+
+    def __init__(self, agent, scheduler: RequestScheduler, top_queries: int, window_seconds: float,
+                 poll_seconds: float, call_timeout_seconds: float):
+        self.agent = agent
+        self.engine = agent.sql_engine
+        self.scheduler = scheduler
+        self.top_queries = top_queries
+        self.window_seconds = window_seconds
+        self.poll_seconds = poll_seconds
+        self.call_timeout_seconds = call_timeout_seconds
+        self.metrics = agent.metrics
+        self.metrics.describe('cache_warmup_questions_total', 'Questions replayed by the cache warmup, by outcome')
+        self.metrics.describe('cache_warmup_completeness', 'Share of the questions of the last warmup pass that were warmed')
+        self._task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.last_pass: Dict[str, Any] = {'state': self.IDLE}
+
+    def start(self):
+        """Warm the caches now, then again after each data refresh"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._watch())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self):
+        warmed_version = None
+        while True:
+            version = self.engine.data_version()
+            if version != warmed_version:
+                try:
+                    await self.warm()
+                    warmed_version = version
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"⚠️ Cache warmup failed: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _questions(self) -> List[Tuple[str, List[Dict[str, Any]], str]]:
+        """(question, logged calls, source) to warm, most frequent logged questions first"""
+        loop = asyncio.get_running_loop()
+        logged = await loop.run_in_executor(
+            None, self.agent.query_log.top_queries, self.top_queries, self.window_seconds
+        )
+        questions = [(entry['query'], entry['calls'], 'query_log') for entry in logged]
+        seen = {normalize_query(query) for query, _, _ in questions}
+        for category in self.agent.config.EXAMPLE_QUERIES:
+            for query in category['queries']:
+                if normalize_query(query) not in seen:
+                    seen.add(normalize_query(query))
+                    questions.append((query, [], 'examples'))
+        return questions
+
+    def _plan(self, query: str, logged_calls: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """The template calls the agent would run for a question, or [] if they cannot be known"""
+        intent = self.agent.intent_parser.parse(query)
+        parsed = [(intent['function'], canonical_args(intent['args']))]
+        if intent['confidence'] >= self.agent.config.FAST_PATH_CONFIDENCE or not self.agent.gemini_available:
+            return parsed
+        if logged_calls:
+            return [
+                (call['function'], call['args']) for call in logged_calls
+                if call['function'] in self.engine.QUERY_FUNCTIONS
+            ]
+        if intent['confidence'] >= self.agent.config.SPECULATION_MIN_CONFIDENCE:
+            return parsed
+        return []
+
+    async def _run_call(self, function_name: str, args: Dict[str, Any]):
+        async with self.scheduler.slot(RequestScheduler.BACKGROUND, 'warmup'):
+            await self.engine.execute(function_name, deadline=QueryDeadline(self.call_timeout_seconds), **args)
+
+    async def warm(self) -> Dict[str, Any]:
+        """Run one warmup pass and return its report"""
+        started = time.perf_counter()
+        version = self.engine.data_version()
+        report = {
+            'state': self.RUNNING,
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'questions': 0,
+            'warmed': 0,
+            'failed': 0,
+            'skipped': 0,
+            'sources': {'query_log': 0, 'examples': 0},
+            'calls': 0,
+            'superseded': False,
+            'completeness': 0.0,
+            'seconds': 0.0,
+        }
+        self.last_pass = report
+        questions = await self._questions()
+        report['questions'] = len(questions)
+        for _, _, source in questions:
+            report['sources'][source] += 1
+        print(f"🔥 Warming caches with {len(questions)} questions")
+
+        for query, logged_calls, _ in questions:
+            if self.engine.data_version() != version:
+                # The data changed under us; the next pass warms the new version
+                report['superseded'] = True
+                break
+            calls = self._plan(query, logged_calls)
+            if not calls:
+                report['skipped'] += 1
+                self.metrics.increment('cache_warmup_questions_total', {'outcome': 'skipped'})
+                continue
+            try:
+                for function_name, args in calls:
+                    await self._run_call(function_name, args)
+                    report['calls'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                report['failed'] += 1
+                self.metrics.increment('cache_warmup_questions_total', {'outcome': 'failed'})
+                print(f"⚠️ Could not warm '{query}': {e}")
+                continue
+            report['warmed'] += 1
+            self.metrics.increment('cache_warmup_questions_total', {'outcome': 'warmed'})
+
+        report.update(
+            state=self.COMPLETED,
+            finished_at=datetime.now().isoformat(),
+            completeness=round(report['warmed'] / report['questions'], 3) if report['questions'] else 1.0,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+        self.passes += 1
+        self.metrics.set_gauge('cache_warmup_completeness', report['completeness'])
+        print(
+            f"🔥 Cache warmup {report['completeness']:.0%} complete: {report['warmed']} warmed, "
+            f"{report['failed']} failed, {report['skipped']} skipped in {report['seconds']}s"
+        )
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'passes': self.passes, 'watching': self._task is not None, 'last_pass': dict(self.last_pass)}
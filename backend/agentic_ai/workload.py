@@ -0,0 +1,484 @@
+"""
+Persistent workload log of template calls, and an index advisor over it
+
+Every call made through SQLTemplateEngine.execute is logged with its shape
+(function and the kinds of filters it uses), canonical arguments, cache status,
+result rows, SQLite work and duration. The advisor takes the recurring shapes
+that cost the most scan time, tries candidate indexes for their filters inside
+a transaction that is rolled back, and proposes those that EXPLAIN QUERY PLAN
+shows in use and that make a replay of the shape's most common call faster.
+
+Run from the command line to print the advice, and with --apply to create the
+proposed indexes:
+
+    python -m backend.agentic_ai.workload --apply
+"""
+import argparse
+import atexit
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+from .config import AgenticConfig
+from .sql_engine import SQLTemplateEngine
+
+# Filter kind of each filtering argument of the templates
+FILTER_KINDS = {
+    'region': 'spatial',
+    'regions': 'spatial',
+    'lat_bounds': 'spatial',
+    'lon_bounds': 'spatial',
+    'date_range': 'date',
+    'time_periods': 'date',
+    'depth_range': 'depth',
+}
+# Indexes that may serve each filter kind: (table, columns). The profile indexes
+# carry the other profile filter columns so the join needs no table lookups.
+CANDIDATE_INDEXES = {
+    'spatial': [('profiles', ('latitude', 'longitude', 'profile_date'))],
+    'date': [('profiles', ('profile_date', 'latitude', 'longitude'))],
+    'depth': [('measurements', ('pressure', 'profile_id'))],
+}
+# Calls that made SQLite do work
+SCAN_STATUSES = ('miss', 'timeout')
+
+
+def call_shape(function_name: str, args: Dict[str, Any]) -> str:
+    """A call's function and the kinds of filters it uses, e.g. 'query_profile_data(date,spatial)'"""
+    kinds = sorted({FILTER_KINDS[name] for name, value in args.items() if name in FILTER_KINDS and value})
+    return f"{function_name}({','.join(kinds)})"
+
+
+def shape_kinds(shape: str) -> List[str]:
+    """The filter kinds of a shape"""
+    inside = shape[shape.index('(') + 1:-1]
+    return inside.split(',') if inside else []
+
+
+def index_name(table: str, columns: Tuple[str, ...]) -> str:
+    return f"idx_{table}_{'_'.join(columns)}"
+
+
+def index_ddl(table: str, columns: Tuple[str, ...]) -> str:
+    return f"CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON {table} ({', '.join(columns)})"
+
+
+class WorkloadLog:
+    """
+    Local log of template calls. Calls are buffered and written in batches by a
+    background thread, when `flush_rows` are waiting or `flush_seconds` have
+    passed since the last write (and at exit), so logging stays off the request
+    path. Entries older than `retention_seconds` are dropped at startup.
+    """
+
+    def __init__(self, store_path: str, retention_seconds: float, flush_rows: int = 100,
+                 flush_seconds: float = 5.0):
+        self.store_path = store_path
+        self.retention_seconds = retention_seconds
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._pending: List[tuple] = []
+        # The advisor reads (and flushes) the log from a worker thread
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher: Optional[threading.Thread] = None
+        self._init_store()
+        # Calls still buffered when the process exits are written then
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _get_connection(self):
+        """
+        Get a connection to the log whose transaction is committed (or rolled
+        back on error) and which is closed as soon as the block exits
+        """
+        conn = sqlite3.connect(self.store_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_store(self):
+        """Create the log table and drop expired entries"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+        with self._get_connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS calls (
+                    id INTEGER PRIMARY KEY,
+                    function TEXT NOT NULL,
+                    shape TEXT NOT NULL,
+                    args TEXT NOT NULL,
+                    cache TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    vm_steps INTEGER NOT NULL,
+                    seconds REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_shape ON calls (shape, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_created_at ON calls (created_at)")
+            conn.execute("DELETE FROM calls WHERE created_at < ?", [time.time() - self.retention_seconds])
+
+    def record(self, function_name: str, args: Dict[str, Any], cache: str, rows: int,
+               vm_steps: int, seconds: float):
+        """
+        Log a call. `args` are the canonical arguments, `cache` its cache status
+        and `vm_steps` the SQLite virtual machine steps its scan took (roughly
+        proportional to the rows scanned).
+        """
+        entry = (
+            function_name, call_shape(function_name, args), json.dumps(args, sort_keys=True, default=str),
+            cache, rows, vm_steps, seconds, time.time(),
+        )
+        with self._lock:
+            self._pending.append(entry)
+            due = len(self._pending) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds
+            if due and (self._flusher is None or not self._flusher.is_alive()):
+                self._flusher = threading.Thread(target=self.flush, name="workload-log-flush", daemon=True)
+                self._flusher.start()
+
+    def flush(self):
+        """Write the buffered calls"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            with self._get_connection() as conn:
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executemany(
+                    "INSERT INTO calls (function, shape, args, cache, rows, vm_steps, seconds, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    pending
+                )
+        except Exception as e:
+            print(f"⚠️ Could not write {len(pending)} logged calls: {e}")
+
+    def shapes(self, window_seconds: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Call shapes of the last `window_seconds`, the most total scan time first,
+        with their call counts, cache hit rate and average scan cost
+        """
+        scan_statuses = ", ".join("?" * len(SCAN_STATUSES))
+        sql = f"""
+            SELECT
+                shape,
+                function,
+                COUNT(*) AS calls,
+                SUM(cache = 'hit') AS hits,
+                SUM(cache IN ({scan_statuses})) AS scans,
+                SUM(cache = 'timeout') AS timeouts,
+                TOTAL(CASE WHEN cache IN ({scan_statuses}) THEN seconds END) AS scan_seconds,
+                AVG(CASE WHEN cache IN ({scan_statuses}) THEN vm_steps END) AS avg_vm_steps,
+                AVG(rows) AS avg_rows
+            FROM calls
+            WHERE created_at >= ?
+            GROUP BY shape, function
+            ORDER BY scan_seconds DESC
+        """
+        params = [*SCAN_STATUSES, *SCAN_STATUSES, *SCAN_STATUSES, time.time() - window_seconds]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [
+            {
+                'shape': row[0],
+                'function': row[1],
+                'calls': row[2],
+                'hit_rate': round(row[3] / row[2], 3) if row[2] else 0.0,
+                'scans': row[4],
+                'timeouts': row[5],
+                'scan_seconds': round(row[6], 4),
+                'avg_scan_seconds': round(row[6] / row[4], 4) if row[4] else 0.0,
+                'avg_vm_steps': int(row[7] or 0),
+                'avg_rows': round(row[8] or 0, 1),
+            }
+            for row in rows
+        ]
+
+    def common_args(self, shape: str, window_seconds: float) -> Optional[Dict[str, Any]]:
+        """The arguments most often scanned for a shape in the window (the latest on ties)"""
+        scan_statuses = ", ".join("?" * len(SCAN_STATUSES))
+        with self._get_connection() as conn:
+            row = conn.execute(f"""
+                SELECT args FROM calls
+                WHERE shape = ? AND created_at >= ? AND cache IN ({scan_statuses})
+                GROUP BY args
+                ORDER BY COUNT(*) DESC, MAX(id) DESC
+                LIMIT 1
+            """, [shape, time.time() - window_seconds, *SCAN_STATUSES]).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class _ReplayEngine(SQLTemplateEngine):
+    """Template engine running every query on one connection, which may hold uncommitted trial indexes"""
+
+    def __init__(self, conn: sqlite3.Connection, db_path: str):
+        super().__init__(db_path, max_workers=1)
+        self.conn = conn
+
+    @contextmanager
+    def _get_connection(self):
+        yield self.conn
+
+
+class IndexAdvisor:
+    """
+    Proposes indexes for the most expensive recurring call shapes of a workload log.
+
+    For each of the `top_shapes` shapes with at least `min_scans` scans in the
+    window, the shape's most common call is replayed `repeats` times without
+    and then with each candidate index for its filters. A candidate is built
+    inside a transaction that is rolled back afterwards, so the database is only
+    changed by `apply`; other connections may wait while it is being built, so
+    run the advisor off-peak. A candidate is proposed when the query plan uses
+    it and the replay is at least `min_speedup` times faster. The estimated
+    saving is the time saved per scan times the shape's scans in the window.
+    """
+
+    def __init__(self, db_path: str, workload_log: WorkloadLog, top_shapes: int, window_seconds: float,
+                 min_scans: int, repeats: int, min_speedup: float):
+        self.db_path = db_path
+        self.workload_log = workload_log
+        self.top_shapes = top_shapes
+        self.window_seconds = window_seconds
+        self.min_scans = min_scans
+        self.repeats = max(1, repeats)
+        self.min_speedup = min_speedup
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, so trial indexes live in explicit transactions
+        return sqlite3.connect(self.db_path, isolation_level=None)
+
+    @staticmethod
+    def _existing_indexes(conn: sqlite3.Connection, table: str) -> List[Tuple[str, ...]]:
+        """Column lists of a table's indexes"""
+        indexes = []
+        for row in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            columns = conn.execute(f"PRAGMA index_info({row[1]})").fetchall()
+            indexes.append(tuple(column[2] for column in columns))
+        return indexes
+
+    def _candidates(self, conn: sqlite3.Connection, shape: str) -> List[Tuple[str, Tuple[str, ...]]]:
+        """Candidate indexes for a shape's filters that the database does not have yet"""
+        candidates = []
+        for kind in shape_kinds(shape):
+            for table, columns in CANDIDATE_INDEXES.get(kind, []):
+                if columns not in self._existing_indexes(conn, table):
+                    candidates.append((table, columns))
+        return candidates
+
+    def _replay(self, engine: _ReplayEngine, function_name: str, args: Dict[str, Any]) -> Tuple[float, List[str]]:
+        """Median seconds of a call (after one untimed run) and the SELECT statements it ran"""
+        statements: List[str] = []
+        engine.conn.set_trace_callback(statements.append)
+        try:
+            getattr(engine, function_name)(**args)
+        finally:
+            engine.conn.set_trace_callback(None)
+
+        timings = []
+        for _ in range(self.repeats):
+            started = time.perf_counter()
+            getattr(engine, function_name)(**args)
+            timings.append(time.perf_counter() - started)
+        selects = [s for s in statements if s.lstrip().upper().startswith(('SELECT', 'WITH'))]
+        return statistics.median(timings), selects
+
+    @staticmethod
+    def _plans(conn: sqlite3.Connection, statements: List[str]) -> List[str]:
+        """EXPLAIN QUERY PLAN lines of the statements"""
+        lines = []
+        for statement in statements:
+            lines.extend(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall())
+        return lines
+
+    def _try_candidate(self, engine: _ReplayEngine, function_name: str, args: Dict[str, Any],
+                       table: str, columns: Tuple[str, ...]) -> Dict[str, Any]:
+        """Replay a call with a trial index, rolled back afterwards"""
+        conn = engine.conn
+        name = index_name(table, columns)
+        conn.execute("BEGIN")
+        try:
+            started = time.perf_counter()
+            conn.execute(index_ddl(table, columns))
+            build_seconds = time.perf_counter() - started
+            seconds, statements = self._replay(engine, function_name, args)
+            plan = self._plans(conn, statements)
+        finally:
+            conn.execute("ROLLBACK")
+        return {
+            'index': name,
+            'ddl': index_ddl(table, columns),
+            'build_seconds': round(build_seconds, 4),
+            'seconds': round(seconds, 5),
+            'plan': plan,
+            'used': any(name in line for line in plan),
+        }
+
+    def advise(self) -> Dict[str, Any]:
+        """Measure candidate indexes for the top shapes and return the advice report"""
+        self.workload_log.flush()
+        shapes = [
+            shape for shape in self.workload_log.shapes(self.window_seconds)
+            if shape['scans'] >= self.min_scans
+        ][:self.top_shapes]
+
+        conn = self._connect()
+        engine = _ReplayEngine(conn, self.db_path)
+        report_shapes = []
+        try:
+            for shape in shapes:
+                args = self.workload_log.common_args(shape['shape'], self.window_seconds)
+                entry = {**shape, 'args': args, 'candidates': [], 'recommended': None}
+                report_shapes.append(entry)
+                candidates = self._candidates(conn, shape['shape'])
+                if args is None or not candidates:
+                    continue
+
+                function_name = shape['function']
+                args = engine.canonical_kwargs(function_name, args)
+                baseline, statements = self._replay(engine, function_name, args)
+                entry['baseline_seconds'] = round(baseline, 5)
+                entry['baseline_plan'] = self._plans(conn, statements)
+                for table, columns in candidates:
+                    trial = self._try_candidate(engine, function_name, args, table, columns)
+                    trial['speedup'] = round(baseline / trial['seconds'], 2) if trial['seconds'] else None
+                    trial['estimated_seconds_saved'] = round(max(0.0, baseline - trial['seconds']) * shape['scans'], 4)
+                    entry['candidates'].append(trial)
+
+                useful = [
+                    trial for trial in entry['candidates']
+                    if trial['used'] and trial['speedup'] and trial['speedup'] >= self.min_speedup
+                ]
+                if useful:
+                    entry['recommended'] = max(useful, key=lambda trial: trial['estimated_seconds_saved'])['index']
+        finally:
+            engine.shutdown(wait=False)
+            conn.close()
+
+        # One recommendation per index, however many shapes it serves
+        recommendations: Dict[str, Dict[str, Any]] = {}
+        for entry in report_shapes:
+            for trial in entry['candidates']:
+                if trial['index'] != entry['recommended']:
+                    continue
+                recommendation = recommendations.setdefault(trial['index'], {
+                    'index': trial['index'],
+                    'ddl': trial['ddl'],
+                    'build_seconds': trial['build_seconds'],
+                    'shapes': [],
+                    'estimated_seconds_saved': 0.0,
+                })
+                recommendation['shapes'].append(entry['shape'])
+                recommendation['estimated_seconds_saved'] = round(
+                    recommendation['estimated_seconds_saved'] + trial['estimated_seconds_saved'], 4
+                )
+
+        return {
+            'window_seconds': self.window_seconds,
+            'shapes': report_shapes,
+            'recommendations': sorted(
+                recommendations.values(), key=lambda r: r['estimated_seconds_saved'], reverse=True
+            ),
+        }
+
+    def apply(self, recommendations: List[Dict[str, Any]]) -> List[str]:
+        """Create the recommended indexes; returns their names"""
+        conn = self._connect()
+        try:
+            for recommendation in recommendations:
+                print(f"🛠️ {recommendation['ddl']}")
+                conn.execute(recommendation['ddl'])
+        finally:
+            conn.close()
+        return [recommendation['index'] for recommendation in recommendations]
+
+
+def get_workload_log(config: AgenticConfig) -> WorkloadLog:
+    """The workload log in the configured state directory"""
+    return WorkloadLog(
+        os.path.join(config.STATE_DIR, 'workload.sqlite'),
+        retention_seconds=config.WORKLOAD_LOG_RETENTION_SECONDS,
+        flush_rows=config.WORKLOAD_LOG_FLUSH_ROWS,
+        flush_seconds=config.WORKLOAD_LOG_FLUSH_SECONDS,
+    )
+
+
+def build_advisor(db_path: str, config: AgenticConfig, workload_log: Optional[WorkloadLog] = None) -> IndexAdvisor:
+    """An index advisor with the configured limits"""
+    return IndexAdvisor(
+        db_path,
+        workload_log or get_workload_log(config),
+        top_shapes=config.INDEX_ADVISOR_TOP_SHAPES,
+        window_seconds=config.INDEX_ADVISOR_WINDOW_SECONDS,
+        min_scans=config.INDEX_ADVISOR_MIN_SCANS,
+        repeats=config.INDEX_ADVISOR_REPEATS,
+        min_speedup=config.INDEX_ADVISOR_MIN_SPEEDUP,
+    )
+
+
+def main():
+    """Print index advice for the logged workload, optionally creating the proposed indexes"""
+    config = AgenticConfig()
+    default_db = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "argo_data.sqlite")
+    parser = argparse.ArgumentParser(description="Index advice from the logged query workload")
+    parser.add_argument("--db", default=os.getenv('DATABASE_PATH', default_db))
+    parser.add_argument("--top", type=int, default=config.INDEX_ADVISOR_TOP_SHAPES, help="Call shapes to consider")
+    parser.add_argument("--window-hours", type=float, default=config.INDEX_ADVISOR_WINDOW_SECONDS / 3600)
+    parser.add_argument("--min-scans", type=int, default=config.INDEX_ADVISOR_MIN_SCANS)
+    parser.add_argument("--repeats", type=int, default=config.INDEX_ADVISOR_REPEATS)
+    parser.add_argument("--min-speedup", type=float, default=config.INDEX_ADVISOR_MIN_SPEEDUP)
+    parser.add_argument("--apply", action="store_true", help="Create the recommended indexes")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor(
+        args.db,
+        get_workload_log(config),
+        top_shapes=args.top,
+        window_seconds=args.window_hours * 3600,
+        min_scans=args.min_scans,
+        repeats=args.repeats,
+        min_speedup=args.min_speedup,
+    )
+    report = advisor.advise()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for shape in report['shapes']:
+            print(
+                f"{shape['shape']}: {shape['calls']} calls, {shape['scans']} scans, "
+                f"{shape['scan_seconds']}s scanning, hit rate {shape['hit_rate']:.0%}"
+            )
+            for trial in shape['candidates']:
+                print(
+                    f"   {trial['index']}: {shape['baseline_seconds']}s -> {trial['seconds']}s "
+                    f"(x{trial['speedup']}, {'used' if trial['used'] else 'not used'} by the plan)"
+                )
+        if not report['recommendations']:
+            print("No index recommendations")
+        for recommendation in report['recommendations']:
+            print(
+                f"✅ {recommendation['ddl']}  -- saves ~{recommendation['estimated_seconds_saved']}s "
+                f"over the window, builds in {recommendation['build_seconds']}s"
+            )
+
+    if args.apply and report['recommendations']:
+        created = advisor.apply(report['recommendations'])
+        print(f"Created {len(created)} index(es); cached results are invalidated by the schema change")
+
+
+if __name__ == "__main__":
+    main()
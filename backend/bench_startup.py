@@ -0,0 +1,83 @@
+"""
+Cold start benchmark for the FloatChat API
+
+Measures how long `import backend.main` takes in a fresh interpreter, then starts
+the server and measures the time until the first successful /floats response.
+Exits with status 1 if cold start exceeds the budget, so it can run in CI.
+
+Usage:
+    python backend/bench_startup.py --budget 3.0
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+
+def measure_import_seconds() -> float:
+    """Time to import the application module in a fresh interpreter"""
+    code = "import time; t = time.perf_counter(); import backend.main; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=project_root, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    """Pick an unused local port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response_seconds(timeout: float) -> float:
+    """Time from launching the server to the first 200 response from /floats"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/floats/?limit=1"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=project_root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"No response from /floats within {timeout:g} seconds")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FloatChat cold start benchmark")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0")),
+                        help="Maximum seconds from launch to first /floats response")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure; the median is checked")
+    args = parser.parse_args()
+
+    import_seconds = sorted(measure_import_seconds() for _ in range(args.runs))[args.runs // 2]
+    print(f"⏱️  import backend.main: {import_seconds * 1000:.0f} ms")
+
+    first_response = sorted(measure_first_response_seconds(args.budget * 5) for _ in range(args.runs))[args.runs // 2]
+    print(f"⏱️  launch to first /floats response: {first_response * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms)")
+
+    if first_response > args.budget:
+        print("❌ Cold start exceeds the budget")
+        sys.exit(1)
+    print("✅ Cold start within budget")
+
+
+if __name__ == "__main__":
+    main()
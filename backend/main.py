@@ -1,7 +1,10 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .routers import floats, profiles, chat
-from .agent_manager import initialize_agent
+from .agent_manager import get_agent, close_agent
+from .agentic_ai.metrics import get_metrics
 
 app = FastAPI(
     title="FloatChat API with Agentic AI",
@@ -17,17 +20,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize agentic AI agent
-agent_instance = initialize_agent()
+@app.on_event("startup")
+async def warm_agent():
+    """
+    Build the agent in a background thread without holding up startup, so map
+    endpoints answer immediately and the first chat does not pay the import cost.
+    Once built, the agent warms its result cache in the background.
+    """
+    async def build_and_warm():
+        agent_instance = await asyncio.get_running_loop().run_in_executor(None, get_agent)
+        if agent_instance is not None:
+            agent_instance.start_warmup()
+
+    asyncio.ensure_future(build_and_warm())
+
+@app.on_event("shutdown")
+async def close_agent_on_shutdown():
+    """Flush the agent's logs and release its connections and executors"""
+    await close_agent()
 
 # Include your routers in the main application
 app.include_router(floats.router)
 app.include_router(profiles.router)
 app.include_router(chat.router)
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Service metrics, including Gemini routing decisions, in Prometheus text format."""
+    return get_metrics().render_prometheus()
+
 @app.get("/")
 def root():
     """A simple root endpoint to confirm the API is running."""
+    agent_instance = get_agent()
     return {
         "message": "FloatChat API is running",
         "agentic_ai_enabled": agent_instance is not None,
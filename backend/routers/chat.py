@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from .. import schemas
 from ..agent_manager import get_agent
+from ..agentic_ai.jobs import get_job_manager
+from ..agentic_ai.scheduler import RequestScheduler, SchedulerOverloaded, get_scheduler, overloaded_http_exception
+from ..agentic_ai.deadline import QueryDeadline, request_deadline
 from typing import List, Dict, Any
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-def _create_visualization_data(function_results: List[Dict[str, Any]]) -> schemas.VisualizationData:
+async def _create_visualization_data(function_results: List[Dict[str, Any]]) -> schemas.VisualizationData:
     """
     Create visualization data from function results - generic approach
     """
@@ -32,7 +38,7 @@ def _create_visualization_data(function_results: List[Dict[str, Any]]) -> schema
     elif func_name == 'detect_anomalies_and_trends':
         return _create_anomaly_visualization(results, params)
     elif func_name == 'compare_oceanographic_data':
-        return _create_comparison_visualization(results, params)
+        return await _create_comparison_visualization(results, params)
     elif func_name == 'query_profile_data':
         return _create_profile_visualization(results, params)
     
@@ -270,14 +276,13 @@ def _create_anomaly_visualization(results: List[Dict[str, Any]], params: Dict[st
             }
         )
 
-def _create_comparison_visualization(results: List[Dict[str, Any]], params: Dict[str, Any]) -> schemas.VisualizationData:
+async def _create_comparison_visualization(results: List[Dict[str, Any]], params: Dict[str, Any]) -> schemas.VisualizationData:
     """Create time series comparison chart for the regions"""
     if not results:
         return None
     
     # For comparison queries, we want to show time series data
     # Get the raw data from the SQL engine for time series visualization
-    from ..agentic_ai.agent import OceanographicAgent
     agent = get_agent()
     if not agent:
         return None
@@ -290,28 +295,32 @@ def _create_comparison_visualization(results: List[Dict[str, Any]], params: Dict
     if not regions or not parameters:
         return None
     
-    # Get time series data for each region
+    # Get time series data for each region, running the queries off the event loop
+    series = [(region, param) for region in regions for param in parameters]
+    ts_results = await asyncio.gather(*[
+        agent.sql_engine.execute(
+            'query_time_series_data',
+            regions=[region],
+            parameters=[param],
+            date_range=time_periods[0] if time_periods else None
+        )
+        for region, param in series
+    ], return_exceptions=True)
+    
     chart_data = []
-    for region in regions:
-        for param in parameters:
-            try:
-                # Query time series data for this region and parameter
-                ts_data = agent.sql_engine.query_time_series_data(
-                    regions=[region],
-                    parameters=[param],
-                    date_range=time_periods[0] if time_periods else None
-                )
-                
-                # Format for visualization
-                for item in ts_data:
-                    chart_data.append({
-                        'date': item.get('profile_date', ''),
-                        'value': item.get(param, 0),
-                        'region': region,
-                        'parameter': param.title()
-                    })
-            except Exception as e:
-                print(f"Error getting time series data for {region} {param}: {e}")
+    for (region, param), ts_data in zip(series, ts_results):
+        if isinstance(ts_data, Exception):
+            print(f"Error getting time series data for {region} {param}: {ts_data}")
+            continue
+        
+        # Format for visualization
+        for item in ts_data:
+            chart_data.append({
+                'date': item.get('profile_date', ''),
+                'value': item.get(param, 0),
+                'region': region,
+                'parameter': param.title()
+            })
     
     if not chart_data:
         return None
@@ -396,8 +405,42 @@ def _create_profile_visualization(results: List[Dict[str, Any]], params: Dict[st
     # Fallback to generic table
     return _create_table_visualization(results, params)
 
+async def _build_chat_message(result: Dict[str, Any]) -> schemas.ChatMessage:
+    """
+    Turn an agent result into the AI chat message, including visualization data
+    """
+    if result.get('success'):
+        ai_response_content = result.get('response', 'I processed your query but couldn\'t generate a response.')
+        print(f"✅ Agentic AI response generated successfully")
+        
+        # Cached answers carry the visualization built the first time
+        visualization = result.get('visualization')
+        if visualization is None and result.get('function_results'):
+            visualization = await _create_visualization_data(result['function_results'])
+            agent = get_agent()
+            if agent and visualization is not None:
+                agent.remember_visualization(result, visualization.model_dump())
+        
+        return schemas.ChatMessage(
+            role="ai", 
+            content=ai_response_content,
+            visualization=visualization
+        )
+    
+    error_msg = result.get('error', 'Unknown error occurred')
+    print(f"❌ Agentic AI error: {error_msg}")
+    return schemas.ChatMessage(role="ai", content=f"I encountered an error while processing your query: {error_msg}")
+
+def _session_key(request: schemas.ChatRequest, http_request: Request) -> str:
+    """Key used for per-session fairness in the scheduler"""
+    return request.session_id or (http_request.client.host if http_request.client else None)
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 @router.post("/", response_model=schemas.ChatMessage)
-async def handle_chat_message(request: schemas.ChatRequest):
+async def handle_chat_message(request: schemas.ChatRequest, http_request: Request):
     """
     Receives the chat history and returns the AI's response using agentic AI.
     """
@@ -416,33 +459,129 @@ async def handle_chat_message(request: schemas.ChatRequest):
         if not user_message.strip():
             return schemas.ChatMessage(role="ai", content="I didn't receive a message. Please ask me something about the oceanographic data!")
         
-        print(f"🤖 Processing query with agentic AI: {user_message}")
-        
-        # Process the query using the agentic AI
-        result = await agent_instance.process_query(user_message)
+        scheduler = get_scheduler()
+        session_key = _session_key(request, http_request)
         
-        if result.get('success'):
-            ai_response_content = result.get('response', 'I processed your query but couldn\'t generate a response.')
-            print(f"✅ Agentic AI response generated successfully")
+        if request.run_async:
+            if not scheduler.has_capacity(RequestScheduler.BACKGROUND):
+                raise overloaded_http_exception(SchedulerOverloaded("The server is busy (background queue is full). Please retry shortly."))
             
-            # Create visualization data if function results are available
-            visualization = None
-            if result.get('function_results'):
-                visualization = _create_visualization_data(result['function_results'])
+            async def run_chat_job():
+                async with scheduler.slot(RequestScheduler.BACKGROUND, session_key):
+                    deadline = QueryDeadline(agent_instance.config.JOB_TIMEOUT_SECONDS)
+                    result = await agent_instance.process_query(user_message, deadline=deadline, session_id=request.session_id)
+                    if not result.get('success'):
+                        raise RuntimeError(result.get('error', 'Unknown error occurred'))
+                    return (await _build_chat_message(result)).model_dump()
             
+            job = await get_job_manager().submit('chat', {'query': user_message, 'session_id': request.session_id}, run_chat_job)
+            print(f"🗂️ Chat query queued as job {job['job_id']} (merged: {job['merged']})")
             return schemas.ChatMessage(
-                role="ai", 
-                content=ai_response_content,
-                visualization=visualization
+                role="ai",
+                content="This analysis is running in the background. I'll have the results shortly.",
+                job_id=job['job_id']
             )
-        else:
-            error_msg = result.get('error', 'Unknown error occurred')
-            ai_response_content = f"I encountered an error while processing your query: {error_msg}"
-            print(f"❌ Agentic AI error: {error_msg}")
         
-        return schemas.ChatMessage(role="ai", content=ai_response_content)
+        print(f"🤖 Processing query with agentic AI: {user_message}")
+        
+        # Process the query using the agentic AI
+        try:
+            async with scheduler.slot(RequestScheduler.ANALYSIS, session_key):
+                # Scans stop when the deadline passes or the browser goes away
+                async with request_deadline(http_request, agent_instance.config.REQUEST_TIMEOUT_SECONDS) as deadline:
+                    result = await agent_instance.process_query(user_message, deadline=deadline, session_id=request.session_id)
+                return await _build_chat_message(result)
+        except SchedulerOverloaded as e:
+            raise overloaded_http_exception(e)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"💥 Exception in chat handler: {str(e)}")
         ai_response_content = f"Sorry, I encountered an unexpected error: {str(e)}"
-        return schemas.ChatMessage(role="ai", content=ai_response_content)
\ No newline at end of file
+        return schemas.ChatMessage(role="ai", content=ai_response_content)
+
+async def _get_chat_job(job_id: str) -> dict:
+    """Look up a chat job or raise 404"""
+    job = await get_job_manager().get(job_id)
+    if job is None or job['kind'] != 'chat':
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+async def get_chat_job(job_id: str):
+    """
+    Polls the status of a chat analysis running in the background.
+    """
+    return await _get_chat_job(job_id)
+
+@router.get("/jobs/{job_id}/result", response_model=schemas.ChatMessage)
+async def get_chat_job_result(job_id: str):
+    """
+    Returns the AI's response once a background chat analysis has completed.
+    """
+    job = await _get_chat_job(job_id)
+    if job['status'] != 'completed':
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return await get_job_manager().get_result(job_id)
+
+@router.post("/stream")
+async def stream_chat_message(request: schemas.ChatRequest, http_request: Request):
+    """
+    Streams the AI's response as server-sent events.
+    
+    Events, in order: 'accepted', 'plan', 'function_started' / 'function_finished'
+    (with row counts), 'token' (answer text as it is generated), 'visualization',
+    and finally 'done' carrying the complete chat message. Failures are sent as 'error'.
+    """
+    agent_instance = get_agent()
+    user_message = request.history[-1].content if request.history else ""
+    scheduler = get_scheduler()
+    session_key = _session_key(request, http_request)
+    
+    # Shed load up front so overloaded servers answer with a plain 503
+    if not scheduler.has_capacity(RequestScheduler.ANALYSIS):
+        raise overloaded_http_exception(SchedulerOverloaded("The server is busy (analysis queue is full). Please retry shortly."))
+    
+    async def event_stream():
+        yield _sse_event('accepted', {'query': user_message})
+        
+        if not agent_instance:
+            content = f"This is a fallback response to your message: '{user_message}'. Agentic AI is not available."
+            yield _sse_event('done', schemas.ChatMessage(role="ai", content=content).model_dump())
+            return
+        
+        if not user_message.strip():
+            content = "I didn't receive a message. Please ask me something about the oceanographic data!"
+            yield _sse_event('done', schemas.ChatMessage(role="ai", content=content).model_dump())
+            return
+        
+        print(f"🤖 Streaming query with agentic AI: {user_message}")
+        
+        try:
+            async with scheduler.slot(RequestScheduler.ANALYSIS, session_key):
+                result = None
+                # A client disconnect cancels this generator, which cancels the query's scans
+                deadline = QueryDeadline(agent_instance.config.REQUEST_TIMEOUT_SECONDS)
+                async for event, data in agent_instance.stream_query(user_message, deadline=deadline, session_id=request.session_id):
+                    if event == 'result':
+                        result = data
+                    else:
+                        yield _sse_event(event, data)
+                
+                message = await _build_chat_message(result)
+            if message.visualization is not None:
+                yield _sse_event('visualization', message.visualization.model_dump())
+            yield _sse_event('done', message.model_dump())
+            
+        except SchedulerOverloaded as e:
+            yield _sse_event('error', {'message': str(e)})
+        except Exception as e:
+            print(f"💥 Exception in streaming chat handler: {str(e)}")
+            yield _sse_event('error', {'message': f"Sorry, I encountered an unexpected error: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
-from .. import crud, schemas, database
+from .. import crud, schemas, database, shared_cache
+from ..agentic_ai.scheduler import RequestScheduler, priority_slot
+from ..agentic_ai.singleflight import SingleFlight
+from ..agentic_ai.canonical import canonical_call_key
 
-router = APIRouter(prefix="/floats", tags=["floats"])
+# Cheap lookups run in the interactive class so they stay fast under chat load
+router = APIRouter(
+    prefix="/floats",
+    tags=["floats"],
+    dependencies=[Depends(priority_slot(RequestScheduler.INTERACTIVE))]
+)
 
 @router.get("/", response_model=List[schemas.FloatChatBase])
 def read_floats(skip: int = 0, limit: int = 1000, db: Session = Depends(database.get_db)):
@@ -14,6 +23,9 @@ def read_floats(skip: int = 0, limit: int = 1000, db: Session = Depends(database
 @router.get("/locations", response_model=List[schemas.FloatLocation])
 def read_all_float_locations(db: Session = Depends(database.get_db)):
     """Endpoint to get the latest known location of all floats."""
+    shared = shared_cache.get_location_table("locations")
+    if shared is not None:
+        return Response(content=shared, media_type="application/json")
     return crud.get_all_float_locations(db)
 
 @router.get("/locations/active", response_model=List[schemas.FloatLocation])
@@ -22,6 +34,9 @@ def read_active_float_locations(db: Session = Depends(database.get_db)):
     Endpoint to get the latest known location of only the floats that have
     at least one profile with scientific data.
     """
+    shared = shared_cache.get_location_table("locations_active")
+    if shared is not None:
+        return Response(content=shared, media_type="application/json")
     return crud.get_locations_for_active_floats(db)
 
 @router.get("/{float_id}", response_model=schemas.FloatChatBase)
@@ -51,10 +66,22 @@ def read_float_trajectory(float_id: str, db: Session = Depends(database.get_db))
     """Gets all profiles for a float, to be used for drawing its path."""
     return crud.get_profiles_by_float(db, float_id=float_id)
 
+# Users opening the same float at once share one timeseries query
+timeseries_flights = SingleFlight()
+
+def _load_full_timeseries(float_id: str):
+    """Run the timeseries query with its own session (it may serve several requests)"""
+    db = database.SessionLocal()
+    try:
+        return crud.get_full_timeseries_by_float(db, float_id=float_id)
+    finally:
+        db.close()
+
 @router.get("/{float_id}/timeseries", response_model=List[schemas.TimeSeriesData])
-def read_float_timeseries(float_id: str, db: Session = Depends(database.get_db)):
+async def read_float_timeseries(float_id: str):
     """
     Gets the complete measurement history for a single float for
     time-series plotting.
     """
-    return crud.get_full_timeseries_by_float(db, float_id=float_id)
\ No newline at end of file
+    key = canonical_call_key("floats.timeseries", {"float_id": float_id})
+    return await timeseries_flights.do(key, lambda: run_in_threadpool(_load_full_timeseries, float_id))
\ No newline at end of file
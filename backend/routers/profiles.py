@@ -2,8 +2,14 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List
 from .. import crud, schemas, database
+from ..agentic_ai.scheduler import RequestScheduler, priority_slot
 
-router = APIRouter(prefix="/profiles", tags=["profiles"])
+# Cheap lookups run in the interactive class so they stay fast under chat load
+router = APIRouter(
+    prefix="/profiles",
+    tags=["profiles"],
+    dependencies=[Depends(priority_slot(RequestScheduler.INTERACTIVE))]
+)
 
 @router.get("/{profile_id}/measurements", response_model=List[schemas.MeasurementBase])
 def read_measurements_for_profile(profile_id: int, db: Session = Depends(database.get_db)):
@@ -1,4 +1,5 @@
 
+import argparse
 import sys
 import os
 import uvicorn
@@ -9,4 +10,18 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 if __name__ == "__main__":
-    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
+    parser = argparse.ArgumentParser(description="Run the FloatChat API server")
+    parser.add_argument("--prod", action="store_true", help="Production mode: multiple workers, no auto-reload")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes in production mode")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.prod:
+        # Serialize the read-only location tables once; workers attach to the shared copy
+        from backend.shared_cache import publish_location_tables
+        publish_location_tables()
+        print(f"🚀 Starting {args.workers} workers on {args.host}:{args.port}")
+        uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run("backend.main:app", host=args.host, port=args.port, reload=True)
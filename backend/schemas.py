@@ -55,9 +55,21 @@ class ChatMessage(BaseModel):
     role: str 
     content: str
     visualization: Optional[VisualizationData] = None
+    job_id: Optional[str] = None  # Set when the answer is being computed by a background job
 
 class ChatRequest(BaseModel):
     history: List[ChatMessage]
+    session_id: Optional[str] = None
+    run_async: bool = False  # Answer with a job id and run the analysis in the background
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str  # 'pending', 'running', 'completed', 'failed'
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
 
 class TimeSeriesData(BaseModel):
     profile_date: str
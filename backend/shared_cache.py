@@ -0,0 +1,151 @@
+"""
+Read-only data shared between the worker processes of the production server
+
+The launcher process serializes the float location tables once and publishes them
+in shared memory segments. Workers attach to the segments named in the
+FLOATCHAT_SHARED_CACHE environment variable and serve the JSON bytes directly,
+so the tables are neither re-queried nor duplicated per worker.
+
+Each segment records the data version (database file stamps) it was built from.
+Once the database changes, a worker rebuilds the table from the database, once
+per version, and serves its own copy until the server is restarted.
+"""
+import atexit
+import json
+import os
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple, Union
+
+from . import crud, schemas
+from .database import SessionLocal, db_path
+
+SHARED_CACHE_ENV = "FLOATCHAT_SHARED_CACHE"
+
+# Table name -> query producing its rows
+LOCATION_TABLES = {
+    "locations": crud.get_all_float_locations,
+    "locations_active": crud.get_locations_for_active_floats,
+}
+
+# Segments created by this process (launcher) or attached to (worker)
+_segments: Dict[str, shared_memory.SharedMemory] = {}
+_sizes: Dict[str, int] = {}
+_versions: Dict[str, str] = {}
+_owned: set = set()
+# Table -> (data version, JSON) rebuilt by this process after the shared copy went stale
+_rebuilt: Dict[str, Tuple[str, bytes]] = {}
+_rebuild_lock = threading.Lock()
+
+
+def _data_version() -> str:
+    """Changes whenever the database (or its write-ahead log) is modified"""
+    stamps = []
+    for path in (str(db_path), f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            stamps.append(f"{stat.st_mtime_ns}-{stat.st_size}")
+        except FileNotFoundError:
+            stamps.append("none")
+    return "_".join(stamps)
+
+
+def _serialize(table: str, db) -> Tuple[bytes, int]:
+    """JSON of a location table and its row count"""
+    rows = [schemas.FloatLocation.model_validate(row).model_dump() for row in LOCATION_TABLES[table](db)]
+    return json.dumps(rows).encode("utf-8"), len(rows)
+
+
+def publish_location_tables() -> List[str]:
+    """
+    Serialize the location tables into shared memory and advertise them to worker
+    processes through the environment. Call once in the launcher, before the
+    workers start. Returns the names of the published tables.
+    """
+    entries = []
+    version = _data_version()
+    db = SessionLocal()
+    try:
+        for table in LOCATION_TABLES:
+            payload, row_count = _serialize(table, db)
+
+            segment = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+            segment.buf[:len(payload)] = payload
+            _segments[table] = segment
+            _sizes[table] = len(payload)
+            _versions[table] = version
+            _owned.add(table)
+            entries.append(f"{table}={segment.name}:{len(payload)}:{version}")
+            print(f"📦 Shared {table}: {row_count} rows, {len(payload) / 1024:.1f} KiB")
+    finally:
+        db.close()
+
+    os.environ[SHARED_CACHE_ENV] = ",".join(entries)
+    atexit.register(release_location_tables)
+    return list(LOCATION_TABLES)
+
+
+def release_location_tables():
+    """Close the segments, and remove them if this process created them"""
+    for table, segment in list(_segments.items()):
+        try:
+            segment.close()
+        except BufferError:
+            pass  # A response still holds a view; the mapping goes with the process
+        if table in _owned:
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        del _segments[table]
+        _owned.discard(table)
+
+
+def _attach(table: str) -> Optional[shared_memory.SharedMemory]:
+    """Attach to the published segment of a table, if the launcher shared one"""
+    if table in _segments:
+        return _segments[table]
+
+    for entry in os.getenv(SHARED_CACHE_ENV, "").split(","):
+        name, _, location = entry.partition("=")
+        if name != table or not location:
+            continue
+        segment_name, size, version = location.split(":")
+        try:
+            segment = shared_memory.SharedMemory(name=segment_name)
+        except FileNotFoundError:
+            return None
+        _segments[table] = segment
+        _sizes[table] = int(size)
+        _versions[table] = version
+        return segment
+    return None
+
+
+def _rebuild(table: str, version: str) -> bytes:
+    """This process's copy of a table for the current data version, queried once per version"""
+    with _rebuild_lock:
+        cached = _rebuilt.get(table)
+        if cached is None or cached[0] != version:
+            db = SessionLocal()
+            try:
+                payload, row_count = _serialize(table, db)
+            finally:
+                db.close()
+            _rebuilt[table] = (version, payload)
+            print(f"📦 Rebuilt stale shared {table}: {row_count} rows")
+        return _rebuilt[table][1]
+
+
+def get_location_table(table: str) -> Optional[Union[memoryview, bytes]]:
+    """
+    JSON for a shared location table, or None when running without shared tables.
+    The shared copy is returned as a view of the segment, without copying it.
+    """
+    segment = _attach(table)
+    if segment is None:
+        return None
+    version = _data_version()
+    if _versions[table] != version:
+        return _rebuild(table, version)
+    return segment.buf[:_sizes[table]]
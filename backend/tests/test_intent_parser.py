@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+from backend.agentic_ai.config import AgenticConfig
+from backend.agentic_ai.intent_parser import IntentParser
+
+TODAY = date(2025, 6, 15)
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return IntentParser()
+
+
+@pytest.mark.parametrize("query", [
+    "average temperature in the Bay of Bengal during winter?",
+    "maximum temperature in the arabian sea in summer 2023",
+    "average temperature in the northern bay of bengal",
+    "average temperature in the arabian sea at night",
+    "average temperature in the arabian sea excluding the surface",
+    "average temperature in the arabian sea not in 2023",
+    "max temperature below 500 m in the arabian sea",
+    "average oxygen at depth in the north pacific",
+])
+def test_unexplained_words_stay_off_the_fast_path(parser, query):
+    intent = parser.parse(query, today=TODAY)
+    assert intent['unknown_words']
+    assert intent['confidence'] < AgenticConfig.FAST_PATH_CONFIDENCE
+
+
+@pytest.mark.parametrize("query", [
+    "What is the average temperature in the Bay of Bengal last year?",
+    "average temperature in the bay of bengal in 2023",
+    "surface temperature in the arabian sea last year",
+    "average salinity between 100 and 300 m depth in the arabian sea",
+])
+def test_fully_explained_questions_take_the_fast_path(parser, query):
+    intent = parser.parse(query, today=TODAY)
+    assert intent['unknown_words'] == []
+    assert intent['confidence'] >= AgenticConfig.FAST_PATH_CONFIDENCE
+
+
+def test_negated_surface_sets_no_depth_range(parser):
+    intent = parser.parse("average temperature in the arabian sea excluding the surface", today=TODAY)
+    assert 'depth_range' not in intent['args']
@@ -0,0 +1,56 @@
+import asyncio
+
+from backend.agentic_ai.scheduler import RequestScheduler
+
+LIMITS = {
+    RequestScheduler.INTERACTIVE: (1, 10),
+    RequestScheduler.ANALYSIS: (1, 10),
+    RequestScheduler.BACKGROUND: (1, 10),
+}
+
+
+def test_lower_classes_progress_behind_an_interactive_backlog():
+    async def run():
+        scheduler = RequestScheduler(LIMITS)
+        await scheduler.acquire(RequestScheduler.INTERACTIVE)
+        backlog = [asyncio.ensure_future(scheduler.acquire(RequestScheduler.INTERACTIVE)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert scheduler.get_stats()[RequestScheduler.INTERACTIVE]['queued'] == 3
+
+        # Background and analysis have their own free slots and must not wait for the backlog
+        await asyncio.wait_for(scheduler.acquire(RequestScheduler.BACKGROUND), timeout=1)
+        await asyncio.wait_for(scheduler.acquire(RequestScheduler.ANALYSIS), timeout=1)
+
+        # A queued background request is admitted when a background slot frees, backlog or not
+        waiting = asyncio.ensure_future(scheduler.acquire(RequestScheduler.BACKGROUND))
+        await asyncio.sleep(0)
+        scheduler.release(RequestScheduler.BACKGROUND)
+        await asyncio.wait_for(waiting, timeout=1)
+
+        for _ in range(3):
+            scheduler.release(RequestScheduler.INTERACTIVE)
+            await asyncio.sleep(0)
+        await asyncio.gather(*backlog)
+
+    asyncio.run(run())
+
+
+def test_sessions_are_served_round_robin():
+    async def run():
+        scheduler = RequestScheduler(LIMITS)
+        await scheduler.acquire(RequestScheduler.ANALYSIS, 'a')
+        order = []
+
+        async def request(session_key, label):
+            await scheduler.acquire(RequestScheduler.ANALYSIS, session_key)
+            order.append(label)
+            scheduler.release(RequestScheduler.ANALYSIS)
+
+        tasks = [asyncio.ensure_future(request(key, label)) for key, label in
+                 [('a', 'a1'), ('a', 'a2'), ('b', 'b1')]]
+        await asyncio.sleep(0)
+        scheduler.release(RequestScheduler.ANALYSIS)
+        await asyncio.gather(*tasks)
+        assert order == ['a1', 'b1', 'a2']
+
+    asyncio.run(run())
@@ -0,0 +1,28 @@
+import pytest
+
+from backend.agentic_ai.semantic_cache import SemanticCache
+
+CACHED = "What is the average temperature in the Bay of Bengal?"
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache(max_entries=100, dim=2048, threshold=0.7, ttl_seconds=3600, audit_rate=0.0)
+    cache.add(CACHED, {'response': 'cached', 'answer_cache_key': 'k1'}, data_version=1)
+    return cache
+
+
+@pytest.mark.parametrize("query", [
+    "What is the average temperature in the Bay of Bengal near the surface?",
+    "What is the average temperature in the Bay of Bengal in the mixed layer?",
+    "What is the average temperature in the Bay of Bengal at night?",
+])
+def test_qualified_paraphrases_miss(cache, query):
+    assert cache.lookup(query, data_version=1) is None
+
+
+def test_paraphrase_hits_with_visualization(cache):
+    cache.attach('k1', 'visualization', {'type': 'map'})
+    result, _, matched = cache.lookup("whats the mean temp in the bay of bengal", data_version=1)
+    assert matched == CACHED
+    assert result['visualization'] == {'type': 'map'}
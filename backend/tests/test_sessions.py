@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from backend.agentic_ai.intent_parser import IntentParser
+from backend.agentic_ai.sessions import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.sqlite"), max_sessions=10, ttl_seconds=3600,
+                        token_budget=1500, recent_turns=6)
+
+
+def answer(text):
+    return {'success': True, 'response': text}
+
+
+def test_self_contained_questions_are_not_follow_ups(store):
+    parser = IntentParser()
+
+    async def check():
+        session = await store.get('s1')
+        await store.record(session, "average temperature in the arabian sea", answer("25 °C"))
+        for query, expected in [
+            ("temperature above 500m in the Bay of Bengal", False),
+            ("is that also true for salinity in the arabian sea", True),
+            ("what about salinity?", True),
+            ("and last year?", True),
+        ]:
+            assert store.needs_context(session, query, parser.parse(query)) is expected, query
+
+    asyncio.run(check())
+
+
+def test_concurrent_requests_keep_every_turn(store):
+    async def ask(session_id, question):
+        session = await store.get(session_id)
+        await asyncio.sleep(0)
+        await store.record(session, question, answer(f"answer to {question}"))
+
+    async def run():
+        await asyncio.gather(*(ask('s1', f"question {i}") for i in range(3)))
+        return await store.get('s1')
+
+    session = asyncio.run(run())
+    assert session.questions == 3
+    assert sorted(text for role, text, _ in session.turns if role == 'user') == ["question 0", "question 1", "question 2"]